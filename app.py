@@ -1,11 +1,28 @@
 import streamlit as st
 import pandas as pd
-import asyncio
-from promo_checker import process_products
+import hashlib
+from browser_pool import BrowserPool
+from catalog_reader import CatalogReader
+from check_jobs import CheckJob, JobRegistry
+from listing_batch import ListingBatcher
+from memory_guard import MemoryWatchdog
+from metrics import PhaseMetrics
+from promo_checker import DEFAULT_REQUESTS_PER_MINUTE, REQUEST_JITTER
+from price_history import DEFAULT_HISTORY_DIR, PriceHistory
+from recheck_scheduler import DAY, RecheckScheduler
+from report_writer import REPORT_FORMATS, open_report
+from result_cache import ResultCache
+from selector_profiler import SelectorProfiler
+from snapshot_store import SnapshotStore
+from throttle import AdaptiveRateLimiter
+from marketplaces import MARKETPLACES, wide_report
 from io import BytesIO
 
 st.set_page_config(page_title="Amazon Promo Checker", page_icon="🛒", layout="wide")
 
+LIVE_REFRESH_SECONDS = 1.0  # How often the job panel polls a running check
+LIVE_ROWS = 200  # Latest results shown while a check runs
+
 # Custom CSS for Futuristic UI
 st.markdown("""
 <style>
@@ -129,19 +146,80 @@ if is_cloud:
 else:
     headless = st.sidebar.checkbox("Headless Mode", value=False, help="If unchecked, you will see the browser opening and navigating.")
 
+concurrency = st.sidebar.slider(
+    "Parallel Pages",
+    min_value=1,
+    max_value=8,
+    value=1,
+    help="Number of product pages checked at the same time on each marketplace. Marketplaces run side by side, "
+         "each rate-limited on its own."
+)
+
+use_cache = st.sidebar.checkbox(
+    "Use Result Cache",
+    value=True,
+    help="Reuse recent results for the same ASIN and marketplace instead of checking them again (errors are never cached)."
+)
+
+resume_runs = st.sidebar.checkbox(
+    "Resume Interrupted Runs",
+    value=True,
+    help="If a previous check of the same file was interrupted (crash, refresh), continue where it stopped. "
+         "Completed runs are not replayed, and failed rows are checked again."
+)
+
+auto_retry = st.sidebar.checkbox(
+    "Automatic Retries",
+    value=True,
+    help="Retry timeouts, errors and CAPTCHAs in the background with increasing waits while the run continues."
+)
+
+smart_recheck = st.sidebar.checkbox(
+    "Smart Re-check",
+    value=False,
+    help="Only check the products most likely to have changed since their last check (lightning deals first). "
+         "The rest are shown with their last known result."
+)
+if smart_recheck:
+    recheck_budget = st.sidebar.number_input("Products to check per run", min_value=1, value=500, step=100)
+    max_staleness_days = st.sidebar.number_input("Re-check everything at least every (days)", min_value=1, value=7)
+
+record_history = st.sidebar.checkbox(
+    "Record Price History",
+    value=True,
+    help="Append every checked product to the price history (see the 📈 Price History section)."
+)
+
+selector_profiles = st.sidebar.checkbox(
+    "Selector Profiles",
+    value=False,
+    help="Measure which page selectors find something on each marketplace (on a sample of pages), "
+         "then skip the useless ones and narrow the slow ones. Sampled pages still use every selector."
+)
+
+capture_snapshots = st.sidebar.checkbox(
+    "Capture Page Snapshots",
+    value=False,
+    help="Keep a compressed copy of the product region of every checked page, so extraction changes "
+         "can be replayed offline (python snapshot_store.py replay) without fetching again."
+)
+
+listing_lookups = st.sidebar.checkbox(
+    "Batch Listing Lookups",
+    value=False,
+    help="Read the price, list price and badges of up to 20 ASINs from one search results page instead of "
+         "opening every product page. Products not found there (or not clearly) get their own page check."
+)
+
+timing_columns = st.sidebar.checkbox(
+    "Timing Columns",
+    value=False,
+    help="Add per-phase timing columns (navigation, waits, selector scans...) to the results to see where time goes."
+)
+
 # Marketplace Selector
 st.sidebar.subheader("🌍 Select Marketplace")
-marketplace_options = {
-    "🇩🇪 Germany (amazon.de)": "de",
-    "🇪🇸 Spain (amazon.es)": "es",
-    "🇫🇷 France (amazon.fr)": "fr",
-    "🇮🇹 Italy (amazon.it)": "it",
-    "🇬🇧 United Kingdom (amazon.co.uk)": "co.uk",
-    "🇺🇸 United States (amazon.com)": "com",
-    "🇨🇦 Canada (amazon.ca)": "ca",
-    "🇯🇵 Japan (amazon.co.jp)": "co.jp",
-    "🇲🇽 Mexico (amazon.com.mx)": "com.mx"
-}
+marketplace_options = {info["label"]: domain for domain, info in MARKETPLACES.items()}
 
 selected_marketplace = st.sidebar.selectbox(
     "Select Amazon Marketplace:",
@@ -153,149 +231,260 @@ selected_marketplace = st.sidebar.selectbox(
 # Get the domain suffix
 marketplace_domain = marketplace_options[selected_marketplace]
 
+compare_marketplaces = st.sidebar.multiselect(
+    "Also Check On:",
+    options=[label for label in marketplace_options if label != selected_marketplace],
+    help="Check every product of the file on these marketplaces too (by ASIN), side by side, and get a wide "
+         "report with prices and promos per marketplace. Files with a 'Marketplace' column check each row "
+         "on its own marketplace instead."
+)
+run_marketplaces = [marketplace_domain] + [marketplace_options[label] for label in compare_marketplaces]
+
+@st.cache_resource
+def get_browser_pool(headless):
+    """One warm Chromium per process (and headless setting), shared by all reruns and sessions."""
+    return BrowserPool(headless=headless)
+
+@st.cache_resource
+def get_selector_profiler():
+    """Selector statistics and profiles shared by every check of this process."""
+    return SelectorProfiler()
+
+@st.cache_resource
+def get_job_registry():
+    """Background check jobs of this process, kept across reruns, sessions and page refreshes."""
+    return JobRegistry()
+
+browser_pool = get_browser_pool(headless)
+jobs = get_job_registry()
+
+# The job id is also kept in the URL, so a refreshed page reconnects to its running job
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+job = jobs.get(job_id) if job_id else None
+
 uploaded_file = st.file_uploader("Upload Excel (.xlsx) or CSV (.csv) file", type=["xlsx", "csv"])
 
 if uploaded_file:
     try:
-        if uploaded_file.name.endswith('.csv'):
-            try:
-                df = pd.read_csv(uploaded_file, encoding='utf-8-sig') # Handle optional BOM
-            except UnicodeDecodeError:
-                df = pd.read_csv(uploaded_file, encoding='latin1') # Fallback
-        else:
-            df = pd.read_excel(uploaded_file)
-        
-        # Validation and Transformation
-        if "URL" not in df.columns and "ASIN" in df.columns:
-            st.info(f"ℹ️ 'ASIN' column detected. Generating URLs for Amazon {marketplace_domain}...")
-            df["URL"] = df["ASIN"].apply(lambda x: f"https://www.amazon.{marketplace_domain}/dp/{str(x).strip()}")
+        # Only the header and a preview are read here; rows are streamed in chunks during the check
+        reader = CatalogReader(uploaded_file, name=uploaded_file.name, marketplace=marketplace_domain,
+                               marketplaces=run_marketplaces)
 
-        if "URL" not in df.columns:
+        # Validation and Transformation
+        if "URL" not in reader.columns:
             st.error("❌ The file does NOT have a 'URL' or 'ASIN' column. Please correct the file.")
-            st.write("Columns found:", list(df.columns))
+            st.write("Columns found:", reader.columns)
         else:
+            if reader.marketplaces:
+                st.info(f"🌍 Checking every product on {len(reader.marketplaces)} marketplaces: "
+                        f"{', '.join(reader.marketplaces)}")
+            elif reader.multi_marketplace:
+                st.info("🌍 'Marketplace' column detected. Each row is checked on its own marketplace.")
+            elif reader.urls_from_asins:
+                st.info(f"ℹ️ 'ASIN' column detected. Generating URLs for Amazon {marketplace_domain}...")
             st.subheader("Preview")
-            st.dataframe(df.head())
-            st.info(f"Found {len(df)} products to check.")
-            
-            # Initialize session state for results if not present
-            if 'results' not in st.session_state:
-                st.session_state.results = None
-
-            # Start Button
-            if st.button("🚀 Start Check"):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                status_text.text("Starting engines...")
-                
-                def update_progress(p):
-                    progress_bar.progress(p)
-                    status_text.text(f"Processing: {int(p*100)}%")
-
-                try:
-                    with st.spinner("Scanning Amazon products..."):
-                        try:
-                            loop = asyncio.get_event_loop()
-                        except RuntimeError:
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                        
-                        result_df = loop.run_until_complete(process_products(df.copy(), progress_callback=update_progress, headless=headless))
-                        st.session_state.results = result_df
-                        
-                    st.success("✅ Process completed!")
-                    st.balloons()
-
-                except Exception as e:
-                    st.error(f"An error occurred: {e}")
-                    import traceback
-                    traceback.print_exc()
-
-            # Retry Logic
-            if st.session_state.results is not None:
-                df_res = st.session_state.results
-                
-                # Update column name checks for English
-                if "Promo Status" in df_res.columns:
-                    error_mask = df_res["Promo Status"].astype(str).str.contains("Error/Timeout")
-                    errors_count = error_mask.sum()
-                    
-                    if errors_count > 0:
-                        st.warning(f"⚠️ {errors_count} timeout errors detected.")
-                        if st.button("🔄 Retry Errors ONLY"):
-                            st.info("Retrying failed URLs...")
-                            failed_df = df_res[error_mask].copy()
-                            retry_progress = st.progress(0)
-                            
-                            def update_retry(p):
-                                retry_progress.progress(p)
-                            
-                            try:
-                                try:
-                                    loop = asyncio.get_event_loop()
-                                except RuntimeError:
-                                    loop = asyncio.new_event_loop()
-                                    asyncio.set_event_loop(loop)
-                                    
-                                fixed_df = loop.run_until_complete(process_products(failed_df, progress_callback=update_retry, headless=headless))
-                                st.session_state.results.update(fixed_df)
-                                st.success("✅ Retry completed. Table updated.")
-                                st.rerun() 
-                                
-                            except Exception as e:
-                                st.error(f"Error checking retries: {e}")
-
-            # Display Results if they exist
-            if st.session_state.results is not None:
-                result_df = st.session_state.results
-                
-                st.subheader("Results")
-                    
-                def highlight_status(val):
-                    color = 'green' if val == 'ACTIVE' else 'red' if 'Error' in str(val) else 'black'
-                    return f'color: {color}; font-weight: bold'
-
-                # Check if column exists (it might be spanish old results)
-                status_col = "Promo Status" if "Promo Status" in result_df.columns else "Estado Promoción"
-
-                if status_col in result_df.columns:
-                    st.dataframe(
-                        result_df.style.map(highlight_status, subset=[status_col]),
-                        column_config={
-                            "URL": st.column_config.LinkColumn("Product Link")
-                        }
-                    )
-                    
-                # Download button with Hyperlinks (Excel)
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    result_df.to_excel(writer, index=False, sheet_name='Report')
-                    
-                    workbook = writer.book
-                    worksheet = writer.sheets['Report']
-                    
-                    url_col_idx = None
-                    for idx, col_name in enumerate(result_df.columns):
-                        if col_name == "URL":
-                            url_col_idx = idx + 1
-                            break
-                    
-                    if url_col_idx:
-                        for row_idx, url in enumerate(result_df["URL"]):
-                            cell = worksheet.cell(row=row_idx + 2, column=url_col_idx)
-                            if url and isinstance(url, str) and url.startswith("http"):
-                                cell.hyperlink = url
-                                cell.style = "Hyperlink"
-                                
-                output.seek(0)
-                
-                st.download_button(
-                    label="📥 Download Final Report",
-                    data=output,
-                    file_name="promo_report.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key='download-btn'
-                )
+            st.dataframe(reader.preview())
+            st.info(f"Found about {reader.estimated_rows()} products to check.")
+
+            # Start Button (one job at a time per session)
+            job_active = job is not None and not job.finished
+            if st.button("🚀 Start Check", disabled=job_active,
+                         help="A check is already running, pause or cancel it below." if job_active else None):
+                cache = ResultCache() if use_cache else None
+                # One journal per uploaded file + marketplace, so a restarted session can resume it
+                file_digest = hashlib.md5(uploaded_file.getvalue() + ",".join(run_marketplaces).encode()).hexdigest()
+                journal_path = os.path.join("journals", f"{file_digest}.jsonl")
+                recheck = RecheckScheduler(budget=recheck_budget, max_staleness=max_staleness_days * DAY) if smart_recheck else None
+                snapshots = SnapshotStore() if capture_snapshots else None
+                # Runs on the browser pool's loop; this script only polls it
+                job = jobs.add(CheckJob(
+                    browser_pool, reader, name=uploaded_file.name,
+                    resources=[cache, recheck.stats if recheck else None, snapshots],
+                    concurrency=concurrency, cache=cache, journal=journal_path, resume=resume_runs,
+                    rate_limiter=AdaptiveRateLimiter(DEFAULT_REQUESTS_PER_MINUTE, jitter=REQUEST_JITTER),
+                    browser_pool=browser_pool, timing_columns=timing_columns, metrics=PhaseMetrics(),
+                    retries=auto_retry, history=PriceHistory() if record_history else None, recheck=recheck,
+                    selector_profiler=get_selector_profiler() if selector_profiles else None,
+                    snapshots=snapshots, memory_watchdog=MemoryWatchdog(),
+                    listing_batch=ListingBatcher() if listing_lookups else None,
+                ))
+                job.start()
+                st.session_state.job_id = job.id
+                st.query_params["job"] = job.id
+                st.rerun()
 
     except Exception as e:
         st.error(f"Error reading file: {e}")
+
+# --- Check job ---
+if job_id and job is None:
+    st.warning("⚠️ That check is no longer available (the app was restarted or it finished long ago). "
+               "Upload the file again; with 'Resume Interrupted Runs' it continues where it stopped.")
+    st.session_state.pop("job_id", None)
+    st.query_params.pop("job", None)
+
+def highlight_status(val):
+    color = 'green' if val == 'ACTIVE' else 'red' if 'Error' in str(val) else 'black'
+    return f'color: {color}; font-weight: bold'
+
+if job is not None:
+    st.divider()
+    st.subheader(f"Check: {job.name}")
+    was_running = not job.finished
+
+    @st.fragment(run_every=LIVE_REFRESH_SECONDS if was_running else None)
+    def job_panel():
+        """Progress, controls and the latest results; refreshes by itself while the job runs."""
+        if was_running and job.finished:
+            st.rerun()  # Once, to show the final results below
+
+        st.progress(job.progress)
+        st.text(f"{job.state.title()}: {job.completed} of ~{job.total} products in {job.elapsed():.0f}s")
+        if not job.finished:
+            col_pause, col_cancel = st.columns(2)
+            if job.state == "paused":
+                if col_pause.button("▶️ Resume"):
+                    job.resume()
+                    st.rerun()
+            elif col_pause.button("⏸️ Pause", help="Checks in progress finish, no new ones start."):
+                job.pause()
+                st.rerun()
+            if col_cancel.button("⏹️ Cancel", help="Stop the check. Results so far are kept; with "
+                                                  "'Resume Interrupted Runs' a new check continues from here."):
+                job.cancel()
+                st.rerun()
+
+        if job.state == "running" and job.completed:
+            latest = job.latest(LIVE_ROWS)
+            st.caption(f"Latest {len(latest)} results (the full report is available once the check is paused or ended)")
+            status_style = latest.style.map(highlight_status, subset=["Promo Status"]) if "Promo Status" in latest.columns else latest
+            st.dataframe(status_style, column_config={"URL": st.column_config.LinkColumn("Product Link")})
+
+    job_panel()
+
+    if job.state != "running":
+        result_df = job.result()
+        options = job.options
+        if job.state == "done":
+            st.success("✅ Process completed!")
+            if st.session_state.get("celebrated") != job.id:
+                st.session_state.celebrated = job.id
+                st.balloons()
+        elif job.state == "cancelled":
+            st.warning(f"⏹️ Check cancelled after {job.completed} products.")
+        elif job.state == "failed":
+            st.error(f"An error occurred: {job.error}")
+
+        if job.finished:
+            if options.get("cache"):
+                st.info(f"🗄️ Cache: {options['cache'].hits} hits, {options['cache'].misses} misses")
+            recheck = options.get("recheck")
+            if recheck:
+                st.info(f"🎯 Re-checked {recheck.selected} products ({recheck.forced} new or stale), "
+                        f"{recheck.skipped} unchanged-looking products skipped")
+            listing = options.get("listing_batch")
+            if listing and listing.pages:
+                stats = listing.summary()
+                st.info(f"📋 {stats['pages']} listing pages covered {stats['found']} products, "
+                        f"{stats['fallbacks']} checked on their own page ({stats['loads_per_row']} page loads per product)")
+            with st.expander("⏱️ Pacing Stats"):
+                pacer = options.get("rate_limiter")
+                if pacer:
+                    st.json(pacer.snapshot())
+                    if pacer.events:
+                        st.dataframe(pd.DataFrame(list(pacer.events)))
+                phase_means = options["metrics"].summary() if options.get("metrics") else None
+                if phase_means:
+                    st.caption("Mean time per phase (s)")
+                    st.bar_chart(pd.Series(phase_means))
+            watchdog = options.get("memory_watchdog")
+            memory = watchdog.summary() if watchdog else None
+            if memory:
+                with st.expander("🧠 Memory"):
+                    st.caption(f"{memory['start_mb']} MB at start, peak {memory['peak_mb']} MB, "
+                               f"{memory['end_mb']} MB at end (app process + browser). Browser pages and "
+                               f"contexts are recycled during long runs to keep this flat.")
+                    st.line_chart(watchdog.frame().set_index("seconds"))
+            profiler = options.get("selector_profiler")
+            if profiler and profiler.stats:
+                with st.expander("🧪 Selector Profiles"):
+                    savings = profiler.savings_report()
+                    if savings:
+                        st.caption("Selector scan time per page, all selectors vs. the compiled profile")
+                        st.dataframe(pd.DataFrame(savings))
+                    st.caption("Selector telemetry (sampled pages)")
+                    st.dataframe(pd.DataFrame(profiler.selector_report()))
+
+        # Retry summary (failed checks are retried automatically during the run)
+        if "Promo Status" in result_df.columns and "Attempts" in result_df.columns:
+            retried = int((result_df["Attempts"] > 1).sum())
+            errors_count = int(result_df["Promo Status"].astype(str).str.startswith("Error").sum())
+            if retried:
+                st.info(f"🔁 {retried} products needed more than one attempt.")
+            if errors_count > 0:
+                st.warning(f"⚠️ {errors_count} products still failed after automatic retries.")
+
+        # Display Results
+        if len(result_df):
+            st.subheader("Results" if job.finished else "Results so far")
+
+            if job.multi_marketplace:
+                layout = st.radio("Layout", ["One row per product", "One row per marketplace"], horizontal=True,
+                                  help="One row per product puts the prices and promos of every marketplace side by side.")
+                if layout == "One row per product":
+                    result_df = wide_report(result_df, job.input_columns)
+
+            # Check if column exists (it might be spanish old results)
+            status_col = "Promo Status" if any(str(c).startswith("Promo Status") for c in result_df.columns) \
+                else "Estado Promoción"
+
+            status_cols = [c for c in result_df.columns if c == status_col or c.startswith(f"{status_col} (")]
+            if status_cols:
+                st.dataframe(
+                    result_df.style.map(highlight_status, subset=status_cols),
+                    column_config={
+                        "URL": st.column_config.LinkColumn("Product Link")
+                    }
+                )
+
+            # Download button (Excel with native hyperlinks, or CSV / JSON Lines / Parquet)
+            report_format = st.selectbox(
+                "Report format",
+                options=list(REPORT_FORMATS),
+                format_func=lambda fmt: REPORT_FORMATS[fmt][0],
+            )
+            _, extension, mime = REPORT_FORMATS[report_format]
+            output = BytesIO()
+            with open_report(output, report_format, price_columns=False) as report:
+                report.write_frame(result_df)
+            output.seek(0)
+
+            st.download_button(
+                label="📥 Download Final Report" if job.finished else "📥 Download Results So Far",
+                data=output,
+                file_name=f"promo_report{extension}",
+                mime=mime,
+                key='download-btn'
+            )
+
+# --- Price History ---
+if os.path.isdir(DEFAULT_HISTORY_DIR):
+    st.divider()
+    st.subheader("📈 Price History")
+    history = PriceHistory()
+    history_days = st.slider("Days", min_value=1, max_value=365, value=30)
+    asin_filter = st.text_input("ASINs (comma separated, empty = all)")
+    asins = [a.strip().upper() for a in asin_filter.split(",") if a.strip()] or None
+
+    history_summary = history.summary(days=history_days, marketplace=marketplace_domain, asins=asins)
+    st.caption(f"Amazon {marketplace_domain}, last {history_days} days: {len(history_summary)} products")
+    st.dataframe(
+        history_summary,
+        column_config={"promo_frequency": st.column_config.ProgressColumn("Promo Frequency", min_value=0, max_value=1)},
+    )
+
+    if len(history_summary):
+        chart_asin = st.selectbox("Price trend for", options=history_summary["asin"].head(1000))
+        series = history.price_series(chart_asin, marketplace=marketplace_domain, days=history_days)
+        if len(series):
+            st.line_chart(series.set_index("observed_at")[["current_price", "normal_price"]])
@@ -0,0 +1,97 @@
+"""
+Local stand-in for Amazon product pages.
+
+Serves the saved pages in benchmarks/fixtures/ as /dp/<name> with a fixed
+latency per response. /slow/dp/<name> adds `slow_latency` on top, to mimic
+slow responses. Any query string is ignored, so /dp/deal?i=1, /dp/deal?i=2
+give distinct URLs (and cache keys) for the same page.
+
+The saved listing pages in benchmarks/fixtures/grids/ stand in for search
+results: /s?k=... serves grids/search.html whatever the query, and
+/dp/<ASIN> serves the product page grids/asins.json maps the ASIN to.
+`server.hits` counts the listing and product pages served.
+"""
+import json
+
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+GRIDS_DIR = os.path.join(FIXTURES_DIR, "grids")
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """{name: html bytes} for every .html file in the fixtures directory."""
+    fixtures = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), "rb") as f:
+                fixtures[filename[:-5]] = f.read()
+    return fixtures
+
+
+def load_asins(directory=GRIDS_DIR):
+    """{ASIN: fixture name} of the products on the saved listing pages."""
+    with open(os.path.join(directory, "asins.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def start_fixture_server(latency=0.0, slow_latency=3.0, port=0, fixtures=None, grids=None, asins=None):
+    """
+    Start the server in a daemon thread.
+    Returns (server, base_url); call server.shutdown() when done.
+    """
+    fixtures = fixtures or load_fixtures()
+    grids = grids or load_fixtures(GRIDS_DIR)
+    asins = asins or load_asins()
+    hits = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlparse(self.path).path
+            delay = latency
+            if path.startswith("/slow/"):
+                delay += slow_latency
+                path = path[len("/slow"):]
+            name = path.rsplit("/", 1)[-1]
+            if path == "/s":
+                body = grids.get("search")
+                hits["listing"] += 1
+            else:
+                body = fixtures.get(asins.get(name, name))
+                hits["product"] += 1
+
+            if delay:
+                time.sleep(delay)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.hits = hits
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server, base_url = start_fixture_server(latency=0.05)
+    print(f"Serving {', '.join(load_fixtures())} at {base_url}/dp/<name>, listings at {base_url}/s (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
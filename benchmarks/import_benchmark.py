@@ -0,0 +1,129 @@
+"""
+Startup benchmark: how long `import promo_checker` takes in a fresh process.
+
+Runs `python -X importtime -c "import <module>"` several times, subtracts
+an empty interpreter (`python -c pass`) and reports the median import time
+and the slowest modules. Results are saved as JSON like run_benchmark.py:
+
+    python benchmarks/import_benchmark.py
+    python benchmarks/import_benchmark.py --compare benchmarks/results/<old>.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_once(code, preload=None):
+    """
+    Wall time (s) of a fresh interpreter running `code`, and its -X importtime
+    report as {module: cumulative µs}. `preload` modules are imported before
+    the timer starts (e.g. what Streamlit has already loaded).
+    """
+    if preload:
+        code = f"import {', '.join(preload)}; import time as _t; _s = _t.perf_counter(); {code}; " \
+               f"print('elapsed', _t.perf_counter() - _s)"
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # Measure with cached bytecode, like a deployed app
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr[-2000:]}")
+    if preload:
+        elapsed = float(proc.stdout.split("elapsed")[-1])
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package" (nested ones indented)
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(cumulative), depth)
+    return elapsed, modules
+
+
+def benchmark(args):
+    # Byte-compile once so the first run doesn't pay for it
+    run_once(f"import {args.module}")
+
+    preload = args.preload.split(",") if args.preload else None
+    baseline = [run_once("pass")[0] for _ in range(args.runs)]
+    totals = []
+    modules = {}
+    for _ in range(args.runs):
+        elapsed, imported = run_once(f"import {args.module}", preload)
+        totals.append(elapsed)
+        for name, (micros, depth) in imported.items():
+            modules.setdefault((name, depth), []).append(micros)
+
+    empty = 0.0 if preload else statistics.median(baseline)
+    # Imports made directly by the interpreter or the benchmarked module
+    slowest = sorted(((statistics.median(v), name) for (name, depth), v in modules.items() if depth <= 1),
+                     reverse=True)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "module": args.module,
+        "preload": preload,
+        "runs": args.runs,
+        "interpreter_ms": round(statistics.median(baseline) * 1000, 1),
+        "import_ms": round((statistics.median(totals) - empty) * 1000, 1),
+        "import_ms_min": round((min(totals) - empty) * 1000, 1),
+        "modules_loaded": len(modules),
+        "slowest_ms": {name: round(micros / 1000, 1) for micros, name in slowest[:args.top]},
+    }
+
+
+def compare(result, baseline):
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name in ("import_ms", "import_ms_min", "modules_loaded"):
+        new, old = result.get(name), baseline.get(name)
+        if new is None or not old:
+            print(f"  {name:20} {new}")
+        else:
+            print(f"  {name:20} {old:>10.1f} -> {new:>10.1f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="promo_checker", help="Module to import")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--preload", help="Comma-separated modules imported before timing (e.g. asyncio,pandas)")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--output", help="Where to write the JSON result (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="Previous result JSON to compare against")
+    args = parser.parse_args()
+
+    result = benchmark(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{result['timestamp'].replace(':', '')}-{result['commit'] or 'local'}-import.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Saved to {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Offline benchmark for check_promotion / iter_products.
+
+Serves the saved product pages in benchmarks/fixtures/ from a local HTTP
+server, runs the checker with all pacing sleeps disabled and reports:
+pages/sec, p50/p95/p99 latency per page, protocol (CDP) calls per page, peak
+RSS of the process tree and any result that differs from expected.json.
+Results are saved as JSON so runs can be compared between commits:
+
+    python benchmarks/run_benchmark.py --mode static --pages 400
+    python benchmarks/run_benchmark.py --mode browser --compare benchmarks/results/<old>.json
+
+--listing-batch N checks the ASINs of benchmarks/fixtures/grids/ instead,
+N per saved listing page, and reports the page loads per row.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import promo_checker  # noqa: E402
+from fixture_server import FIXTURES_DIR, load_asins, load_fixtures, start_fixture_server  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class ProtocolCounter:
+    """
+    Counts messages sent to the Playwright driver (each one is a CDP round-trip
+    or more). Hooks a private Playwright method, so it reports None if the
+    internals change.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.installed = False
+
+    def install(self):
+        try:
+            from playwright._impl._connection import Connection
+        except ImportError:
+            return
+        original = getattr(Connection, "_send_message_to_server", None)
+        if original is None:
+            return
+        calls = self.calls
+
+        def counting(connection, object, method, *args, **kwargs):
+            calls[method] += 1
+            return original(connection, object, method, *args, **kwargs)
+
+        Connection._send_message_to_server = counting
+        self.installed = True
+
+    @property
+    def total(self):
+        return sum(self.calls.values()) if self.installed else None
+
+
+class PeakMemory:
+    """Samples RSS of this process and its children (Chromium) in a thread."""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        if psutil is None:
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            return (usage + children) * 1024  # ru_maxrss is KB on Linux
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, self._sample())
+            self.stop_event.wait(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self._sample())
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run_checker(urls, args, concurrency):
+    """Run iter_products over `urls`; returns [(record, seconds since previous record)]."""
+    records = []
+    last = time.perf_counter()
+    async for record in promo_checker.iter_products(
+        urls,
+        headless=not args.headed,
+        concurrency=concurrency,
+        requests_per_minute=None,   # No pacing sleeps offline
+        adaptive_pacing=False,
+        http_first=args.mode == "static",
+        listing_batch=args.listing_batch or None,
+    ):
+        now = time.perf_counter()
+        records.append((record, now - last))
+        last = now
+    return records
+
+
+async def benchmark(args):
+    fixtures = load_fixtures()
+    if args.fixtures:
+        fixtures = {name: fixtures[name] for name in args.fixtures.split(",")}
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    server, base_url = start_fixture_server(latency=args.latency, slow_latency=args.slow_latency, fixtures=fixtures)
+    # Product page names in the URLs: fixture names, or ASINs of the listing pages
+    asins = load_asins() if args.listing_batch else {}
+    pages = [asin for asin, name in asins.items() if name in fixtures] if asins else list(fixtures)
+    promo_checker.READY_TIMEOUT_MS = args.ready_timeout
+
+    try:
+        # --- Latency phase: one page at a time, every fixture `rounds` times ---
+        names = [name for name in pages for _ in range(args.rounds)]
+        latency_urls = [f"{base_url}/dp/{name}?r={i}" for i, name in enumerate(names)]
+        latency_records = await run_checker(latency_urls, args, concurrency=1)
+
+        per_fixture = {}
+        mismatches = []
+        for (record, seconds), name in zip(sorted(latency_records, key=lambda r: r[0]["position"]), names):
+            per_fixture.setdefault(name, []).append(seconds)
+            want = expected.get(asins.get(name, name))
+            got = {
+                "status": record["Promo Status"],
+                "current_price": record["Current Price"],
+                "normal_price": record["Normal Price"],
+                "discount": record["Discount"],
+            }
+            if want and got != want and name not in {m["name"] for m in mismatches}:
+                mismatches.append({"name": name, "got": got, "expected": want})
+        latencies = [seconds for _, seconds in latency_records]
+
+        # --- Throughput phase: many pages with the configured concurrency ---
+        counter = ProtocolCounter()
+        counter.install()
+        slow_every = int(1 / args.slow_fraction) if args.slow_fraction else 0
+        throughput_urls = []
+        for i in range(args.pages):
+            name = pages[i % len(pages)]
+            prefix = "/slow" if slow_every and i % slow_every == 0 else ""
+            throughput_urls.append(f"{base_url}{prefix}/dp/{name}?t={i}")
+
+        server.hits.clear()
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            await run_checker(throughput_urls, args, concurrency=args.concurrency)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": args.mode,
+        "pages": args.pages,
+        "concurrency": args.concurrency,
+        "server_latency_s": args.latency,
+        "pages_per_sec": round(args.pages / elapsed, 2) if elapsed else None,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "per_fixture_mean": {name: statistics.mean(v) for name, v in per_fixture.items()},
+        },
+        "cdp_calls_per_page": round(counter.total / args.pages, 2) if counter.total is not None else None,
+        "cdp_calls_by_method": dict(counter.calls.most_common(15)),
+        "peak_rss_mb": round(memory.peak / (1024 * 1024), 1),
+        "listing_batch": args.listing_batch,
+        "page_loads_per_row": round(sum(server.hits.values()) / args.pages, 3),
+        "mismatches": mismatches,
+    }
+
+
+def compare(result, baseline):
+    """Print relative changes of the headline numbers against a previous run."""
+    rows = [
+        ("pages_per_sec", result["pages_per_sec"], baseline.get("pages_per_sec")),
+        ("latency p50", result["latency_s"]["p50"], baseline.get("latency_s", {}).get("p50")),
+        ("latency p95", result["latency_s"]["p95"], baseline.get("latency_s", {}).get("p95")),
+        ("latency p99", result["latency_s"]["p99"], baseline.get("latency_s", {}).get("p99")),
+        ("cdp_calls_per_page", result["cdp_calls_per_page"], baseline.get("cdp_calls_per_page")),
+        ("peak_rss_mb", result["peak_rss_mb"], baseline.get("peak_rss_mb")),
+    ]
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, new, old in rows:
+        if new is None or not old:
+            print(f"  {name:20} {new}")
+        else:
+            print(f"  {name:20} {old:>10.3f} -> {new:>10.3f} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["static", "browser"], default="static",
+                        help="static: HTTP-first tier with browser escalation; browser: Playwright only")
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the throughput phase")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each fixture is checked in the latency phase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed server latency per response (s)")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Extra latency of /slow/ responses (s)")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="Share of throughput URLs served slowly")
+    parser.add_argument("--ready-timeout", type=int, default=2000, help="READY_TIMEOUT_MS override (ms)")
+    parser.add_argument("--fixtures", help="Comma-separated subset of fixture names (default: all)")
+    parser.add_argument("--listing-batch", type=int, default=0,
+                        help="Check the ASINs of the saved listing pages, this many per listing page")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    parser.add_argument("--output", help="Where to write the JSON result (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="Previous result JSON to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['timestamp'].replace(':', '')}-{result['commit'] or 'local'}-{args.mode}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps({k: v for k, v in result.items() if k != "cdp_calls_by_method"}, indent=2, ensure_ascii=False))
+    print(f"Saved to {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
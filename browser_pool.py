@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+
+from browser_setup import ensure_playwright_browsers
+from marketplaces import open_context
+from promo_checker import USER_AGENT
+from resource_policy import ResourcePolicy
+
+
+class BrowserPool:
+    """
+    Long-lived Chromium + one context per marketplace, owned by the app process.
+
+    Playwright objects are bound to the event loop that created them, and every
+    Streamlit rerun runs on a fresh script thread, so the pool runs its own
+    event loop in a background thread. Work is submitted to it with submit()
+    / run(); iter_products(browser_pool=...) then borrows the warm context
+    instead of launching Chromium.
+
+    The contexts (and their cookies) are reused across runs; each has its
+    marketplace's locale and currency cookies (see marketplaces.py). They are
+    health-checked on every borrow, relaunched if Chromium died (restoring the
+    saved cookies) and closed after `idle_timeout` seconds without borrowers.
+    """
+
+    def __init__(self, headless=True, idle_timeout=600, block_resources=True, resource_policy=None):
+        self.headless = headless
+        self.idle_timeout = idle_timeout
+        self.policy = (resource_policy or ResourcePolicy()) if block_resources else None
+
+        self.playwright = None
+        self.browser = None
+        self.contexts = {}  # marketplace -> context (None: hosts that are not Amazon marketplaces)
+        self.storage_states = {}  # Cookies saved on eviction / before relaunch, per marketplace
+        self.context_borrowers = {}  # context -> borrowers, also of retired contexts
+        self.retired = set()  # Recycled contexts, closed once their last borrower releases them
+        self.borrowers = 0
+        self.last_used = time.monotonic()
+        self.launches = 0
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="browser-pool", daemon=True)
+        self.thread.start()
+        self.lock = self.run(self._create_lock())
+        self.submit(self._evict_idle())
+
+    async def _create_lock(self):
+        return asyncio.Lock()
+
+    # --- Running work on the pool loop ---
+    def submit(self, coro):
+        """Schedule a coroutine on the pool loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the pool loop and wait for its result."""
+        return self.submit(coro).result(timeout)
+
+    # --- Borrowing ---
+    async def acquire(self, marketplace=None):
+        """
+        Return a healthy browser context for `marketplace` (launching Chromium
+        or opening the context if needed). Call release() once per acquire().
+        """
+        async with self.lock:
+            if not await self.healthy():
+                await self._relaunch()
+            if marketplace not in self.contexts:
+                self.contexts[marketplace] = await self._open_context(marketplace)
+            context = self.contexts[marketplace]
+            self.context_borrowers[context] = self.context_borrowers.get(context, 0) + 1
+            self.borrowers += 1
+            self.last_used = time.monotonic()
+            return context
+
+    async def release(self, context=None):
+        """Give back a context from acquire(); a retired one is closed when nobody uses it anymore."""
+        async with self.lock:
+            self.borrowers = max(0, self.borrowers - 1)
+            self.last_used = time.monotonic()
+            if context in self.context_borrowers:
+                self.context_borrowers[context] -= 1
+                if self.context_borrowers[context] <= 0:
+                    del self.context_borrowers[context]
+                    if context in self.retired:
+                        self.retired.discard(context)
+                        await self._close_context(context)
+
+    async def retire(self, marketplace, context):
+        """
+        Recycle a marketplace's context (see memory_guard.RecyclePolicy): the
+        next acquire() opens a fresh one with its cookies, and it is closed
+        once its borrowers have released it.
+        """
+        async with self.lock:
+            if self.contexts.get(marketplace) is not context:
+                return  # Already replaced (another borrower, or a relaunch)
+            del self.contexts[marketplace]
+            try:
+                self.storage_states[marketplace] = await context.storage_state()
+            except Exception:
+                pass  # Keep the cookies saved last time
+            self.retired.add(context)
+
+    async def _close_context(self, context):
+        try:
+            await context.close()
+        except Exception:
+            pass  # Already gone with its browser
+
+    async def healthy(self):
+        if not (self.browser and self.browser.is_connected()):
+            return False
+        try:
+            # Cheap round-trips that fail if a context or the browser process is gone
+            for context in self.contexts.values():
+                await asyncio.wait_for(context.cookies(), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def _relaunch(self):
+        if self.browser is not None:
+            print("♻️ Browser pool: Chromium unhealthy, relaunching")
+        await self._close_browser()
+
+        if self.playwright is None:
+            from playwright.async_api import async_playwright
+
+            await asyncio.to_thread(ensure_playwright_browsers)
+            self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        self.launches += 1
+
+    async def _open_context(self, marketplace):
+        context = await open_context(self.browser, marketplace, USER_AGENT, self.storage_states.get(marketplace))
+        if self.policy:
+            await self.policy.attach(context)
+        return context
+
+    async def _close_browser(self):
+        for marketplace, context in self.contexts.items():
+            try:
+                self.storage_states[marketplace] = await context.storage_state()
+            except Exception:
+                pass  # Context already dead, keep the last saved cookies
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.contexts = {}
+        self.context_borrowers = {}
+        self.retired = set()
+
+    async def _evict_idle(self):
+        while True:
+            await asyncio.sleep(min(30, self.idle_timeout))
+            async with self.lock:
+                idle = time.monotonic() - self.last_used
+                if self.browser is not None and self.borrowers == 0 and idle >= self.idle_timeout:
+                    print(f"💤 Browser pool: idle for {idle:.0f}s, closing Chromium")
+                    await self._close_browser()
+
+    # --- Shutdown ---
+    async def _shutdown(self):
+        async with self.lock:
+            await self._close_browser()
+            if self.playwright is not None:
+                await self.playwright.stop()
+                self.playwright = None
+
+    def close(self):
+        self.run(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def status(self):
+        return {
+            "running": self.browser is not None,
+            "contexts": len(self.contexts),
+            "retired_contexts": len(self.retired),
+            "borrowers": self.borrowers,
+            "launches": self.launches,
+            "idle_s": round(time.monotonic() - self.last_used, 1),
+        }
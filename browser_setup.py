@@ -0,0 +1,136 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+
+# Remembers a verified install per Playwright version, so later processes
+# skip even the browsers.json lookup
+MARKER_DIR = os.path.join(os.path.expanduser("~"), ".cache", "promochecker")
+CHROMIUM_BROWSERS = ("chromium", "chromium-headless-shell")
+
+_lock = threading.Lock()
+_ready = False
+
+
+def is_cloud():
+    return os.path.exists('/home/appuser')  # Streamlit Cloud
+
+
+def browsers_path():
+    """Where Playwright keeps its browsers (PLAYWRIGHT_BROWSERS_PATH or the per-OS default)."""
+    env = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if env and env != "0":
+        return env
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/ms-playwright")
+    if sys.platform == "win32":
+        return os.path.join(os.environ.get("LOCALAPPDATA", ""), "ms-playwright")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ms-playwright")
+
+
+def expected_browser_dirs():
+    """
+    Install directories of the Chromium builds this Playwright version
+    launches (e.g. chromium-1243), read from its browsers.json without
+    importing Playwright. None if that file can't be read.
+    """
+    spec = importlib.util.find_spec("playwright")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    manifest = os.path.join(list(spec.submodule_search_locations)[0], "driver", "package", "browsers.json")
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            browsers = json.load(f)["browsers"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return [
+        os.path.join(browsers_path(), f"{b['name'].replace('-', '_')}-{b['revision']}")
+        for b in browsers if b["name"] in CHROMIUM_BROWSERS
+    ]
+
+
+def probe_chromium():
+    """True if every expected Chromium build finished installing (a few stat calls, no launch)."""
+    dirs = expected_browser_dirs()
+    return bool(dirs) and all(os.path.exists(os.path.join(d, "INSTALLATION_COMPLETE")) for d in dirs)
+
+
+def _marker_path():
+    from importlib import metadata
+
+    try:
+        version = metadata.version("playwright")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return os.path.join(MARKER_DIR, f"playwright-{version}.json")
+
+
+def _marker_valid(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            dirs = json.load(f)["browser_dirs"]
+    except (OSError, ValueError, KeyError):
+        return False
+    return all(os.path.exists(os.path.join(d, "INSTALLATION_COMPLETE")) for d in dirs)
+
+
+def _write_marker(path):
+    try:
+        os.makedirs(MARKER_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"browser_dirs": expected_browser_dirs()}, f)
+    except OSError as e:
+        print(f"Warning: could not write Playwright marker {path}: {e}")
+
+
+def _install():
+    print("Installing Playwright Chromium (one time)...")
+    result = subprocess.run(
+        [sys.executable, "-m", "playwright", "install", "chromium"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode == 0:
+        print("✅ Playwright Chromium installed successfully")
+        return
+    print(f"⚠️ Playwright install output: {result.stdout}")
+    # Try with --with-deps
+    subprocess.run(
+        [sys.executable, "-m", "playwright", "install", "--with-deps", "chromium"],
+        check=False
+    )
+
+
+def ensure_playwright_browsers():
+    """
+    Make sure Playwright's Chromium is installed, once per process.
+    Call it right before launching the browser, not at import time.
+
+    A marker file (per Playwright version) or a probe of the expected
+    browser directories answers in microseconds; the install subprocess
+    only runs on Streamlit Cloud when the browsers are really missing.
+    Elsewhere a missing browser is reported with the command to install it.
+    Returns True if Chromium is ready.
+    """
+    global _ready
+    if _ready:
+        return True
+    with _lock:
+        if _ready:
+            return True
+        try:
+            marker = _marker_path()
+            if _marker_valid(marker) or probe_chromium():
+                _ready = True
+            elif is_cloud():
+                _install()
+                _ready = probe_chromium() or expected_browser_dirs() is None
+            else:
+                print("⚠️ Playwright Chromium not found, install it with: python -m playwright install chromium")
+            if _ready and not _marker_valid(marker) and expected_browser_dirs():
+                _write_marker(marker)
+        except Exception as e:
+            print(f"Warning: Could not auto-install Playwright browsers: {e}")
+        return _ready
@@ -0,0 +1,208 @@
+import io
+import os
+from contextlib import closing
+
+import pandas as pd
+
+from marketplaces import MARKETPLACE_COLUMN, normalize_marketplace, product_url
+from utils import batched, extract_asin, marketplace_of
+
+CHUNK_SIZE = 5000  # Rows per DataFrame chunk
+ENCODING_SNIFF_BYTES = 1024 * 1024
+
+
+def fan_out(chunk, marketplaces):
+    """
+    One row per input row and marketplace, interleaved (row 1 on every
+    marketplace, then row 2...), with a "Marketplace" column. URLs are
+    rebuilt from the ASIN for each marketplace; a row without any ASIN
+    keeps its URL and is checked once.
+    """
+    n = len(marketplaces)
+    out = chunk.loc[chunk.index.repeat(n)].reset_index(drop=True)
+    out[MARKETPLACE_COLUMN] = list(marketplaces) * len(chunk)
+    if "URL" not in out.columns:
+        return out
+    if "ASIN" in out.columns:
+        asins = out["ASIN"].astype("string").str.strip()
+    else:
+        asins = out["URL"].map(extract_asin).astype("string")
+    has_asin = asins.notna() & (asins != "")
+    urls = "https://www.amazon." + out[MARKETPLACE_COLUMN] + "/dp/" + asins
+    out["URL"] = urls.where(has_asin, out["URL"])
+    out.loc[~has_asin, MARKETPLACE_COLUMN] = out.loc[~has_asin, "URL"].map(marketplace_of)
+    first_copy = pd.Series(range(len(out))) % n == 0
+    return out[has_asin | first_copy].reset_index(drop=True)
+
+
+def normalize_chunk(chunk, marketplace, marketplaces=None):
+    """
+    Vectorized ASIN -> URL conversion for one chunk: when there is no "URL"
+    column, builds https://www.amazon.<marketplace>/dp/<ASIN> from "ASIN",
+    with the row's own marketplace if the file has a "Marketplace" column.
+    `marketplaces`: fan every row out to these marketplaces (see fan_out).
+    """
+    if marketplaces:
+        chunk = fan_out(chunk, marketplaces)
+    elif MARKETPLACE_COLUMN in chunk.columns:
+        # Blank cells: the marketplace of the row's URL, else the default one
+        defaults = chunk["URL"].map(marketplace_of) if "URL" in chunk.columns else [marketplace] * len(chunk)
+        chunk[MARKETPLACE_COLUMN] = [normalize_marketplace(m, default)
+                                     for m, default in zip(chunk[MARKETPLACE_COLUMN], defaults)]
+    if "URL" not in chunk.columns and "ASIN" in chunk.columns:
+        asins = chunk["ASIN"].astype("string").str.strip()
+        if MARKETPLACE_COLUMN in chunk.columns:
+            chunk["URL"] = [product_url(domain, asin) for domain, asin in zip(chunk[MARKETPLACE_COLUMN], asins)]
+        else:
+            chunk["URL"] = f"https://www.amazon.{marketplace}/dp/" + asins
+    return chunk
+
+
+class CatalogReader:
+    """
+    Streams an Excel (.xlsx) or CSV catalog in DataFrame chunks instead of
+    loading it whole: openpyxl read-only mode for Excel, chunked read_csv
+    for CSV. `source` is a path or a file-like object (e.g. a Streamlit
+    upload); `name` gives the file type when `source` has no name.
+    Only the header and the current chunk are held in memory.
+
+    Mixed-marketplace catalogs: a "Marketplace" column (de, co.uk, amazon.fr...)
+    gives each ASIN its own marketplace; otherwise `marketplaces` (a list)
+    checks every row on each of them. Either way `multi_marketplace` is set
+    and the results can be pivoted with marketplaces.wide_report().
+    """
+
+    def __init__(self, source, name=None, marketplace="de", chunk_size=CHUNK_SIZE, marketplaces=None):
+        self.source = source
+        self.name = name or getattr(source, "name", None) or str(source)
+        self.marketplace = marketplace
+        self.chunk_size = chunk_size
+        self.is_csv = self.name.lower().endswith(".csv")
+        self.encoding = self._sniff_encoding() if self.is_csv else None
+        self.columns = list(self._first_chunk(5).columns)
+        self.input_columns = list(self.columns)
+        self.marketplaces = None
+        if MARKETPLACE_COLUMN in self.columns:
+            if marketplaces:
+                print(f"ℹ️ {self.name} has a '{MARKETPLACE_COLUMN}' column, checking each row on its own marketplace")
+        elif marketplaces and len(marketplaces) > 1:
+            self.marketplaces = [normalize_marketplace(m) for m in marketplaces]
+            self.columns.append(MARKETPLACE_COLUMN)
+        elif marketplaces:
+            self.marketplace = normalize_marketplace(marketplaces[0], marketplace)
+        self.multi_marketplace = MARKETPLACE_COLUMN in self.columns
+        self.urls_from_asins = "URL" not in self.columns and "ASIN" in self.columns
+        if self.urls_from_asins:
+            self.columns.append("URL")
+
+    @property
+    def has_urls(self):
+        return "URL" in self.columns
+
+    def _open_binary(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            return open(self.source, "rb")
+        self.source.seek(0)
+        return self.source
+
+    def _close_binary(self, f):
+        if f is not self.source:
+            f.close()
+
+    def _sniff_encoding(self):
+        """utf-8-sig (handles an optional BOM) if the start of the file decodes, else latin1."""
+        f = self._open_binary()
+        try:
+            head = f.read(ENCODING_SNIFF_BYTES)
+        finally:
+            self._close_binary(f)
+        try:
+            head.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            if e.start < len(head) - 3:  # Not just a character cut at the sniff boundary
+                return "latin1"
+        return "utf-8-sig"
+
+    def _first_chunk(self, n):
+        with closing(self._raw_chunks(n)) as chunks:
+            return next(chunks, pd.DataFrame())
+
+    def _raw_chunks(self, chunk_size):
+        f = self._open_binary()
+        try:
+            if self.is_csv:
+                text = io.TextIOWrapper(f, encoding=self.encoding, newline="")
+                try:
+                    # ASINs stay text, so ISBN-style ASINs keep their leading zeros
+                    yield from pd.read_csv(text, chunksize=chunk_size, dtype={"ASIN": "string"})
+                finally:
+                    text.detach()
+            else:
+                yield from self._excel_chunks(f, chunk_size)
+        finally:
+            self._close_binary(f)
+
+    def _excel_chunks(self, f, chunk_size):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            for batch in batched(rows, chunk_size):
+                chunk = pd.DataFrame.from_records(batch, columns=columns)
+                if "ASIN" in chunk.columns:
+                    chunk["ASIN"] = chunk["ASIN"].astype("string")
+                yield chunk.dropna(how="all")
+        finally:
+            workbook.close()
+
+    def chunks(self):
+        """Yields DataFrame chunks with a normalized "URL" column."""
+        for chunk in self._raw_chunks(self.chunk_size):
+            yield normalize_chunk(chunk, self.marketplace, self.marketplaces)
+
+    def rows(self):
+        """Yields one dict per catalog row, chunk by chunk."""
+        for chunk in self.chunks():
+            yield from chunk.to_dict("records")
+
+    def preview(self, n=5):
+        """First `n` rows, without reading the rest of the file."""
+        return normalize_chunk(self._first_chunk(n), self.marketplace, self.marketplaces)
+
+    def estimated_rows(self):
+        """
+        Row count for progress reporting, without parsing the rows: the sheet
+        dimension for Excel, a newline count for CSV (quoted line breaks make
+        it an estimate), times the fanned-out marketplaces. None if unknown.
+        """
+        rows = self._estimated_input_rows()
+        return rows * len(self.marketplaces) if rows is not None and self.marketplaces else rows
+
+    def _estimated_input_rows(self):
+        f = self._open_binary()
+        try:
+            if self.is_csv:
+                count = 0
+                last = b"\n"
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    count += block.count(b"\n")
+                    last = block[-1:]
+                return max(0, count - 1 + (last != b"\n"))
+            from openpyxl import load_workbook
+            workbook = load_workbook(f, read_only=True)
+            try:
+                max_row = workbook.active.max_row
+            finally:
+                workbook.close()
+            return max_row - 1 if max_row else None
+        finally:
+            self._close_binary(f)
+
+    def to_frame(self):
+        """The whole catalog as one DataFrame (for code paths that need it, e.g. sharding)."""
+        return pd.concat(list(self.chunks()), ignore_index=True)
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+import uuid
+
+from promo_checker import catalog_frame, iter_catalog
+
+JOB_RETENTION = 6 * 60 * 60  # Finished jobs are forgotten after this many seconds
+FINAL_STATES = ("done", "cancelled", "failed")
+
+
+class CheckJob:
+    """
+    A catalog check running in the background on a BrowserPool's loop, so
+    no Streamlit script thread waits for it: scripts only poll `progress`,
+    `state` and the records received so far.
+
+    The job can be paused (checks in flight finish, no new ones start),
+    resumed and cancelled from any thread. It keeps running when the
+    browser tab is closed or refreshed; a new session finds it again in
+    the JobRegistry by its id. `resources` (e.g. the ResultCache) are
+    closed when the job ends.
+    """
+
+    def __init__(self, pool, reader, name=None, resources=(), **options):
+        self.id = uuid.uuid4().hex
+        self.pool = pool
+        self.reader = reader
+        self.name = name or reader.name
+        self.columns = list(reader.columns)
+        self.input_columns = list(reader.input_columns)
+        self.multi_marketplace = reader.multi_marketplace
+        self.options = options
+        self.resources = [resource for resource in resources if resource is not None]
+        self.records = []  # In arrival order, appended on the pool thread
+        self.total = reader.estimated_rows()
+        self.progress = 0.0
+        self.state = "pending"
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.gate = asyncio.Event()  # Cleared while paused, see iter_products(pause_gate=...)
+        self.gate.set()
+        self.future = None
+        self.lock = threading.Lock()
+        self._result = None
+
+    def start(self):
+        self.state = "running"
+        self.started_at = time.time()
+        self.future = self.pool.submit(self._run())
+        self.future.add_done_callback(self._finished)
+        return self
+
+    async def _run(self):
+        def on_progress(p):
+            self.progress = p
+
+        try:
+            async for record in iter_catalog(self.reader, progress_callback=on_progress,
+                                             pause_gate=self.gate, **self.options):
+                self.records.append(record)
+            self._set_state("done")
+            self.progress = 1.0
+        except asyncio.CancelledError:
+            self._set_state("cancelled")
+            raise
+        except Exception as e:
+            self.error = e
+            self._set_state("failed")
+            print(f"❌ Job {self.id[:8]} failed: {e}")
+        finally:
+            for resource in self.resources:
+                try:
+                    resource.close()
+                except Exception as e:
+                    print(f"Warning: could not close {resource!r}: {e}")
+
+    def _finished(self, future):
+        # Also covers a job cancelled before its coroutine started
+        if future.cancelled():
+            self._set_state("cancelled")
+        self.finished_at = time.time()
+        print(f"Job {self.id[:8]} {self.state}: {len(self.records)} rows")
+
+    def _set_state(self, state, only_from=None):
+        with self.lock:
+            if self.state in FINAL_STATES or (only_from and self.state != only_from):
+                return False
+            self.state = state
+            return True
+
+    # --- Controls (any thread) ---
+    def pause(self):
+        if self._set_state("paused", only_from="running"):
+            self.pool.loop.call_soon_threadsafe(self.gate.clear)
+
+    def resume(self):
+        if self._set_state("running", only_from="paused"):
+            self.pool.loop.call_soon_threadsafe(self.gate.set)
+
+    def cancel(self):
+        if self.future is not None and not self.finished:
+            self.future.cancel()
+
+    # --- Results ---
+    @property
+    def finished(self):
+        return self.state in FINAL_STATES
+
+    @property
+    def completed(self):
+        return len(self.records)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def latest(self, n):
+        """The last `n` records received, as a DataFrame (for the live table)."""
+        import pandas as pd
+
+        records = self.records[-n:]
+        if not records:
+            return pd.DataFrame()
+        return pd.DataFrame.from_records(records).drop(columns="position")
+
+    def result(self):
+        """
+        Report DataFrame of the rows received so far, in input row order (the
+        same as process_catalog). Computed once when the job has ended.
+        """
+        if self._result is not None:
+            return self._result
+        df = catalog_frame(list(self.records), self.columns)
+        if self.finished:
+            self._result = df
+        return df
+
+
+class JobRegistry:
+    """
+    The CheckJobs of this process by id. Kept outside of the Streamlit
+    session (st.cache_resource), so a refreshed page can reconnect to its
+    job. Finished jobs are dropped after `retention` seconds.
+    """
+
+    def __init__(self, retention=JOB_RETENTION):
+        self.retention = retention
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def add(self, job):
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            self._prune()
+            return self.jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished and job.finished_at and now - job.finished_at > self.retention:
+                del self.jobs[job_id]
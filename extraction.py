@@ -0,0 +1,447 @@
+import re
+import time
+
+from selectolax.lexbor import LexborHTMLParser
+
+from metrics import span
+from price_parser import parse_price
+
+# --- Selector lists ---
+# Broad scan for any price container in the buy box area
+PRICE_CONTAINERS = [
+    "#corePrice_feature_div .a-price .a-offscreen",
+    "#corePriceDisplay_desktop_feature_div .a-price .a-offscreen",
+    "#apex_desktop .a-price .a-offscreen",
+    ".a-price .a-offscreen", # Generic fallback
+    ".a-text-price span[aria-hidden='true']" # Strike-through text often here
+]
+
+DEAL_SELECTORS = [
+    # Generic Badges
+    ".badge-text",
+    "#dealBadge",
+    ".a-badge-label",
+    ".promo-badge",
+
+    # Coupons & vouchers
+    "#coupon-badge",
+    ".vpc-coupon-label",
+    "label:has-text('Apply coupon')",
+    "label:has-text('Aplicar cupón')", # Keep Spanish too
+    "label:has-text('Apply voucher')",
+
+    # Limited time deals
+    "#lightning-deal-timer",
+    ".dealPriceText",
+
+    # Amazon's Choice & Best Seller
+    "#acBadge_feature_div",      # Amazon's Choice container
+    ".ac-badge-wrapper",          # Amazon's Choice wrapper
+    ".ac-keyword-link",           # "Amazon's Choice de..."
+    "#bestSellerBadge_feature_div", # Best Seller container
+    ".zg-badge-body",             # Best Seller body
+]
+
+# Explicit percentage badges used to double check the discount
+DISCOUNT_SELECTOR = "span.savingsPercentage, span.a-size-large.a-color-price, div:has-text('%')"
+
+def split_selector(selector):
+    """
+    Split a Playwright selector list into [css, has_text] pairs.
+    `label:has-text('Apply coupon')` becomes ["label", "Apply coupon"] so the
+    in-page script (plain DOM APIs) can apply the same text filter.
+    """
+    parts = []
+    for part in selector.split(","):
+        part = part.strip()
+        match = re.match(r"^(.*):has-text\((['\"])(.*)\2\)$", part)
+        if match:
+            parts.append([match.group(1), match.group(3)])
+        else:
+            parts.append([part, None])
+    return parts
+
+# Present once the price / buy-box block (or the CAPTCHA form) is in the DOM
+READY_SELECTOR = ", ".join([
+    "#corePrice_feature_div",
+    "#corePriceDisplay_desktop_feature_div",
+    "#apex_desktop",
+    "#buybox",
+    "form[action*='validateCaptcha']",
+])
+
+# Page titles Amazon uses for its bot check
+CAPTCHA_MARKERS = ("CAPTCHA", "Robot Check")
+
+def is_captcha_title(title):
+    return any(marker in (title or "") for marker in CAPTCHA_MARKERS)
+
+def is_discount_text(text):
+    """A short '%' text with a '-' or 'off' ("-25%", "20% off"): what analyze_extraction takes as a discount."""
+    return "%" in text and len(text.strip()) < 15 and ("-" in text or "off" in text.lower())
+
+# --- In-page extraction script ---
+# One page.evaluate() call collects everything check_promotion needs, instead of
+# one query_selector_all + is_visible + text_content round-trip per element.
+# Visibility mirrors Playwright's is_visible(): non-empty box and not hidden.
+# :has-text() mirrors Playwright too: case-insensitive, whitespace-normalized.
+EXTRACT_SCRIPT = """
+({priceSelectors, badgeSelectors, discountSelector}) => {
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width <= 0 || rect.height <= 0) return false;
+        return getComputedStyle(el).visibility === 'visible';
+    };
+    const hasText = (el, text) =>
+        (el.textContent || '').replace(/\\s+/g, ' ').toLowerCase().includes(text.toLowerCase());
+    const query = (parts) => {
+        if (!parts.length) return [];
+        const css = parts.map((p) => p[0]).join(', ');
+        return Array.from(document.querySelectorAll(css)).filter((el) =>
+            parts.some(([sel, text]) => el.matches(sel) && (text === null || hasText(el, text))));
+    };
+
+    const t0 = performance.now();
+    const prices = [];
+    for (const parts of priceSelectors) {
+        for (const el of query(parts)) {
+            if (!visible(el)) continue;
+            const text = (el.textContent || '').trim();
+            if (text) prices.push(text);
+        }
+    }
+
+    const t1 = performance.now();
+    const badges = [];
+    for (const [i, parts] of badgeSelectors) {
+        for (const el of query(parts)) {
+            if (visible(el)) badges.push([i, (el.textContent || '').trim()]);
+        }
+    }
+
+    // Only short '%' texts with a '-' or 'off' can become a discount label
+    // (see is_discount_text), filter before the (more expensive) visibility
+    // check and the cap, so "19%" VAT or rating spans never crowd them out
+    const t2 = performance.now();
+    const discounts = [];
+    for (const el of query(discountSelector)) {
+        const text = el.textContent || '';
+        if (!text.includes('%') || text.trim().length >= 15) continue;
+        if (!text.includes('-') && !text.toLowerCase().includes('off')) continue;
+        if (visible(el)) discounts.push(text);
+        if (discounts.length >= 20) break;
+    }
+
+    const t3 = performance.now();
+
+    // In-page scan times (ms) for the timing instrumentation
+    const timings = {price_scan: t1 - t0, badge_scan: t2 - t1, discount_scan: t3 - t2};
+    return {title: document.title, prices, badges, discounts, timings};
+}
+"""
+
+def extract_args(price_containers=None, deal_selectors=None, discount_selector=None):
+    """
+    EXTRACT_SCRIPT / extract_from_html arguments for a set of selectors (all
+    of them by default, see selector_profiler.py for pruned sets).
+    `deal_selectors` are indices into DEAL_SELECTORS, or [index, selector]
+    pairs to run another (e.g. scoped) selector in its place, so
+    analyze_extraction still knows which badge matched. An empty
+    `discount_selector` ("") skips the discount scan.
+    """
+    if price_containers is None:
+        price_containers = PRICE_CONTAINERS
+    if deal_selectors is None:
+        deal_selectors = range(len(DEAL_SELECTORS))
+    if discount_selector is None:
+        discount_selector = DISCOUNT_SELECTOR
+    return {
+        "priceSelectors": [split_selector(s) for s in price_containers],
+        "badgeSelectors": [
+            [entry[0], split_selector(entry[1])] if isinstance(entry, (list, tuple))
+            else [entry, split_selector(DEAL_SELECTORS[entry])]
+            for entry in deal_selectors
+        ],
+        "discountSelector": split_selector(discount_selector) if discount_selector else [],
+    }
+
+EXTRACT_ARGS = extract_args()
+
+# --- Static HTML extraction ---
+# Builds the same payload as EXTRACT_SCRIPT from server-rendered HTML, without
+# a browser. There is no layout engine, so visibility is approximated from the
+# markup: hidden attribute, inline display:none / visibility:hidden and Amazon's
+# hidden utility classes on the element or any ancestor.
+HIDDEN_CLASSES = {"aok-hidden", "a-hidden", "hidden"}
+HIDDEN_TAGS = {"head", "script", "style", "template", "noscript"}
+
+def _static_visible(node):
+    while node is not None and node.tag != "-document":
+        if node.tag in HIDDEN_TAGS:
+            return False
+        attrs = node.attributes
+        if "hidden" in attrs:
+            return False
+        style = (attrs.get("style") or "").replace(" ", "").lower()
+        if "display:none" in style or "visibility:hidden" in style:
+            return False
+        if HIDDEN_CLASSES.intersection((attrs.get("class") or "").split()):
+            return False
+        node = node.parent
+    return True
+
+def _has_text(node, text):
+    return text.lower() in " ".join(node.text().split()).lower()
+
+def _static_query(tree, parts):
+    """Nodes matching any [css, has_text] part, in document order (like EXTRACT_SCRIPT's query)."""
+    if not parts:
+        return []
+    if len(parts) == 1:
+        css, text = parts[0]
+        nodes = tree.css(css)
+        return nodes if text is None else [node for node in nodes if _has_text(node, text)]
+    # Node.css_matches() is also true when a descendant matches, so compare nodes by identity
+    matched = set()
+    for css, text in parts:
+        matched.update(node.mem_id for node in tree.css(css) if text is None or _has_text(node, text))
+    return [node for node in tree.css(", ".join(css for css, _ in parts)) if node.mem_id in matched]
+
+def parse_html(html, timings=None):
+    with span(timings, "static_parse"):
+        return LexborHTMLParser(html)
+
+def extract_from_html(html, timings=None, args=None):
+    """
+    Static counterpart of EXTRACT_SCRIPT: parses the HTML (or takes an
+    already parsed tree) and returns the {title, prices, badges, discounts}
+    payload analyze_extraction expects. `args` is an extract_args() selector
+    set (EXTRACT_ARGS by default).
+    Scan times are recorded in `timings` (metrics.Timings) when given.
+    """
+    args = args or EXTRACT_ARGS
+    tree = html if isinstance(html, LexborHTMLParser) else parse_html(html, timings)
+    title_node = tree.css_first("title")
+
+    start = time.perf_counter()
+    prices = []
+    for parts in args["priceSelectors"]:
+        for node in _static_query(tree, parts):
+            text = node.text().strip()
+            if text and _static_visible(node):
+                prices.append(text)
+
+    price_done = time.perf_counter()
+    badges = []
+    for i, parts in args["badgeSelectors"]:
+        for node in _static_query(tree, parts):
+            if _static_visible(node):
+                badges.append([i, node.text().strip()])
+
+    badge_done = time.perf_counter()
+    discounts = []
+    for node in _static_query(tree, args["discountSelector"]):
+        text = node.text()
+        if not is_discount_text(text):
+            continue
+        if _static_visible(node):
+            discounts.append(text)
+        if len(discounts) >= 20:
+            break
+
+    if timings is not None:
+        timings.add("price_scan", price_done - start)
+        timings.add("badge_scan", badge_done - price_done)
+        timings.add("discount_scan", time.perf_counter() - badge_done)
+
+    return {
+        "title": title_node.text().strip() if title_node else "",
+        "prices": prices,
+        "badges": badges,
+        "discounts": discounts,
+    }
+
+# --- Selector profiling ---
+# Per-selector variant of the scans above, for selector_profiler.py: every
+# selector part runs on its own and is timed, with its match count and its
+# visible matches as [text, scope], where scope is the index of the
+# narrowest of `scopes` containing the match (-1: none). Discount parts
+# apply the same short '%' text filter as the discount scan.
+PROFILE_SCRIPT = """
+({groups, scopes}) => {
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width <= 0 || rect.height <= 0) return false;
+        return getComputedStyle(el).visibility === 'visible';
+    };
+    const hasText = (el, text) =>
+        (el.textContent || '').replace(/\\s+/g, ' ').toLowerCase().includes(text.toLowerCase());
+    const scopeOf = (el) => scopes.findIndex((scope) => el.closest(scope) !== null);
+
+    const rows = [];
+    for (const [group, parts] of groups) {
+        for (const [css, text] of parts) {
+            const t0 = performance.now();
+            let matched = Array.from(document.querySelectorAll(css));
+            if (text !== null) matched = matched.filter((el) => hasText(el, text));
+            const shown = [];
+            for (const el of matched) {
+                const content = el.textContent || '';
+                if (group === 'discount' && (!content.includes('%') || content.trim().length >= 15)) continue;
+                if (visible(el)) shown.push(el);
+            }
+            const ms = performance.now() - t0;
+            rows.push({
+                group, css, text, ms, matches: matched.length, visible_count: shown.length,
+                visible: shown.slice(0, 50).map((el) => [(el.textContent || '').trim(), scopeOf(el)]),
+            });
+        }
+    }
+    return rows;
+}
+"""
+
+def _scope_of(node, scope_ids):
+    ancestors = set()
+    while node is not None and node.tag != "-document":
+        ancestors.add(node.mem_id)
+        node = node.parent
+    for i, ids in enumerate(scope_ids):
+        if ancestors & ids:
+            return i
+    return -1
+
+def profile_html(tree, groups, scopes):
+    """Static counterpart of PROFILE_SCRIPT, on a parsed tree (see parse_html)."""
+    scope_ids = [{node.mem_id for node in tree.css(scope)} for scope in scopes]
+    rows = []
+    for group, parts in groups:
+        for css, text in parts:
+            start = time.perf_counter()
+            matched = tree.css(css)
+            if text is not None:
+                matched = [node for node in matched if _has_text(node, text)]
+            shown = []
+            for node in matched:
+                content = node.text()
+                if group == "discount" and ("%" not in content or len(content.strip()) >= 15):
+                    continue
+                if _static_visible(node):
+                    shown.append(node)
+            rows.append({
+                "group": group, "css": css, "text": text,
+                "ms": (time.perf_counter() - start) * 1000,
+                "matches": len(matched), "visible_count": len(shown),
+                "visible": [[node.text().strip(), _scope_of(node, scope_ids)] for node in shown[:50]],
+            })
+    return rows
+
+def analyze_extraction(data, marketplace=None, timings=None):
+    """
+    Applies the badge, smart-price and discount logic to the payload returned
+    by EXTRACT_SCRIPT ({title, prices, badges, discounts}).
+    `marketplace` (e.g. "de", "co.jp") is the locale hint for price parsing.
+    `timings` (metrics.Timings) receives the in-page scan times and the
+    Python-side analysis time.
+    Returns a tuple (status, details, current_price, normal_price, discount_label).
+    """
+    if timings is not None:
+        for phase, ms in (data.get("timings") or {}).items():
+            timings.add(phase, ms / 1000)
+
+    # Check for CAPTCHA title
+    with span(timings, "captcha_check"):
+        captcha = is_captcha_title(data.get("title"))
+    if captcha:
+        return "Error/Captcha", "Amazon detected unusual traffic", "N/A", "N/A", "N/A"
+
+    with span(timings, "analysis"):
+        return _analyze_payload(data, marketplace)
+
+def _analyze_payload(data, marketplace):
+    """Badge, smart-price and discount logic of analyze_extraction."""
+    promo_detected = False
+    details = []
+
+    # --- 1. Check for deal badges ---
+    for selector_idx, text in data.get("badges", []):
+        selector = DEAL_SELECTORS[selector_idx]
+        # Clean up text
+        clean_text = text.strip().replace("\n", " ") if text else ""
+
+        # Specific check for Amazon's Choice which might have empty text in container
+        if "acBadge" in selector or "ac-badge" in selector:
+             promo_detected = True
+             details.append("Amazon's Choice detected")
+        elif "bestSeller" in selector:
+             promo_detected = True
+             details.append("Best Seller detected")
+        elif clean_text:
+            promo_detected = True
+            details.append(f"Badge: {clean_text[:50]}...")
+
+    # --- SMART PRICE ANALYSIS ---
+    # Instead of trusting specific selectors, we gather ALL prices in the main block
+    # and use logic: Lowest = Price to Pay, Highest = List/Old Price.
+
+    found_prices = []
+    raw_price_map = {} # Map float val -> string representation
+
+    for text in data.get("prices", []):
+        cleaned_text = text.strip()
+        val = parse_price(cleaned_text, marketplace)[0] or 0.0
+        if val > 0:
+            found_prices.append(val)
+            if val not in raw_price_map:
+                raw_price_map[val] = cleaned_text
+
+    # Determine Prices based on Values
+    current_price_val = 0.0
+    normal_price_val = 0.0
+
+    current_price = "Not Found"
+    normal_price = "N/A"
+    discount_label = "N/A"
+
+    if found_prices:
+        # Sort unique prices
+        unique_prices = sorted(list(set(found_prices)))
+
+        # The lowest price is ALWAYS the current selling price
+        current_price_val = unique_prices[0]
+        current_price = raw_price_map[current_price_val]
+
+        # If we have multiple prices, the highest is likely the list price
+        if len(unique_prices) > 1:
+            potential_normal = unique_prices[-1]
+            # Only accept if it's at least 2% higher to avoid currency glitch
+            if potential_normal > current_price_val * 1.02:
+                normal_price_val = potential_normal
+                normal_price = raw_price_map[normal_price_val]
+                promo_detected = True
+                details.append(f"Price Drop: {normal_price} -> {current_price}")
+
+                # Calculate discount manually if not found later
+                calc_discount = int(((normal_price_val - current_price_val) / normal_price_val) * 100)
+                if discount_label == "N/A":
+                    discount_label = f"-{calc_discount}%"
+
+    # --- Discount Badges (Text Confirmation) ---
+    # Look for explicit percentage badges to double check
+    for text in data.get("discounts", []):
+        if text and "%" in text and ("-" in text or "off" in text.lower()):
+            clean_disc = text.strip()
+            # Update discount label if we found a visual badge (often more reliable than calc)
+            if len(clean_disc) < 15: # Safety check
+                discount_label = clean_disc
+                promo_detected = True
+                if "Discount Found" not in str(details):
+                    details.append(f"Discount Badge: {discount_label}")
+                break
+
+    unique_details = "; ".join(sorted(list(set(details))))
+
+    if promo_detected:
+        return "ACTIVE", unique_details, current_price, normal_price, discount_label
+    else:
+        return "NO PROMO", "No badges or visible discounts detected", current_price, normal_price, discount_label
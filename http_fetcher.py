@@ -0,0 +1,153 @@
+import httpx
+
+from extraction import EXTRACT_ARGS, analyze_extraction, extract_from_html, is_captcha_title, parse_html
+from marketplaces import accept_language, preference_cookies
+from metrics import span
+from utils import marketplace_of, page_url
+
+# Markers of a server-rendered buy box. If none is present the price block is
+# built client-side and only the browser can read it.
+BUY_BOX_MARKERS = (
+    'id="corePrice_feature_div"',
+    'id="corePriceDisplay_desktop_feature_div"',
+    'id="apex_desktop"',
+    'id="buybox"',
+    'id="ppd"',
+)
+CAPTCHA_PAGE_MARKERS = ("/errors/validateCaptcha", "captchacharacters")
+THROTTLE_STATUS_CODES = {429, 503}
+
+DEFAULT_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-GB,en;q=0.9,de;q=0.8,es;q=0.7",
+}
+
+
+class StaticFetcher:
+    """
+    HTTP-first fetch tier.
+    GETs the product page through a pooled keep-alive client and runs the same
+    selector lists over the static HTML. `check()` returns the usual result
+    tuple, or None when the page needs the Playwright path (CAPTCHA, missing
+    price block, JS-only content, non-200 response).
+
+    Requests to a marketplace carry its Accept-Language and currency /
+    language cookies (see marketplaces.py), like a local visitor.
+    """
+
+    def __init__(self, user_agent, timeout=20.0, max_connections=20):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": user_agent, **DEFAULT_HEADERS},
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.static_hits = 0
+        self.escalations = 0
+        self.localized = set()  # Marketplaces whose preference cookies are set
+
+    def locale_headers(self, marketplace):
+        """Accept-Language for `marketplace`; sets its preference cookies in the client once."""
+        if marketplace not in self.localized:
+            self.localized.add(marketplace)
+            for cookie in preference_cookies(marketplace):
+                self.client.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+        language = accept_language(marketplace)
+        return {"Accept-Language": language} if language else None
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def escalation_reason(self, status_code, html, data):
+        """Returns why the browser is needed, or None if the static HTML is enough."""
+        if status_code != 200:
+            return f"HTTP {status_code}"
+        if is_captcha_title(data["title"]) or any(m in html for m in CAPTCHA_PAGE_MARKERS):
+            return "CAPTCHA"
+        if not any(m in html for m in BUY_BOX_MARKERS):
+            return "JS-only content"
+        if not data["prices"]:
+            return "missing price block"
+        return None
+
+    async def check(self, url):
+        result, _ = await self.check_with_signal(url)
+        return result
+
+    async def fetch_page(self, url, timings=None):
+        """
+        GETs another page of a marketplace, e.g. a search listing (see
+        listing_batch.py), like a local visitor. Returns (html, signal):
+        html is None after a failed request, a CAPTCHA or a non-200
+        response; signal as in check_with_signal().
+        """
+        try:
+            with span(timings, "static_fetch"):
+                response = await self.client.get(url, headers=self.locale_headers(marketplace_of(url)))
+                html = response.text
+        except httpx.HTTPError as e:
+            print(f"Static fetch failed for {url}: {e}")
+            return None, "Error/Timeout" if isinstance(e, httpx.TimeoutException) else None
+        if any(m in html for m in CAPTCHA_PAGE_MARKERS):
+            print(f"CAPTCHA on {url}")
+            return None, "Error/Captcha"
+        if response.status_code != 200:
+            print(f"HTTP {response.status_code} for {url}")
+            return None, "Error/Throttled" if response.status_code in THROTTLE_STATUS_CODES else None
+        return html, "OK"
+
+    async def check_with_signal(self, url, timings=None, selectors=None, snapshots=None):
+        """
+        Like check(), but also returns the pacing signal of the request for
+        AdaptiveRateLimiter.record(): the result status, a pushback status
+        (Error/Captcha, Error/Throttled, Error/Timeout) or None.
+        Fetch / parse / analysis spans go to `timings` (metrics.Timings) if given.
+        `selectors`: optional SelectorProfiler (see selector_profiler.py) that
+        picks the marketplace's selector profile and profiles sampled pages.
+        `snapshots`: optional SnapshotStore that keeps the page (see snapshot_store.py).
+        """
+        target_url = page_url(url)
+        if target_url is None:
+            # Nothing to fetch, and nothing the browser could load either
+            return ("Error/Exception", f"Invalid URL: {url!r}", "Error", "Error", "Error"), None
+        marketplace = marketplace_of(url)
+        try:
+            with span(timings, "static_fetch"):
+                response = await self.client.get(target_url, headers=self.locale_headers(marketplace))
+                html = response.text
+        except httpx.InvalidURL as e:
+            return ("Error/Exception", f"Invalid URL: {e}", "Error", "Error", "Error"), None
+        except httpx.HTTPError as e:
+            print(f"Static fetch failed for {url}: {e}")
+            self.escalations += 1
+            return None, "Error/Timeout" if isinstance(e, httpx.TimeoutException) else None
+
+        args = selectors.extract_args(marketplace) if selectors else EXTRACT_ARGS
+        tree = parse_html(html, timings)
+        data = extract_from_html(tree, timings, args)
+        if args is not EXTRACT_ARGS and not data["prices"]:
+            data = extract_from_html(tree, timings)  # The profile found no price, try every selector
+            args = EXTRACT_ARGS
+        reason = self.escalation_reason(response.status_code, html, data)
+        if reason:
+            print(f"Escalating to browser ({reason}): {url}")
+            self.escalations += 1
+            if reason == "CAPTCHA":
+                return None, "Error/Captcha"
+            if response.status_code in THROTTLE_STATUS_CODES:
+                return None, "Error/Throttled"
+            return None, None
+
+        self.static_hits += 1
+        result = analyze_extraction(data, marketplace, timings)
+        if selectors and selectors.should_sample(result):
+            result = selectors.profile_tree(tree, marketplace, args, result)
+        if snapshots:
+            snapshots.capture(url, html, "static", result, tree=tree)
+        return result, result[0]
@@ -0,0 +1,89 @@
+import json
+import os
+import time
+import uuid
+
+
+class JobJournal:
+    """
+    Append-only JSON-lines journal of completed rows (one iter_products record
+    per line). Lines are flushed to the OS on every append and fsync'ed in
+    batches, so a crash loses at most the last few results. A run that
+    ends normally deletes its journal (finish()): only interrupted runs
+    are resumed. A header line carries the run's id, kept across resumes
+    (e.g. to tell which rows of the run the price history has).
+    """
+
+    def __init__(self, path, fsync_every=20, fsync_interval=2.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.file = None
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.run_id = None
+
+    def load(self):
+        """
+        Returns {position: record} for every complete line in the journal.
+        A torn last line (crash mid-write) is ignored.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "position" not in record:
+                    self.run_id = record.get("run_id", self.run_id)  # Header line
+                    continue
+                records[record["position"]] = record
+        return records
+
+    def open(self, resume=False):
+        """Open for appending; without `resume` any previous journal is discarded."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        # Terminate a torn last line so the next record starts cleanly
+        if resume and self.file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")
+        if not resume or self.run_id is None:
+            self.run_id = uuid.uuid4().hex[:12]
+            self.file.write(json.dumps({"run_id": self.run_id}) + "\n")
+            self.file.flush()
+        return self
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.file and self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def finish(self):
+        """The run is complete: close and delete the journal, nothing is left to resume."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
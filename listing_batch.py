@@ -0,0 +1,185 @@
+import time
+from urllib.parse import quote, urlparse
+
+from extraction import DEAL_SELECTORS, _static_visible, is_captcha_title, is_discount_text, parse_html
+from metrics import span
+from utils import extract_asin
+
+LISTING_BATCH_SIZE = 20  # ASINs looked up per listing page (a search page shows up to ~48 results)
+
+# --- Grid tiles ---
+# Search results, and the carousel cards of deal and storefront pages. A
+# tile carries the ASIN in data-asin; its price block uses the same a-price
+# markup as the product page.
+TILE_SELECTOR = ("[data-component-type='s-search-result'][data-asin], "
+                 ".s-result-item[data-asin], .a-carousel-card[data-asin]")
+SPONSORED_SELECTOR = ".puis-sponsored-label-text, .s-sponsored-label-text"
+# The price to pay; unit prices ("12,49 €/kg") are a-text-price without a strike
+CURRENT_PRICE_SELECTOR = ".a-price:not(.a-text-price) .a-offscreen"
+LIST_PRICE_SELECTOR = ".a-price[data-a-strike='true'] .a-offscreen"
+BADGE_SELECTOR = ".a-badge-label"
+COUPON_SELECTOR = ".s-coupon-unclipped, .s-coupon-clipped"
+# The savings badge, same markup as on the product page
+DISCOUNT_SELECTOR = "span.savingsPercentage"
+TITLE_SELECTOR = "h2"
+
+# Tile badges are reported like the product page selectors they stand for
+AC_BADGE = DEAL_SELECTORS.index("#acBadge_feature_div")
+BEST_SELLER_BADGE = DEAL_SELECTORS.index("#bestSellerBadge_feature_div")
+LABEL_BADGE = DEAL_SELECTORS.index(".a-badge-label")
+AC_BADGE_WORDS = ("choice", "choix", "opción amazon", "scelta amazon", "おすすめ")
+BEST_SELLER_WORDS = ("best seller", "bestseller", "meilleure vente", "más vendido", "più venduto", "ベストセラー")
+# Promotions the tile only hints at: the product page reports them with
+# its own widget (coupon label, deal countdown), so those tiles can't give
+# the product page's Details and the row is checked there
+LIGHTNING_DEAL_WORDS = ("lightning deal", "blitzangebot", "offre éclair", "oferta relámpago", "offerta lampo",
+                        "タイムセール")
+
+
+def listing_url(product_url, asins):
+    """Search page of the product URL's site listing `asins` (Amazon ORs terms joined by '|')."""
+    target_url = product_url if product_url.startswith("http") else f"https://{product_url}"
+    parts = urlparse(target_url)
+    return f"{parts.scheme}://{parts.netloc}/s?k={quote('|'.join(asins))}"
+
+
+def badge_index(text):
+    lowered = text.lower()
+    if any(word in lowered for word in AC_BADGE_WORDS):
+        return AC_BADGE
+    if any(word in lowered for word in BEST_SELLER_WORDS):
+        return BEST_SELLER_BADGE
+    return LABEL_BADGE
+
+
+def _visible_texts(tile, selector):
+    return [" ".join(node.text().split()) for node in tile.css(selector) if _static_visible(node)]
+
+
+def tile_payload(tile):
+    """
+    The {title, prices, badges, discounts} payload analyze_extraction
+    expects, read from one grid tile. None when the tile has no price, or
+    several (e.g. one per format or variation), or a coupon or lightning
+    deal: the product page decides.
+    """
+    current = [text for text in _visible_texts(tile, CURRENT_PRICE_SELECTOR) if text]
+    if len(set(current)) != 1 or any(_visible_texts(tile, COUPON_SELECTOR)):
+        return None
+    labels = [text for text in _visible_texts(tile, BADGE_SELECTOR) if text]
+    if any(word in text.lower() for text in labels for word in LIGHTNING_DEAL_WORDS):
+        return None
+    title = tile.css_first(TITLE_SELECTOR)
+    return {
+        "title": " ".join(title.text().split()) if title else "",
+        "prices": current[:1] + [text for text in _visible_texts(tile, LIST_PRICE_SELECTOR) if text],
+        "badges": [[badge_index(text), text] for text in labels],
+        "discounts": [text for text in _visible_texts(tile, DISCOUNT_SELECTOR) if is_discount_text(text)],
+    }
+
+
+def _sponsored(tile):
+    return "AdHolder" in (tile.attributes.get("class") or "").split() or tile.css_first(SPONSORED_SELECTOR) is not None
+
+
+def parse_listing(html, asins, timings=None):
+    """
+    {asin: payload} for the `asins` with exactly one reading on a listing
+    page. Sponsored tiles only count when there is no organic one; tiles of
+    the same ASIN that disagree leave it out. None for a CAPTCHA page.
+    """
+    tree = parse_html(html, timings)
+    title = tree.css_first("title")
+    if is_captcha_title(title.text() if title else ""):
+        return None
+    with span(timings, "price_scan"):
+        wanted = set(asins)
+        tiles = {}
+        for tile in tree.css(TILE_SELECTOR):
+            asin = (tile.attributes.get("data-asin") or "").strip().upper()
+            if asin in wanted:
+                tiles.setdefault(asin, []).append(tile)
+        found = {}
+        for asin, candidates in tiles.items():
+            organic = [tile for tile in candidates if not _sponsored(tile)]
+            payloads = [tile_payload(tile) for tile in organic or candidates]
+            readings = {None if p is None else (tuple(p["prices"]), tuple(map(tuple, p["badges"])), tuple(p["discounts"]))
+                        for p in payloads}
+            if len(readings) == 1 and None not in readings:
+                found[asin] = payloads[0]
+    return found
+
+
+# --- Batching ---
+
+class ListingBatch:
+    """Rows of one site looked up together on a listing page: (position, url, key, asin)."""
+
+    def __init__(self, url, rows):
+        self.url = url
+        self.rows = rows
+        self.queued_at = time.perf_counter()
+
+
+class ListingBatcher:
+    """
+    Groups the rows iter_products has to check by site into ListingBatches
+    of up to `size` ASINs, so one listing page load covers many products
+    instead of one /dp/ page each. Rows whose ASIN is not on the page, or
+    not unambiguously, go back to the per-product check. Keeps the counts
+    for the run summary.
+    """
+
+    def __init__(self, size=LISTING_BATCH_SIZE):
+        self.size = max(1, int(size))
+        self.groups = {}  # listing_url of the site -> {asin: [rows]}
+        self.pages = 0
+        self.found = 0
+        self.fallbacks = 0
+
+    def accepts(self, url):
+        return extract_asin(url) is not None
+
+    def add(self, position, url, key):
+        """Adds a row (see accepts); returns its group as a ListingBatch once it has `size` ASINs."""
+        asin = extract_asin(url)
+        site = listing_url(url, [])
+        group = self.groups.setdefault(site, {})
+        group.setdefault(asin, []).append((position, url, key, asin))
+        if len(group) >= self.size:
+            return self._batch(self.groups.pop(site))
+        return None
+
+    def flush(self):
+        """ListingBatches of the groups not full yet."""
+        groups, self.groups = self.groups, {}
+        return [self._batch(group) for group in groups.values()]
+
+    def _batch(self, group):
+        rows = [row for rows in group.values() for row in rows]
+        return ListingBatch(listing_url(rows[0][1], list(group)), rows)
+
+    def resolve(self, batch, html, timings=None):
+        """
+        ([(row, payload)], [row]): the batch's rows read from the listing
+        page `html`, and those to check on their product page (all of them
+        when html is None, i.e. the page could not be loaded).
+        """
+        found = parse_listing(html, {row[3] for row in batch.rows}, timings) if html is not None else None
+        found = found or {}
+        resolved = [(row, found[row[3]]) for row in batch.rows if row[3] in found]
+        fallbacks = [row for row in batch.rows if row[3] not in found]
+        self.pages += 1
+        self.found += len(resolved)
+        self.fallbacks += len(fallbacks)
+        return resolved, fallbacks
+
+    def summary(self):
+        rows = self.found + self.fallbacks
+        return {
+            "pages": self.pages,
+            "found": self.found,
+            "fallbacks": self.fallbacks,
+            # Listing pages plus product pages of the fallbacks, per row
+            "loads_per_row": round((self.pages + self.fallbacks) / rows, 3) if rows else None,
+        }
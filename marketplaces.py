@@ -0,0 +1,146 @@
+from price_parser import MARKETPLACE_CURRENCIES
+from result_cache import cache_key
+from utils import extract_asin, marketplace_of
+
+MARKETPLACE_COLUMN = "Marketplace"
+
+# Marketplace domain suffix -> UI label, browser locale / timezone and the
+# cookie Amazon keeps the display language in
+MARKETPLACES = {
+    "de": {"label": "🇩🇪 Germany (amazon.de)", "locale": "de-DE", "timezone": "Europe/Berlin",
+           "language_cookie": "lc-acbde"},
+    "es": {"label": "🇪🇸 Spain (amazon.es)", "locale": "es-ES", "timezone": "Europe/Madrid",
+           "language_cookie": "lc-acbes"},
+    "fr": {"label": "🇫🇷 France (amazon.fr)", "locale": "fr-FR", "timezone": "Europe/Paris",
+           "language_cookie": "lc-acbfr"},
+    "it": {"label": "🇮🇹 Italy (amazon.it)", "locale": "it-IT", "timezone": "Europe/Rome",
+           "language_cookie": "lc-acbit"},
+    "co.uk": {"label": "🇬🇧 United Kingdom (amazon.co.uk)", "locale": "en-GB", "timezone": "Europe/London",
+              "language_cookie": "lc-acbuk"},
+    "com": {"label": "🇺🇸 United States (amazon.com)", "locale": "en-US", "timezone": "America/New_York",
+            "language_cookie": "lc-main"},
+    "ca": {"label": "🇨🇦 Canada (amazon.ca)", "locale": "en-CA", "timezone": "America/Toronto",
+           "language_cookie": "lc-acbca"},
+    "co.jp": {"label": "🇯🇵 Japan (amazon.co.jp)", "locale": "ja-JP", "timezone": "Asia/Tokyo",
+              "language_cookie": "lc-acbjp"},
+    "com.mx": {"label": "🇲🇽 Mexico (amazon.com.mx)", "locale": "es-MX", "timezone": "America/Mexico_City",
+               "language_cookie": "lc-acbmx"},
+}
+
+# Short names people write in a Marketplace column
+MARKETPLACE_ALIASES = {"uk": "co.uk", "gb": "co.uk", "us": "com", "usa": "com", "jp": "co.jp", "mx": "com.mx"}
+
+# Per-marketplace columns of the wide report, in this order
+WIDE_COLUMNS = ["Promo Status", "Current Price", "Normal Price", "Discount",
+                "Current Price Value", "Currency", "Discount %"]
+
+
+def normalize_marketplace(value, default=None):
+    """'DE', 'amazon.de', 'www.amazon.co.uk', a product URL or 'uk' -> 'de' / 'co.uk'; blank -> default."""
+    if value is None or (isinstance(value, float) and value != value):  # None or NaN
+        return default
+    text = str(value).strip().lower()
+    if not text or text == "<na>":
+        return default
+    if "amazon." in text:
+        text = marketplace_of(text)
+    text = text.strip(".")
+    return MARKETPLACE_ALIASES.get(text, text)
+
+
+def product_url(marketplace, asin):
+    return f"https://www.amazon.{marketplace}/dp/{asin}"
+
+
+# --- Locale and currency ---
+
+def accept_language(marketplace):
+    """Accept-Language header of a marketplace's locale, e.g. 'de-DE,de;q=0.9,en;q=0.8'; None if unknown."""
+    info = MARKETPLACES.get(marketplace)
+    if not info:
+        return None
+    language = info["locale"].split("-")[0]
+    return f"{info['locale']},{language};q=0.9,en;q=0.8"
+
+
+def preference_cookies(marketplace):
+    """
+    Cookies that pin a marketplace's display currency and language (so
+    prices are not converted for a foreign visitor), in Playwright's
+    add_cookies format. Empty for hosts that are not Amazon marketplaces.
+    """
+    info = MARKETPLACES.get(marketplace)
+    if not info:
+        return []
+    domain = f".amazon.{marketplace}"
+    cookies = [{"name": info["language_cookie"], "value": info["locale"].replace("-", "_"),
+                "domain": domain, "path": "/"}]
+    currency = MARKETPLACE_CURRENCIES.get(marketplace)
+    if currency:
+        cookies.append({"name": "i18n-prefs", "value": currency, "domain": domain, "path": "/"})
+    return cookies
+
+
+def context_options(marketplace):
+    """Playwright new_context() options for a marketplace: locale, timezone, Accept-Language."""
+    info = MARKETPLACES.get(marketplace)
+    if not info:
+        return {}
+    return {
+        "locale": info["locale"],
+        "timezone_id": info["timezone"],
+        "extra_http_headers": {"Accept-Language": accept_language(marketplace)},
+    }
+
+
+async def open_context(browser, marketplace, user_agent, storage_state=None):
+    """
+    A browser context that looks like a local visitor of `marketplace`
+    (locale, timezone and currency / language cookies). One per marketplace,
+    so their cookies never mix. `storage_state` restores saved cookies.
+    """
+    context = await browser.new_context(user_agent=user_agent, storage_state=storage_state,
+                                        **context_options(marketplace))
+    cookies = preference_cookies(marketplace)
+    if cookies:
+        await context.add_cookies(cookies)
+    return context
+
+
+# --- Wide report ---
+
+def wide_report(df, columns=()):
+    """
+    One row per product (ASIN, or URL when there is none) with the result of
+    every marketplace side by side: "Promo Status (de)", "Current Price (fr)"...
+    (see WIDE_COLUMNS). `df` is the long report (one row per product and
+    marketplace); the other input `columns` keep their first value.
+    Marketplaces keep their order of first appearance.
+    """
+    if df.empty:
+        return df
+    df = df.copy()
+    if MARKETPLACE_COLUMN not in df.columns:
+        df[MARKETPLACE_COLUMN] = None
+    df[MARKETPLACE_COLUMN] = [normalize_marketplace(m) or marketplace_of(url)
+                              for m, url in zip(df[MARKETPLACE_COLUMN], df["URL"])]
+    if "ASIN" in df.columns:
+        asins = df["ASIN"].astype("string").str.strip().str.upper()
+    else:
+        asins = df["URL"].map(extract_asin).astype("string")
+    df["_product"] = asins.fillna(df["URL"].map(lambda url: cache_key(url)[0]).astype("string"))
+
+    kept = [c for c in columns if c in df.columns and c not in ("URL", MARKETPLACE_COLUMN)]
+    products = df.groupby("_product", sort=False)[kept].first() if kept else None
+    markets = list(dict.fromkeys(df[MARKETPLACE_COLUMN]))
+    values = [c for c in WIDE_COLUMNS if c in df.columns]
+    wide = df.drop_duplicates(["_product", MARKETPLACE_COLUMN], keep="last").pivot(
+        index="_product", columns=MARKETPLACE_COLUMN, values=values)
+    wide = wide.reindex(columns=[(value, market) for market in markets for value in values])
+    wide.columns = [f"{value} ({market})" for value, market in wide.columns]
+    wide = wide.reindex(list(dict.fromkeys(df["_product"])))
+    if products is not None:
+        wide = products.join(wide)
+    if "ASIN" not in wide.columns:
+        wide.insert(0, "ASIN", wide.index)
+    return wide.reset_index(drop=True)
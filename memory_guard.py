@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+
+PAGE_RECYCLE_EVERY = 100  # Navigations before a worker's page is replaced
+CONTEXT_RECYCLE_EVERY = 1000  # Navigations before a marketplace context is replaced (cookies kept)
+DEFAULT_MAX_RSS_MB = 1500  # Recycle every context when the process tree uses more than this
+RSS_COOLDOWN = 60  # Seconds between two memory-pressure recycles
+SAMPLE_INTERVAL = 5.0  # Seconds between memory samples
+MAX_SAMPLES = 720  # Samples kept; older ones are thinned out on long runs
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# --- Measuring ---
+
+def _rss(pid):
+    """Resident set size of `pid` in bytes from /proc (0 if it is gone)."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _descendants(pid):
+    """Every process started by `pid`, directly or not (Playwright driver, Chromium...)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # "pid (comm) state ppid ...", comm may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found = []
+    stack = list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        found.append(child)
+        stack.extend(children.get(child, []))
+    return found
+
+
+def memory_usage():
+    """
+    (own RSS, RSS of all child processes) in MB for this process, e.g. the
+    Python interpreter and the Playwright driver + Chromium processes it
+    started. Child RSS counts shared pages once per process, so it is an
+    upper bound. Without /proc (macOS, Windows) only the peak RSS of this
+    process is known: (peak, None).
+    """
+    if os.path.isdir("/proc/self"):
+        pid = os.getpid()
+        return _rss(pid) / 2 ** 20, sum(_rss(child) for child in _descendants(pid)) / 2 ** 20
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2 ** 20 if os.uname().sysname == "Darwin" else 2 ** 10), None
+    except (ImportError, AttributeError):
+        return None, None
+
+
+# --- Recycling ---
+
+class RecyclePolicy:
+    """
+    When iter_products replaces browser pages and contexts, so Chromium
+    memory doesn't grow with the length of the run:
+    a worker's page every `pages_every` navigations, a marketplace's
+    context every `contexts_every` navigations, and every context when the
+    MemoryWatchdog sees the process tree above `max_rss_mb` (at most once
+    per `cooldown` seconds). A replaced context hands its cookies to the
+    new one and is closed once its last page is. None disables a rule.
+    """
+
+    def __init__(self, pages_every=PAGE_RECYCLE_EVERY, contexts_every=CONTEXT_RECYCLE_EVERY,
+                 max_rss_mb=DEFAULT_MAX_RSS_MB, cooldown=RSS_COOLDOWN):
+        self.pages_every = pages_every
+        self.contexts_every = contexts_every
+        self.max_rss_mb = max_rss_mb
+        self.cooldown = cooldown
+        self.pressure = False  # Set by the watchdog, cleared once the contexts are replaced
+        self.last_pressure = None
+        self.pages_recycled = 0
+        self.contexts_recycled = 0
+        self.pressure_recycles = 0
+
+    def page_due(self, navigations):
+        return bool(self.pages_every) and navigations >= self.pages_every
+
+    def context_due(self, navigations):
+        return bool(self.contexts_every) and navigations >= self.contexts_every
+
+    def observe(self, total_mb):
+        """Watchdog sample: flags memory pressure above max_rss_mb, outside the cooldown."""
+        if not self.max_rss_mb or total_mb is None or total_mb < self.max_rss_mb:
+            return False
+        now = time.monotonic()
+        if self.last_pressure is not None and now - self.last_pressure < self.cooldown:
+            return False
+        self.last_pressure = now
+        self.pressure = True
+        self.pressure_recycles += 1
+        print(f"🧠 Memory at {total_mb:.0f} MB (limit {self.max_rss_mb} MB), recycling browser contexts")
+        return True
+
+    def summary(self):
+        return {
+            "pages_recycled": self.pages_recycled,
+            "contexts_recycled": self.contexts_recycled,
+            "pressure_recycles": self.pressure_recycles,
+        }
+
+
+class MemoryWatchdog:
+    """
+    Samples the memory of this process and its children (see memory_usage)
+    every `interval` seconds while a run is going, and passes each sample
+    to `policy.observe()` (a RecyclePolicy) if given. Keeps up to
+    MAX_SAMPLES samples for the run summary and the app's memory chart.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, policy=None):
+        self.interval = interval
+        self.policy = policy
+        self.samples = []  # (seconds since start, own MB, children MB)
+        self.peak_mb = 0.0
+        self.started = None
+        self.task = None
+
+    def sample(self):
+        own, children = memory_usage()
+        if own is None:
+            return None
+        if self.started is None:
+            self.started = time.monotonic()
+        total = own + (children or 0)
+        self.samples.append((round(time.monotonic() - self.started, 1), round(own, 1),
+                             None if children is None else round(children, 1)))
+        if len(self.samples) > MAX_SAMPLES:
+            # Every other sample of the older half; the run stays covered end to end
+            half = len(self.samples) // 2
+            self.samples = self.samples[:half:2] + self.samples[half:]
+        self.peak_mb = max(self.peak_mb, total)
+        if self.policy:
+            self.policy.observe(total)
+        return total
+
+    async def _run(self):
+        while True:
+            # /proc reads are fast, but don't stall the loop on a busy machine
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.sample()  # The end of the run
+
+    def summary(self):
+        """Start / peak / end memory (MB) of the run, or None if it can't be measured."""
+        if not self.samples:
+            return None
+        first, last = self.samples[0], self.samples[-1]
+        return {
+            "start_mb": round(first[1] + (first[2] or 0)),
+            "peak_mb": round(self.peak_mb),
+            "end_mb": round(last[1] + (last[2] or 0)),
+            "browser_peak_mb": round(max(s[2] or 0 for s in self.samples)) if first[2] is not None else None,
+            "samples": len(self.samples),
+        }
+
+    def frame(self):
+        """Samples as a DataFrame (seconds, python_mb, browser_mb) for charts."""
+        import pandas as pd
+
+        return pd.DataFrame(self.samples, columns=["seconds", "python_mb", "browser_mb"])
@@ -0,0 +1,150 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Phases recorded per URL, in pipeline order
+PHASES = [
+    "queue_wait",       # Waiting in the work queue for a free worker
+    "rate_limit_wait",  # Pacing sleep before the request
+    "static_fetch",     # HTTP tier GET
+    "static_parse",     # HTTP tier HTML parsing
+    "navigation",       # page.goto
+    "ready_wait",       # Waiting for the price / buy-box block
+    "extract",          # page.evaluate round-trip
+    "captcha_check",
+    "price_scan",
+    "badge_scan",
+    "discount_scan",
+    "analysis",         # Python-side badge / smart-price logic
+]
+
+# Histogram buckets (seconds) for the Prometheus snapshot
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def timing_column(phase):
+    return f"Time {phase.replace('_', ' ').title()} (s)"
+
+
+class Timings:
+    """Timing spans (seconds) of one URL check. Cheap enough to leave on."""
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, phase, seconds):
+        self.spans[phase] = self.spans.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def span(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def columns(self):
+        """{column name: seconds} for every phase, as extra DataFrame columns."""
+        return {timing_column(phase): round(self.spans[phase], 4) if phase in self.spans else None
+                for phase in PHASES}
+
+
+@contextmanager
+def span(timings, phase):
+    """timings.span(phase), or a no-op when timings is None."""
+    if timings is None:
+        yield
+    else:
+        with timings.span(phase):
+            yield
+
+
+class TraceWriter:
+    """JSON-lines trace: one line per checked URL with its status and spans."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record, timings):
+        line = {
+            "ts": time.time(),
+            "position": record["position"],
+            "url": record["URL"],
+            "status": record["Promo Status"],
+            "spans": {phase: round(seconds, 6) for phase, seconds in timings.spans.items()},
+        }
+        self.file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class PhaseMetrics:
+    """
+    Aggregated counters and per-phase histograms, rendered in the Prometheus
+    text exposition format (e.g. for the node_exporter textfile collector).
+    """
+
+    def __init__(self):
+        self.checks = {}
+        self.sums = {}
+        self.counts = {}
+        self.buckets = {}
+
+    def observe(self, status, timings):
+        self.checks[status] = self.checks.get(status, 0) + 1
+        for phase, seconds in timings.spans.items():
+            self.sums[phase] = self.sums.get(phase, 0.0) + seconds
+            self.counts[phase] = self.counts.get(phase, 0) + 1
+            buckets = self.buckets.setdefault(phase, [0] * len(BUCKETS))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+
+    def merge(self, other):
+        """Add the counts of another PhaseMetrics (e.g. from a shard process)."""
+        for status, count in other.checks.items():
+            self.checks[status] = self.checks.get(status, 0) + count
+        for phase, count in other.counts.items():
+            self.sums[phase] = self.sums.get(phase, 0.0) + other.sums[phase]
+            self.counts[phase] = self.counts.get(phase, 0) + count
+            buckets = self.buckets.setdefault(phase, [0] * len(BUCKETS))
+            for i, value in enumerate(other.buckets[phase]):
+                buckets[i] += value
+
+    def render(self):
+        lines = [
+            "# HELP promo_checks_total Completed product checks by result status.",
+            "# TYPE promo_checks_total counter",
+        ]
+        for status, count in sorted(self.checks.items()):
+            lines.append(f'promo_checks_total{{status="{status}"}} {count}')
+
+        lines += [
+            "# HELP promo_phase_seconds Time spent per check phase.",
+            "# TYPE promo_phase_seconds histogram",
+        ]
+        for phase in PHASES:
+            if phase not in self.counts:
+                continue
+            for bound, count in zip(BUCKETS, self.buckets[phase]):
+                lines.append(f'promo_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {count}')
+            lines.append(f'promo_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {self.counts[phase]}')
+            lines.append(f'promo_phase_seconds_sum{{phase="{phase}"}} {self.sums[phase]:.6f}')
+            lines.append(f'promo_phase_seconds_count{{phase="{phase}"}} {self.counts[phase]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomically write the snapshot, so scrapers never see a partial file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """{phase: mean seconds} for console output."""
+        return {phase: self.sums[phase] / self.counts[phase] for phase in PHASES if phase in self.counts}
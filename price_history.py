@@ -0,0 +1,288 @@
+import glob
+import os
+import time
+import uuid
+from urllib.parse import quote
+
+import pandas as pd
+
+from report_writer import ReportWriter
+from result_cache import cache_key
+
+DEFAULT_HISTORY_DIR = "price_history"
+FILE_INTERVAL = 300.0  # A recording run moves its files into place every N seconds
+
+# Columns of PriceHistory.summary()
+SUMMARY_COLUMNS = [
+    "asin", "marketplace", "observations", "lowest_price", "lowest_price_at",
+    "promo_frequency", "last_price", "currency", "last_status", "last_seen", "last_change",
+]
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise RuntimeError("The price history needs pyarrow: pip install pyarrow")
+    return pa, ds
+
+
+class PriceHistory:
+    """
+    Append-only history of every check, stored as Parquet files partitioned
+    by observation date and marketplace. Queries only read the partitions
+    and columns they need (predicate pushdown / column pruning through
+    pyarrow.dataset), so they stay fast over millions of observations.
+    A run writes a file per partition it touches every few minutes (see
+    HistoryRecorder).
+    """
+
+    def __init__(self, root=DEFAULT_HISTORY_DIR):
+        self.root = root
+        self.pa, self.ds = _arrow()
+        pa = self.pa
+        self.schema = pa.schema([
+            ("observed_at", pa.timestamp("s", tz="UTC")),
+            ("run_id", pa.string()),
+            ("asin", pa.string()),
+            ("url", pa.string()),
+            ("status", pa.string()),
+            ("current_price", pa.float64()),
+            ("normal_price", pa.float64()),
+            ("currency", pa.string()),
+            ("discount_pct", pa.float64()),
+            # Hive partition directories: date=2026-01-31/marketplace=de/...
+            ("date", pa.string()),
+            ("marketplace", pa.string()),
+        ])
+        self.partition_fields = ["date", "marketplace"]
+        self.partitioning = self.ds.partitioning(
+            pa.schema([(name, pa.string()) for name in self.partition_fields]), flavor="hive"
+        )
+        # The columns stored in the files; the partition values live in the paths
+        self.file_schema = pa.schema([f for f in self.schema if f.name not in self.partition_fields])
+
+    def __getstate__(self):
+        # Picklable for sharded runs: worker processes rebuild it from the path
+        return {"root": self.root}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"])
+
+    # --- Writing ---
+
+    def observation_frame(self, df, run_id, observed_at=None):
+        """Report rows (URL, Promo Status and the typed price columns from add_price_columns) as observations."""
+        observed_at = pd.Timestamp(observed_at if observed_at is not None else time.time(), unit="s", tz="UTC")
+        run_id = run_id or uuid.uuid4().hex[:12]
+        keys = [cache_key(url) for url in df["URL"]]
+
+        frame = pd.DataFrame({
+            "observed_at": observed_at.floor("s"),
+            "run_id": run_id,
+            "asin": [asin for asin, _ in keys],
+            "url": df["URL"].astype("string"),
+            "status": df["Promo Status"].astype("string"),
+            "current_price": df.get("Current Price Value"),
+            "normal_price": df.get("Normal Price Value"),
+            "currency": df.get("Currency"),
+            "discount_pct": df.get("Discount %"),
+            "date": observed_at.strftime("%Y-%m-%d"),
+            "marketplace": [marketplace or "unknown" for _, marketplace in keys],
+        }).reset_index(drop=True)
+        return frame
+
+    def partition_dir(self, date, marketplace):
+        # Same URI encoding of the values as pyarrow's hive partitioning
+        return os.path.join(self.root, f"date={quote(date, safe='')}", f"marketplace={quote(marketplace, safe='')}")
+
+    def append(self, df, run_id=None, observed_at=None):
+        """
+        Append report rows as observations in one go (one file per
+        partition). Returns the rows written. Streamed results go through
+        a recorder() instead.
+        """
+        if not len(df):
+            return 0
+        run_id = run_id or uuid.uuid4().hex[:12]
+        frame = self.observation_frame(df, run_id, observed_at)
+        table = self.pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+
+        self.ds.write_dataset(
+            table, self.root, format="parquet", partitioning=self.partitioning,
+            basename_template=f"{run_id}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return len(frame)
+
+    def recorder(self, run_id=None, **kwargs):
+        """A ReportWriter-style sink: add(record) for each result, close() at the end."""
+        return HistoryRecorder(self, run_id, **kwargs)
+
+    # --- Queries ---
+
+    def _dataset(self):
+        return self.ds.dataset(self.root, format="parquet", partitioning=self.partitioning, schema=self.schema)
+
+    def observations(self, asins=None, marketplace=None, days=None, columns=None, run_id=None):
+        """
+        Observations as a DataFrame, filtered on ASINs, marketplace, the
+        last `days` days and the run. Only the requested `columns` are read.
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns or self.schema.names)
+        field = self.ds.field
+        conditions = []
+        if days is not None:
+            since = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=days)).strftime("%Y-%m-%d")
+            conditions.append(field("date") >= since)  # Prunes whole date partitions
+        if marketplace:
+            conditions.append(field("marketplace") == marketplace)
+        if asins is not None:
+            conditions.append(field("asin").isin(list(asins)))
+        if run_id is not None:
+            conditions.append(field("run_id") == run_id)
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+        return self._dataset().to_table(columns=columns, filter=condition).to_pandas()
+
+    def summary(self, days=30, marketplace=None, asins=None):
+        """
+        One row per ASIN and marketplace over the last `days` days: lowest
+        price (and when), promo frequency, last price / status and the last
+        time the price or status changed.
+        """
+        obs = self.observations(
+            asins=asins, marketplace=marketplace, days=days,
+            columns=["observed_at", "asin", "marketplace", "status", "current_price", "currency"],
+        )
+        if obs.empty:
+            return pd.DataFrame(columns=SUMMARY_COLUMNS)
+        keys = ["asin", "marketplace"]
+        obs = obs.sort_values(keys + ["observed_at"], kind="stable").reset_index(drop=True)
+        obs["active"] = obs["status"] == "ACTIVE"
+        groups = obs.groupby(keys, sort=False)
+
+        # A change is an observation whose price or status differs from the
+        # previous observation of the same ASIN (rows are sorted per ASIN)
+        same_item = (obs["asin"] == obs["asin"].shift()) & (obs["marketplace"] == obs["marketplace"].shift())
+        price = obs["current_price"].fillna(-1.0)
+        changed = same_item & ((price != price.shift()) | (obs["status"] != obs["status"].shift()))
+
+        result = groups.agg(
+            observations=("status", "size"),
+            lowest_price=("current_price", "min"),
+            promo_frequency=("active", "mean"),
+            last_price=("current_price", "last"),
+            currency=("currency", "last"),
+            last_status=("status", "last"),
+            last_seen=("observed_at", "last"),
+        )
+        priced = obs.loc[obs["current_price"].notna(), keys + ["current_price", "observed_at"]]
+        lowest = priced.sort_values("current_price", kind="stable").drop_duplicates(keys)
+        result["lowest_price_at"] = lowest.set_index(keys)["observed_at"].reindex(result.index)
+        result["last_change"] = obs.loc[changed].groupby(keys)["observed_at"].last().reindex(result.index)
+        return result.reset_index()[SUMMARY_COLUMNS]
+
+    def price_series(self, asin, marketplace=None, days=90):
+        """Price and status over time for one ASIN (for charts)."""
+        obs = self.observations(
+            asins=[asin], marketplace=marketplace, days=days,
+            columns=["observed_at", "marketplace", "status", "current_price", "normal_price"],
+        )
+        return obs.sort_values("observed_at").reset_index(drop=True)
+
+
+class HistoryRecorder(ReportWriter):
+    """
+    Batches streamed results (with their typed price columns, see
+    ReportWriter) into a PriceHistory, one row group per batch_size rows.
+    Each partition the run touches gets one file per `file_interval`
+    seconds, not one per batch: many small files would make every query
+    open them all. Open files are hidden (dot-prefixed, which
+    pyarrow.dataset skips) until they are moved into place, so queries
+    never see a file without its footer; a killed run loses at most its
+    last interval (which a resumed run records again, see iter_products)
+    and the next recorder deletes the hidden files it left.
+    """
+
+    def __init__(self, history, run_id=None, file_interval=None, **kwargs):
+        super().__init__(None, **kwargs)
+        self.history = history
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.file_interval = FILE_INTERVAL if file_interval is None else file_interval
+        self.writers = {}  # (date, marketplace) -> (ParquetWriter, hidden path, final path)
+        self.last_finalize = time.monotonic()
+        self.remove_stale_files()
+
+    def remove_stale_files(self):
+        """Delete the hidden files of recorders whose process is gone (killed runs)."""
+        for path in glob.glob(os.path.join(self.history.root, "*", "*", ".*.parquet.tmp")):
+            try:
+                pid = int(os.path.basename(path).split(".")[-3])
+            except ValueError:
+                continue
+            if not _process_alive(pid):
+                print(f"🧹 Removing the unfinished history file of a killed run: {path}")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def add(self, record):
+        if not self.ready and not self.writers:
+            self.last_finalize = time.monotonic()  # A new chunk starts with this row
+        # Arrival order is fine here, no need to wait for earlier rows
+        self.ready.append(record)
+        if len(self.ready) >= self.batch_size:
+            self.flush()
+        if time.monotonic() - self.last_finalize >= self.file_interval:
+            self.finalize()
+
+    def write_frame(self, df):
+        if not len(df):
+            return
+        import pyarrow.parquet as pq
+
+        frame = self.history.observation_frame(df, self.run_id)
+        for (date, marketplace), rows in frame.groupby(self.history.partition_fields, sort=False):
+            entry = self.writers.get((date, marketplace))
+            if entry is None:
+                directory = self.history.partition_dir(date, marketplace)
+                os.makedirs(directory, exist_ok=True)
+                name = f"{self.run_id}-{uuid.uuid4().hex[:8]}"
+                hidden = os.path.join(directory, f".{name}.{os.getpid()}.parquet.tmp")
+                entry = self.writers[(date, marketplace)] = (
+                    pq.ParquetWriter(hidden, self.history.file_schema), hidden,
+                    os.path.join(directory, f"{name}.parquet"))
+            table = self.history.pa.Table.from_pandas(
+                rows.drop(columns=self.history.partition_fields), schema=self.history.file_schema,
+                preserve_index=False)
+            entry[0].write_table(table)
+        self.rows_written += len(df)
+
+    def finalize(self):
+        """Write the buffered rows and move the open files into place; later rows go to new ones."""
+        self.flush()
+        for writer, hidden, path in self.writers.values():
+            writer.close()
+            os.replace(hidden, path)
+        self.writers = {}
+        self.last_finalize = time.monotonic()
+
+    def _close(self):
+        self.finalize()
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        return True  # Signal 0 is CTRL_C_EVENT there: no safe probe, keep the files
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but is another user's
+    return True
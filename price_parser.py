@@ -0,0 +1,193 @@
+import re
+
+# Currency symbols / codes, matched longest first ("MX$" before "$")
+CURRENCY_SYMBOLS = {
+    "MX$": "MXN",
+    "CDN$": "CAD",
+    "CA$": "CAD",
+    "C$": "CAD",
+    "US$": "USD",
+    "A$": "AUD",
+    "AU$": "AUD",
+    "R$": "BRL",
+    "S$": "SGD",
+    "€": "EUR",
+    "£": "GBP",
+    "¥": "JPY",
+    "￥": "JPY",
+    "₹": "INR",
+    "zł": "PLN",
+    "kr": "SEK",
+    "TL": "TRY",
+    "EUR": "EUR",
+    "GBP": "GBP",
+    "USD": "USD",
+    "JPY": "JPY",
+    "MXN": "MXN",
+    "CAD": "CAD",
+    "$": "USD",
+}
+
+# Marketplace domain -> local currency (used when the text has no symbol,
+# and to resolve a bare "$" on amazon.ca / amazon.com.mx / amazon.com.au)
+MARKETPLACE_CURRENCIES = {
+    "de": "EUR",
+    "es": "EUR",
+    "fr": "EUR",
+    "it": "EUR",
+    "nl": "EUR",
+    "com.be": "EUR",
+    "ie": "EUR",
+    "co.uk": "GBP",
+    "com": "USD",
+    "ca": "CAD",
+    "com.mx": "MXN",
+    "com.au": "AUD",
+    "com.br": "BRL",
+    "co.jp": "JPY",
+    "in": "INR",
+    "pl": "PLN",
+    "se": "SEK",
+    "com.tr": "TRY",
+    "sg": "SGD",
+}
+DOLLAR_CURRENCIES = {"USD", "CAD", "MXN", "AUD", "SGD"}
+
+# Spaces used as thousands separators or between symbol and amount
+SPACE_CHARS = "\u0020\u00a0\u202f\u2009\u2007"
+SPACE_PATTERN = re.compile(f"[{SPACE_CHARS}]+")
+NUMBER_PATTERN = re.compile(r"\d[\d.,' ]*\d|\d")
+CURRENCY_PATTERN = re.compile(
+    "|".join(re.escape(symbol) for symbol in sorted(CURRENCY_SYMBOLS, key=len, reverse=True))
+)
+MARKETPLACE_PATTERN = r"amazon\.([a-z.]+?)(?:[/:?#]|$)"
+
+
+def _resolve_currency(symbol, marketplace):
+    local = MARKETPLACE_CURRENCIES.get(marketplace)
+    if symbol is None:
+        return local
+    currency = CURRENCY_SYMBOLS[symbol]
+    if symbol == "$" and local in DOLLAR_CURRENCIES:
+        return local
+    return currency
+
+
+def _decimal_separator(number):
+    """
+    "," / "." if that character is the decimal separator of `number`, else None.
+    The last of two different separators is the decimal one (1.234,56 / 1,234.56).
+    A single separator followed by exactly three digits is a thousands
+    separator (1.234 -> 1234, ¥1,980 -> 1980); with one or two digits it is
+    the decimal separator (12,34 / 12.5).
+    """
+    comma, dot = number.rfind(","), number.rfind(".")
+    if comma >= 0 and dot >= 0:
+        return "," if comma > dot else "."
+    sep = "," if comma >= 0 else "." if dot >= 0 else None
+    if sep is None or number.count(sep) > 1:
+        return None
+    return sep if len(number) - number.rfind(sep) - 1 in (1, 2) else None
+
+
+def parse_price(text, marketplace=None):
+    """
+    Parse a displayed price into (value, currency_code).
+    `marketplace` (de, es, co.uk, co.jp, com.mx, ...) is a locale hint for
+    the currency when the text has no symbol or only a bare "$".
+    Returns (None, currency) when no amount can be read.
+    """
+    if text is None or (isinstance(text, float) and text != text):  # None / NaN
+        return None, MARKETPLACE_CURRENCIES.get(marketplace)
+    text = SPACE_PATTERN.sub(" ", str(text)).strip()
+
+    symbol = CURRENCY_PATTERN.search(text)
+    currency = _resolve_currency(symbol.group(0) if symbol else None, marketplace)
+
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return None, currency
+    number = match.group(0).replace(" ", "").replace("'", "")
+    sep = _decimal_separator(number)
+    if sep is None:
+        number = number.replace(",", "").replace(".", "")
+    else:
+        other = "." if sep == "," else ","
+        number = number.replace(other, "").replace(sep, ".")
+    return float(number), currency
+
+
+def parse_price_column(values, marketplace=None):
+    """
+    Vectorized parse_price over a whole column.
+    `marketplace` is a single domain or a Series of domains aligned with
+    `values`. Returns a DataFrame with a float "value" and a "currency" column.
+    """
+    import pandas as pd  # Deferred: the scalar parser is used without pandas
+
+    values = pd.Series(values)
+    text = values.astype("string").str.replace(SPACE_PATTERN.pattern, " ", regex=True).str.strip()
+
+    if isinstance(marketplace, pd.Series):
+        markets = marketplace.reindex(values.index)
+    else:
+        markets = pd.Series(marketplace, index=values.index, dtype="object")
+    local = markets.map(MARKETPLACE_CURRENCIES)
+
+    symbols = text.str.extract(f"({CURRENCY_PATTERN.pattern})", expand=False)
+    currency = symbols.map(CURRENCY_SYMBOLS)
+    bare_dollar = (symbols == "$") & local.isin(DOLLAR_CURRENCIES)
+    currency = currency.mask(bare_dollar, local).fillna(local)
+
+    number = text.str.extract(f"({NUMBER_PATTERN.pattern})", expand=False)
+    number = number.str.replace(" ", "", regex=False).str.replace("'", "", regex=False)
+
+    comma = number.str.rfind(",")
+    dot = number.str.rfind(".")
+    length = number.str.len()
+    both = (comma >= 0) & (dot >= 0)
+    single_comma = (comma >= 0) & (dot < 0) & (number.str.count(",") == 1) & (length - comma - 1).isin([1, 2])
+    single_dot = (dot >= 0) & (comma < 0) & (number.str.count(r"\.") == 1) & (length - dot - 1).isin([1, 2])
+    decimal_comma = (both & (comma > dot)) | single_comma
+    decimal_dot = (both & (dot > comma)) | single_dot
+
+    digits_only = number.str.replace(r"[.,]", "", regex=True)
+    cleaned = digits_only.copy()
+    cleaned[decimal_comma.fillna(False)] = (
+        number.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    )[decimal_comma.fillna(False)]
+    cleaned[decimal_dot.fillna(False)] = number.str.replace(",", "", regex=False)[decimal_dot.fillna(False)]
+
+    return pd.DataFrame({
+        "value": pd.to_numeric(cleaned, errors="coerce").astype("float64"),
+        "currency": currency.astype("object").where(currency.notna(), None),
+    }, index=values.index)
+
+
+def add_price_columns(df):
+    """
+    Add typed numeric columns next to the display strings:
+    "Current Price Value", "Normal Price Value", "Currency" and "Discount %".
+    The marketplace of each row is taken from its URL.
+    """
+    import pandas as pd
+
+    if "URL" in df.columns:
+        markets = df["URL"].astype("string").str.extract(MARKETPLACE_PATTERN, expand=False)
+    else:
+        markets = None
+
+    current = parse_price_column(df["Current Price"], markets)
+    normal = parse_price_column(df["Normal Price"], markets)
+    df["Current Price Value"] = current["value"]
+    df["Normal Price Value"] = normal["value"]
+    df["Currency"] = current["currency"].where(current["value"].notna(), None)
+
+    # Prefer the shown badge ("-17%"), otherwise compute it from the two prices
+    badge = pd.to_numeric(
+        df["Discount"].astype("string").str.extract(r"(\d+(?:[.,]\d+)?)\s*%", expand=False).str.replace(",", "."),
+        errors="coerce",
+    )
+    computed = ((normal["value"] - current["value"]) / normal["value"] * 100).round(0)
+    df["Discount %"] = badge.fillna(computed.where(normal["value"] > current["value"])).astype("float64")
+    return df
@@ -1,316 +1,782 @@
 import asyncio
-import random
-import pandas as pd
 import os
 import sys
-from playwright.async_api import async_playwright
+import time
+from collections import Counter
+from browser_setup import ensure_playwright_browsers
+from extraction import EXTRACT_ARGS, EXTRACT_SCRIPT, READY_SELECTOR, analyze_extraction, is_captcha_title
+from job_journal import JobJournal
+from listing_batch import ListingBatch, ListingBatcher
+from metrics import PHASES, PhaseMetrics, Timings, TraceWriter, span, timing_column
+from price_parser import add_price_columns
+from resource_policy import ResourcePolicy
+from retry_policy import RetryPolicy
+from result_cache import ResultCache, cache_key
+from marketplaces import open_context
+from memory_guard import MemoryWatchdog, RecyclePolicy
+from throttle import AdaptiveRateLimiter, HostRateLimiter
+from utils import batched, host_of, marketplace_of
 
-# Install Playwright browsers if not already installed
-def ensure_playwright_browsers():
-    """Ensure Playwright browsers are installed (for cloud deployment)"""
-    try:
-        # Check if we're in a cloud environment
-        if os.path.exists('/home/appuser'):  # Streamlit Cloud
-            print("Checking for Playwright browsers...")
-            import subprocess
-            result = subprocess.run(
-                [sys.executable, "-m", "playwright", "install", "chromium"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print("✅ Playwright Chromium installed successfully")
-            else:
-                print(f"⚠️ Playwright install output: {result.stdout}")
-                # Try with --with-deps
-                subprocess.run(
-                    [sys.executable, "-m", "playwright", "install", "--with-deps", "chromium"],
-                    check=False
-                )
-    except Exception as e:
-        print(f"Warning: Could not auto-install Playwright browsers: {e}")
-
-# Run installation check on module import
-ensure_playwright_browsers()
+# pandas, Playwright and httpx are imported where they are first needed, so
+# importing this module (every Streamlit cold start) stays in the milliseconds.
+# See benchmarks/import_benchmark.py.
 
 # Constants
 INPUT_FILE = "productos.xlsx"
 OUTPUT_FILE = "reporte_descuentos.xlsx"
+JOURNAL_FILE = "reporte_descuentos.journal.jsonl"
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+DEFAULT_REQUESTS_PER_MINUTE = 20  # Starting budget per host; adaptive pacing moves it from there
+REQUEST_JITTER = 0.5  # Extra random pause (s) so requests don't look robotic
+READY_TIMEOUT_MS = 10000  # Max wait for the price / buy-box block after navigation
+FEED_BATCH_SIZE = 500  # URLs read (and looked up in the cache) at a time
+LANE_READ_AHEAD = 100  # Rows each marketplace lane lets the feeder read ahead of its workers
+TRACE_FILE = "reporte_descuentos.trace.jsonl"
+METRICS_FILE = "reporte_descuentos.prom"
+METRICS_WRITE_EVERY = 50  # Rewrite the Prometheus snapshot every N checks
+RESULT_COLUMNS = ["Promo Status", "Details", "Current Price", "Normal Price", "Discount"]
+ATTEMPTS_COLUMN = "Attempts"  # Checks made for the row in this run (0 = from cache)
+LAST_CHECKED_COLUMN = "Last Checked"  # Re-check mode: when the reported result was fetched
 
-async def check_promotion(page, url):
+async def check_promotion(page, url, timings=None, selectors=None, snapshots=None):
     """
     Navigates to the URL and checks for promotions or discounts.
+    Phase spans are recorded in `timings` (metrics.Timings) when given.
+    `selectors`: optional SelectorProfiler (see selector_profiler.py) that
+    picks the marketplace's selector profile and profiles sampled pages.
+    `snapshots`: optional SnapshotStore that keeps the page unless the check
+    failed (see snapshot_store.py).
+    Makes a single attempt; failed checks are retried by the iter_products
+    scheduler (see retry_policy.py).
     Returns a tuple (status, details, current_price, normal_price, discount_label).
     """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
     try:
         print(f"Checking URL: {url}")
-        
-        # Retry logic for navigation
-        max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                # Add protocol if missing
-                target_url = url if url.startswith("http") else f"https://{url}"
+
+        try:
+            # Add protocol if missing
+            target_url = url if url.startswith("http") else f"https://{url}"
+            with span(timings, "navigation"):
                 await page.goto(target_url, wait_until="domcontentloaded", timeout=60000)
-                break # Success
-            except Exception as e:
-                print(f"Attempt {attempt+1} failed for {url}: {e}")
-                if attempt == max_retries - 1:
-                    return "Error/Timeout", "Timeout loading page (60s)", "N/A", "N/A", "N/A"
-                await asyncio.sleep(2) # Short wait before retry
-        
-        # Simulate human behavior
-        await page.wait_for_timeout(random.randint(2000, 4000))
-        
-        # Check for CAPTCHA title
-        title = await page.title()
-        if "CAPTCHA" in title or "Robot Check" in title:
-            return "Error/Captcha", "Amazon detected unusual traffic", "N/A", "N/A", "N/A"
-
-        promo_detected = False
-        details = []
-        current_price = "Not Found" # Translated
-        
-        # --- 0. EXTRACT CURRENT PRICE (Selling Price) ---
-        # Priority: Look for ".priceToPay" first, as this is the actual active price
-        price_selectors = [
-            ".priceToPay .a-offscreen",                 # Most accurate for deals
-            ".priceToPay span[aria-hidden='true']",     # Backup
-            "#corePrice_feature_div .a-price.priceToPay .a-offscreen",
-            "#corePriceDisplay_desktop_feature_div .a-price.priceToPay .a-offscreen",
-            
-            # Fallbacks (General)
-            "#corePrice_feature_div .a-price .a-offscreen", 
-            ".a-price.a-text-price.a-size-medium .a-offscreen",
-            ".a-price .a-offscreen"
-        ]
-        
-        found_prices = []
-        for selector in price_selectors:
-            elements = await page.query_selector_all(selector)
-            for el in elements:
-                if await el.is_visible():
-                    text = await el.text_content()
-                    if text:
-                        clean_val = text.strip()
-                        # Avoid saving empty strings or non-price text
-                        if any(c.isdigit() for c in clean_val):
-                            found_prices.append(clean_val)
-            
-            # If we found matches with high-priority selectors (priceToPay), stop there
-            if found_prices and "priceToPay" in selector:
-                break
-        
-        # Logic: properly determine which is current vs normal if multiple found
-        # Usually checking the first valid one found by priority selectors is enough
-        if found_prices:
-            current_price = found_prices[0] # Take the best match
-        else:
-            current_price = "Not Found" 
-        
-        # --- 1. Check for deal badges ---
-        deal_selectors = [
-            # Generic Badges
-            ".badge-text", 
-            "#dealBadge",
-            ".a-badge-label", 
-            ".promo-badge",
-            
-            # Coupons & vouchers
-            "#coupon-badge",
-            ".vpc-coupon-label",
-            "label:has-text('Apply coupon')",
-            "label:has-text('Aplicar cupón')", # Keep Spanish too
-            "label:has-text('Apply voucher')",
-            
-            # Limited time deals
-            "#lightning-deal-timer",
-            ".dealPriceText",
-            
-            # Amazon's Choice & Best Seller
-            "#acBadge_feature_div",      # Amazon's Choice container
-            ".ac-badge-wrapper",          # Amazon's Choice wrapper
-            ".ac-keyword-link",           # "Amazon's Choice de..."
-            "#bestSellerBadge_feature_div", # Best Seller container
-            ".zg-badge-body",             # Best Seller body
-        ]
-        
-        for selector in deal_selectors:
-            elements = await page.query_selector_all(selector)
-            for el in elements:
-                if await el.is_visible():
-                    text = await el.text_content()
-                    # Clean up text
-                    clean_text = text.strip().replace("\n", " ") if text else ""
-                    
-                    # Specific check for Amazon's Choice which might have empty text in container
-                    if "acBadge" in selector or "ac-badge" in selector:
-                         promo_detected = True
-                         details.append("Amazon's Choice detected")
-                    elif "bestSeller" in selector:
-                         promo_detected = True
-                         details.append("Best Seller detected")
-                    elif clean_text:
-                        promo_detected = True
-                        details.append(f"Badge: {clean_text[:50]}...")
-
-        # --- Helper: Price Cleaner ---
-        def parse_price(price_str):
-            if not price_str: return 0.0
-            try:
-                # Remove symbols, spaces, keep only digits and separators
-                # Supports 1.234,56 format (European) and 1,234.56 (US)
-                clean = price_str.replace("€", "").replace("$", "").replace("£", "").strip()
-                if "," in clean and "." in clean: # 1.234,56 or 1,234.56
-                    if clean.find(",") > clean.find("."): # 1.234,56 (EU)
-                        clean = clean.replace(".", "").replace(",", ".")
-                    else: # 1,234.56 (US)
-                        clean = clean.replace(",", "")
-                elif "," in clean: # 12,34 (EU)
-                    clean = clean.replace(",", ".")
-                return float(clean)
-            except:
-                return 0.0
-
-        # --- SMART PRICE ANALYSIS ---
-        # Instead of trusting specific selectors, we gather ALL prices in the main block
-        # and use logic: Lowest = Price to Pay, Highest = List/Old Price.
-        
-        found_prices = []
-        raw_price_map = {} # Map float val -> string representation
-        
-        # Broad scan for any price container in the buy box area
-        price_containers = [
-             "#corePrice_feature_div .a-price .a-offscreen",
-             "#corePriceDisplay_desktop_feature_div .a-price .a-offscreen",
-             "#apex_desktop .a-price .a-offscreen",
-             ".a-price .a-offscreen", # Generic fallback
-             ".a-text-price span[aria-hidden='true']" # Strike-through text often here
-        ]
-        
-        for selector in price_containers:
-            elements = await page.query_selector_all(selector)
-            for el in elements:
-                if await el.is_visible():
-                    text = await el.text_content()
-                    if text:
-                        cleaned_text = text.strip()
-                        val = parse_price(cleaned_text)
-                        if val > 0:
-                            found_prices.append(val)
-                            if val not in raw_price_map:
-                                raw_price_map[val] = cleaned_text
-
-        # Determine Prices based on Values
-        current_price_val = 0.0
-        normal_price_val = 0.0
-        
-        current_price = "Not Found"
-        normal_price = "N/A"
-        discount_label = "N/A"
-
-        if found_prices:
-            # Sort unique prices
-            unique_prices = sorted(list(set(found_prices)))
-            
-            # The lowest price is ALWAYS the current selling price
-            current_price_val = unique_prices[0]
-            current_price = raw_price_map[current_price_val]
-            
-            # If we have multiple prices, the highest is likely the list price
-            if len(unique_prices) > 1:
-                potential_normal = unique_prices[-1]
-                # Only accept if it's at least 2% higher to avoid currency glitch
-                if potential_normal > current_price_val * 1.02:
-                    normal_price_val = potential_normal
-                    normal_price = raw_price_map[normal_price_val]
-                    promo_detected = True
-                    details.append(f"Price Drop: {normal_price} -> {current_price}")
-                    
-                    # Calculate discount manually if not found later
-                    calc_discount = int(((normal_price_val - current_price_val) / normal_price_val) * 100)
-                    if discount_label == "N/A":
-                        discount_label = f"-{calc_discount}%"
-
-        # --- Discount Badges (Text Confirmation) ---
-        # Look for explicit percentage badges to double check
+        except Exception as e:
+            print(f"Navigation failed for {url}: {e}")
+            return "Error/Timeout", "Timeout loading page (60s)", "N/A", "N/A", "N/A"
+
+        # Wait for the price / buy-box block (or the CAPTCHA form) instead of a fixed pause;
+        # pacing between requests is handled by the rate limiter
         try:
-            potential_discounts = await page.query_selector_all("span.savingsPercentage, span.a-size-large.a-color-price, div:has-text('%')")
-            for el in potential_discounts:
-                 if await el.is_visible():
-                    text = await el.text_content()
-                    if text and "%" in text and ("-" in text or "off" in text.lower()):
-                        clean_disc = text.strip()
-                        # Update discount label if we found a visual badge (often more reliable than calc)
-                        if len(clean_disc) < 15: # Safety check
-                            discount_label = clean_disc
-                            promo_detected = True
-                            if "Discount Found" not in str(details):
-                                details.append(f"Discount Badge: {discount_label}")
-                            break
-        except:
-            pass
+            with span(timings, "ready_wait"):
+                await page.wait_for_selector(READY_SELECTOR, state="attached", timeout=READY_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            print(f"Price block did not appear within {READY_TIMEOUT_MS / 1000:.0f}s: {url}")
 
-        unique_details = "; ".join(sorted(list(set(details))))
-        
-        if promo_detected:
-            return "ACTIVE", unique_details, current_price, normal_price, discount_label
-        else:
-            return "NO PROMO", "No badges or visible discounts detected", current_price, normal_price, discount_label
+        # Title, prices, badges and discount badges in a single round-trip
+        marketplace = marketplace_of(url)
+        args = selectors.extract_args(marketplace) if selectors else EXTRACT_ARGS
+        with span(timings, "extract"):
+            data = await page.evaluate(EXTRACT_SCRIPT, args)
+            if args is not EXTRACT_ARGS and not data["prices"] and not is_captcha_title(data["title"]):
+                data = await page.evaluate(EXTRACT_SCRIPT, EXTRACT_ARGS)  # The profile found no price
+                args = EXTRACT_ARGS
+        result = analyze_extraction(data, marketplace, timings)
+        if selectors and selectors.should_sample(result):
+            result = await selectors.profile_page(page, marketplace, args, data, result)
+        if snapshots and not result[0].startswith("Error"):
+            try:
+                await snapshots.capture_page(page, url, result)
+            except Exception as e:
+                print(f"Warning: could not store a snapshot of {url}: {e}")
+        return result
 
     except Exception as e:
         print(f"Error checking {url}: {e}")
         return "Error/Exception", str(e), "Error", "Error", "Error"
 
-async def process_products(df, progress_callback=None, headless=True):
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+def make_record(position, url, result, attempts=0):
+    """One streamed result: input position, URL, the RESULT_COLUMNS values and Attempts."""
+    record = {"position": position, "URL": url}
+    record.update(zip(RESULT_COLUMNS, result))
+    record[ATTEMPTS_COLUMN] = attempts
+    return record
+
+async def iter_products(urls, progress_callback=None, headless=True, concurrency=1,
+                        requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                        block_resources=True, resource_policy=None, http_first=True,
+                        cache=None, journal=None, resume=False, adaptive_pacing=True,
+                        rate_limiter=None, browser_pool=None, timing_columns=False,
+                        trace_file=None, metrics=None, metrics_file=None, retry_policy=None,
+                        retries=True, total=None, history=None, recheck=None, pause_gate=None,
+                        selector_profiler=None, snapshots=None, recycle=True, memory_watchdog=None,
+                        listing_batch=None):
+    """
+    Async generator that checks `urls` (any iterable, consumed lazily) and
+    yields one record per URL as soon as it completes (see make_record).
+    Records arrive in completion order; record["position"] is the input index.
+    Memory stays constant: only a few URLs are queued ahead of the workers.
+
+    concurrency: number of URLs checked in parallel (one browser page each)
+    per marketplace host. Every host gets its own lane of workers, so a
+    mixed-marketplace run checks the marketplaces side by side and a slow
+    or throttled one doesn't hold the others' workers.
+    requests_per_minute: request budget per marketplace host (amazon.de and
+    amazon.es are throttled independently). None disables throttling.
+    adaptive_pacing: start at requests_per_minute and adjust it per host (AIMD):
+    faster while pages load cleanly, much slower after CAPTCHAs or timeouts.
+    rate_limiter: pass your own (Adaptive)HostRateLimiter to read its
+    snapshot() / events after the run.
+    Browser pages of a marketplace share one context with its locale and
+    currency cookies (see marketplaces.py).
+    browser_pool: borrow the warm contexts of a BrowserPool (see browser_pool.py)
+    instead of launching Chromium; the generator must then run on the pool's
+    loop (pool.submit / pool.run). The pool's resource policy is used.
+    block_resources: abort images, fonts, media, ads and third-party scripts
+    (see resource_policy.py); pass a ResourcePolicy to customize the rules.
+    http_first: try a plain HTTP fetch first and only use the browser when the
+    static HTML is not enough (see http_fetcher.py). The browser is launched
+    lazily, on the first URL that needs it.
+    cache: optional ResultCache; URLs with a fresh cached result (same ASIN and
+    marketplace) skip fetching entirely, new results are stored in it.
+    journal: path (or JobJournal) of a crash-safe journal of completed records,
+    deleted once the run completes.
+    resume: reload the journal of an interrupted run and skip rows already
+    finished (matched by position and URL; Error rows are checked again)
+    instead of starting from row 0.
+    retries: re-queue checks that failed with a timeout, exception or CAPTCHA
+    after a jittered exponential backoff, within a per-error-class budget
+    (see retry_policy.py). Retries run alongside the rest of the input
+    instead of blocking a worker; only the final attempt is yielded, with
+    its attempt count in record["Attempts"]. Pass a RetryPolicy to change
+    the budgets or to read its counters after the run.
+    timing_columns: add one "Time <phase> (s)" column per phase (see
+    metrics.PHASES) to every record checked in this run.
+    trace_file: append one JSON line per checked URL with its phase spans.
+    metrics: optional PhaseMetrics to aggregate into (read it after the run);
+    metrics_file: where to keep its Prometheus text snapshot up to date.
+    Timing is always on; these options only choose where it is exported.
+    history: optional PriceHistory; every row checked in this run (not
+    cache hits) is appended to it. On resume, rows restored from the
+    journal that the interrupted run could not record are added too.
+    recheck: optional RecheckScheduler (see recheck_scheduler.py) that picks,
+    within its budget, the rows most likely to have changed; the others are
+    reported with their last known result (Attempts 0) and a "Last Checked"
+    column. `urls` is read up front to plan the run.
+    pause_gate: optional asyncio.Event; while it is cleared the workers
+    start no new checks (checks in flight finish), set it to continue.
+    selector_profiler: optional SelectorProfiler (see selector_profiler.py):
+    pages run their marketplace's compiled selector profile, a sample is
+    profiled and audited with every selector, and the profiles are
+    recompiled and saved at the end of the run.
+    snapshots: optional SnapshotStore (see snapshot_store.py) that keeps a
+    compressed copy of every page checked successfully, for replaying the
+    extraction offline later.
+    recycle: replace browser pages / contexts every so many navigations and
+    under memory pressure, keeping their cookies (see memory_guard.py), so
+    long runs hold flat memory. True uses the default RecyclePolicy, pass
+    your own to tune it or False to keep pages for the whole run.
+    memory_watchdog: MemoryWatchdog sampling the memory of this process and
+    Chromium during the run (one is created by default); its start / peak /
+    end figures are part of the run summary.
+    listing_batch: look rows with an ASIN up on search listing pages, this
+    many ASINs per page (True: LISTING_BATCH_SIZE, or pass a ListingBatcher
+    to read its counts after the run), with the static fetcher; only the
+    ASINs not found on the page, or not unambiguously, get a product page
+    check (see listing_batch.py).
+    progress_callback: called with the completed fraction when len(urls) is
+    known, or when `total` (e.g. an estimated row count) is given.
+    """
+    skipped = {}
+    if recheck:
+        urls = list(urls)
+        _, skipped = recheck.plan([cache_key(url) for url in urls])
+    if total is None:
+        try:
+            total = len(urls)
+        except TypeError:
+            pass
+
+    concurrency = max(1, int(concurrency))
+    if rate_limiter:
+        limiter = rate_limiter
+    elif adaptive_pacing:
+        limiter = AdaptiveRateLimiter(requests_per_minute, jitter=REQUEST_JITTER)
+    else:
+        limiter = HostRateLimiter(requests_per_minute, jitter=REQUEST_JITTER)
+    record_signal = getattr(limiter, "record", None)
+    if browser_pool:
+        policy = browser_pool.policy
+    else:
+        policy = (resource_policy or ResourcePolicy()) if block_resources else None
+    if recycle is True:
+        recycle = RecyclePolicy()
+    recycle = recycle or None
+    if memory_watchdog is None:
+        memory_watchdog = MemoryWatchdog()
+    if memory_watchdog.policy is None:
+        memory_watchdog.policy = recycle
+    # Snapshot counters at the start, the summary reports this run only
+    snapshot_counts = (snapshots.captured, snapshots.deduplicated) if snapshots else None
+    policy_counts = policy.totals.as_dict() if policy else None  # A pool's policy outlives the run
+    fetcher = None
+    if http_first:
+        from http_fetcher import StaticFetcher
+        # No pool limit: the lanes' workers bound the open connections
+        fetcher = StaticFetcher(USER_AGENT, max_connections=None)
+    if listing_batch is True:
+        listing_batch = ListingBatcher()
+    elif listing_batch and not isinstance(listing_batch, ListingBatcher):
+        listing_batch = ListingBatcher(listing_batch)
+    listing = listing_batch or None
+    listing_fetcher = fetcher
+    if listing and not fetcher:
+        from http_fetcher import StaticFetcher
+        # Listing pages are server-rendered: no browser needed even without http_first
+        listing_fetcher = StaticFetcher(USER_AGENT, max_connections=None)
+
+    if isinstance(journal, str):
+        journal = JobJournal(journal)
+    finished = journal.load() if journal and resume else {}
+    # Failed rows are checked again, not restored
+    finished = {position: record for position, record in finished.items()
+                if not str(record.get("Promo Status", "")).startswith("Error")}
+    if finished:
+        print(f"Resuming: {len(finished)} rows restored from {journal.path}")
+    if journal:
+        journal.open(resume=resume)
+    if metrics is None:
+        metrics = PhaseMetrics()
+    trace = TraceWriter(trace_file) if trace_file else None
+    # A resumed run keeps its run id (see JobJournal), so its history rows are found again
+    recorder = history.recorder(journal.run_id if journal else None) if history else None
+    # Rows restored from the journal that the interrupted run's history lost
+    # (files not moved into place when it was killed) are recorded now
+    recorded = Counter()
+    if recorder and finished:
+        recorded.update(history.observations(columns=["url"], run_id=recorder.run_id)["url"])
+    if retries and retry_policy is None:
+        retry_policy = RetryPolicy()
+    elif not retries:
+        retry_policy = None
+    # A policy passed in may be shared between runs: the summary counts this one's
+    retry_counts = (dict(retry_policy.scheduled), retry_policy.recovered) if retry_policy else None
+
+    # One lane (work queue + `concurrency` workers) per host, opened when its
+    # first URL is read. The read-ahead budget (LANE_READ_AHEAD per lane)
+    # keeps memory flat however long the input is.
+    lanes = {}
+    lane_rows = {}
+    read_ahead = asyncio.Semaphore(0)
+    lanes_changed = asyncio.Event()
+    out = asyncio.Queue(maxsize=concurrency * 2)
+    done = object()
+
+    # Rows handed to the workers and not final yet (queued, running or
+    # waiting for a retry); the workers stop once the feeder is done and
+    # this drops to zero
+    outstanding = 0
+    feeding_done = False
+    retry_tasks = set()
+
+    def finish_if_idle():
+        if feeding_done and outstanding == 0:
+            for queue in lanes.values():
+                for _ in range(concurrency):
+                    queue.put_nowait(None)
+
+    def lane(host):
+        queue = lanes.get(host)
+        if queue is None:
+            queue = lanes[host] = asyncio.Queue()
+            lane_rows[host] = 0
+            for _ in range(max(concurrency * 2, LANE_READ_AHEAD)):
+                read_ahead.release()
+            tasks.extend(asyncio.create_task(worker(queue)) for _ in range(concurrency))
+            lanes_changed.set()
+        return queue
+
+    async def enqueue(item):
+        queue = lane(host_of(item.url if isinstance(item, ListingBatch) else item[1]))
+        await read_ahead.acquire()
+        await queue.put(item)
+
+    playwright = None
+    browser = None
+    contexts = {}  # marketplace -> current browser context
+    context_pages = {}  # context -> pages of this run open in it
+    context_navigations = {}  # context -> navigations made in it
+    retired = set()  # Recycled contexts: no new pages, closed once their last page is
+    storage_states = {}  # marketplace -> cookies of its last recycled context
+    pages = set()
+    pages_opened = 0
+    launch_lock = asyncio.Lock()
+
+    async def new_page(marketplace):
+        nonlocal playwright, browser, pages_opened
+        async with launch_lock:
+            context = contexts.get(marketplace)
+            if context is None and browser_pool:
+                context = await browser_pool.acquire(marketplace)
+            elif context is None:
+                if browser is None:
+                    if playwright is None:
+                        from playwright.async_api import async_playwright
+
+                        # One-time, cached install check, only once the browser is really needed
+                        await asyncio.to_thread(ensure_playwright_browsers)
+                        playwright = await async_playwright().start()
+                    browser = await playwright.chromium.launch(headless=headless)
+                context = await open_context(browser, marketplace, USER_AGENT, storage_states.get(marketplace))
+                if policy:
+                    await policy.attach(context)
+            if marketplace not in contexts:
+                contexts[marketplace] = context
+                context_pages[context] = 0
+                context_navigations[context] = 0
+            page = await context.new_page()
+            context_pages[context] += 1
+            pages_opened += 1
+        pages.add(page)
+        return page, context
+
+    async def drop_context(context):
+        retired.discard(context)
+        context_pages.pop(context, None)
+        context_navigations.pop(context, None)
+        try:
+            if browser_pool:
+                await browser_pool.release(context)
+            else:
+                await context.close()
+        except Exception as e:
+            print(f"Warning: could not close a browser context: {e}")
+
+    async def close_page(page, context):
+        pages.discard(page)
+        if policy:
+            policy.forget(page)
+        try:
+            await page.close()
+        except Exception:
+            pass
+        async with launch_lock:
+            context_pages[context] -= 1
+            if context in retired and context_pages[context] == 0:
+                await drop_context(context)
+
+    async def reset_browser(marketplace):
+        """After a failed new_page(): the next one starts over with a fresh context, relaunching Chromium if needed."""
+        nonlocal playwright, browser
+        async with launch_lock:
+            stale = [contexts.pop(marketplace)] if marketplace in contexts else []
+            if browser_pool and stale:
+                # The pool relaunches an unhealthy browser on its next acquire()
+                await browser_pool.retire(marketplace, stale[0])
+            elif not browser_pool and browser is not None and not browser.is_connected():
+                stale += contexts.values()
+                contexts.clear()
+            for context in stale:
+                if context_pages.get(context):
+                    retired.add(context)  # Closed once the pages of the other workers are
+                else:
+                    await drop_context(context)
+            if not browser_pool and (browser is None or not browser.is_connected()):
+                # Never launched, or the process is gone: launch it again next time
+                for closing in (browser and browser.close, playwright and playwright.stop):
+                    try:
+                        if closing:
+                            await closing()
+                    except Exception:
+                        pass
+                playwright = browser = None
+
+    async def retire_context(marketplace):
+        """Replace a marketplace's context: new pages open in a fresh one with its cookies."""
+        async with launch_lock:
+            context = contexts.pop(marketplace, None)
+            if context is None:
+                return
+            if browser_pool:
+                await browser_pool.retire(marketplace, context)
+            else:
+                try:
+                    storage_states[marketplace] = await context.storage_state()
+                except Exception:
+                    pass  # Keep the cookies saved last time
+            retired.add(context)
+            recycle.contexts_recycled += 1
+            if context_pages[context] == 0:
+                await drop_context(context)
+
+    async def feeder():
+        nonlocal outstanding, feeding_done
+        # Cache reads are batched; cached rows go straight to the output
+        for batch in batched(enumerate(urls), FEED_BATCH_SIZE):
+            cached = cache.get_many(cache_key(url) for _, url in batch) if cache else {}
+            for position, url in batch:
+                restored = finished.get(position)
+                if restored and restored["URL"] == url:
+                    if recorder:
+                        if recorded[url]:
+                            recorded[url] -= 1
+                        else:
+                            recorder.add(restored)
+                    await out.put(restored)
+                    continue
+                key = cache_key(url) if cache or recheck else None
+                if position in skipped:
+                    last = skipped[position]
+                    record = make_record(position, url, (
+                        last["status"], last["details"], last["current_price"], last["normal_price"], last["discount"]
+                    ))
+                    record[LAST_CHECKED_COLUMN] = format_time(last["last_checked"])
+                    if timing_columns:
+                        record.update(Timings().columns())
+                    if journal:
+                        journal.append(record)
+                    await out.put(record)
+                    continue
+                if cache:
+                    cache.record_lookup(key in cached)
+                if key in cached:
+                    record = make_record(position, url, cached[key])
+                    if recheck:
+                        record[LAST_CHECKED_COLUMN] = None
+                    if timing_columns:
+                        record.update(Timings().columns())  # Same columns as checked rows, all empty
+                    if journal:
+                        journal.append(record)
+                    await out.put(record)
+                elif listing and listing.accepts(url):
+                    outstanding += 1
+                    page_batch = listing.add(position, url, key)
+                    if page_batch:
+                        await enqueue(page_batch)
+                else:
+                    outstanding += 1
+                    await enqueue((position, url, key, time.perf_counter(), 1, {}))
+            if listing:
+                for page_batch in listing.flush():
+                    await enqueue(page_batch)
+        feeding_done = True
+        finish_if_idle()
+
+    async def retry_later(item, delay):
+        await asyncio.sleep(delay)
+        position, url, key, _, attempt, retries_made = item
+        await enqueue((position, url, key, time.perf_counter(), attempt, retries_made))
+
+    def schedule(item, delay):
+        task = asyncio.create_task(retry_later(item, delay))
+        retry_tasks.add(task)
+        task.add_done_callback(retry_tasks.discard)
+
+    def report(position, url, result, attempt, timings):
+        """The row's record, with its timings exported."""
+        record = make_record(position, url, result, attempt)
+        if timing_columns:
+            record.update(timings.columns())
+        if trace:
+            trace.write(record, timings)
+        metrics.observe(result[0], timings)
+        if metrics_file and sum(metrics.checks.values()) % METRICS_WRITE_EVERY == 0:
+            metrics.write(metrics_file)
+        return record
+
+    async def complete(record, key, result, host, attempt):
+        """The row is final: store it and hand it to the consumer."""
+        nonlocal outstanding
+        if retry_policy and attempt > 1 and not result[0].startswith("Error"):
+            retry_policy.recovered += 1
+        if cache:
+            cache.put(key, result)
+        if recheck:
+            recheck.stats.record(key, result)
+            record[LAST_CHECKED_COLUMN] = format_time(time.time())
+        if journal:
+            journal.append(record)
+        if recorder:
+            recorder.add(record)
+        lane_rows[host] += 1
+        outstanding -= 1
+        await out.put(record)
+        finish_if_idle()
+
+    async def check_listing(batch):
+        timings = Timings()
+        timings.add("queue_wait", time.perf_counter() - batch.queued_at)
+        host = host_of(batch.url)
+        with timings.span("rate_limit_wait"):
+            await limiter.acquire(host)
+        resolved = None
+        try:
+            html, signal = await listing_fetcher.fetch_page(batch.url, timings)
+            if record_signal:
+                record_signal(host, signal)
+            resolved, fallbacks = listing.resolve(batch, html, timings)
+            marketplace = marketplace_of(batch.url)
+            results = []
+            for (position, url, key, _), payload in resolved:
+                # Each row carries its share of the page load
+                row_timings = Timings()
+                for phase, seconds in timings.spans.items():
+                    row_timings.add(phase, seconds / len(batch.rows))
+                results.append((position, url, key, analyze_extraction(payload, marketplace, row_timings), row_timings))
+        except Exception as e:
+            # Like a page that did not load: every row gets its product page check
+            print(f"⚠️ Listing lookup failed for {batch.url}, checking its rows one by one: {e}")
+            if resolved is None:
+                listing.resolve(batch, None)
+            else:
+                listing.found -= len(resolved)
+                listing.fallbacks += len(resolved)
+            results, fallbacks = [], batch.rows
+        for position, url, key, result, row_timings in results:
+            await complete(report(position, url, result, 1, row_timings), key, result, host, 1)
+        for position, url, key, _ in fallbacks:
+            # Queued again by a task: a worker never waits for read-ahead room
+            schedule((position, url, key, None, 1, {}), 0)
+
+    async def worker(queue):
+        page = None  # Each worker opens its own page only if it needs the browser
+        context = None
+        navigations = 0
+        while True:
+            if pause_gate is not None:
+                await pause_gate.wait()
+            item = await queue.get()
+            if item is None:
+                return
+            read_ahead.release()
+            if isinstance(item, ListingBatch):
+                await check_listing(item)
+                continue
+            position, url, key, queued_at, attempt, retries_made = item
+            timings = Timings()
+            timings.add("queue_wait", time.perf_counter() - queued_at)
+
+            host = host_of(url)
+            with timings.span("rate_limit_wait"):
+                await limiter.acquire(host)
+
+            result, signal = None, None
+            if fetcher:
+                try:
+                    result, signal = await fetcher.check_with_signal(url, timings, selector_profiler, snapshots)
+                except Exception as e:
+                    # Like check_promotion: a bad row fails alone, not the run
+                    print(f"Error checking {url}: {e}")
+                    result = "Error/Exception", str(e), "Error", "Error", "Error"
+            if record_signal:
+                record_signal(host, signal)
+            if result is None:
+                if fetcher:
+                    with timings.span("rate_limit_wait"):
+                        await limiter.acquire(host)  # The browser request counts too
+                marketplace = marketplace_of(url)
+                if page is None:
+                    try:
+                        page, context = await new_page(marketplace)
+                        navigations = 0
+                    except Exception as e:
+                        # Launch / context / page failures fail this row (and go to the retries), not the run
+                        print(f"❌ Browser unavailable for {url}: {e}")
+                        await reset_browser(marketplace)
+                        result = "Error/Exception", f"Browser unavailable: {e}", "Error", "Error", "Error"
+            if result is None:
+                if policy:
+                    policy.reset(page)
+                result = await check_promotion(page, url, timings, selector_profiler, snapshots)
+                if record_signal:
+                    record_signal(host, result[0])
+                navigations += 1
+                context_navigations[context] += 1
+                if recycle:
+                    if recycle.pressure:
+                        recycle.pressure = False
+                        for name in list(contexts):
+                            await retire_context(name)
+                    elif context not in retired and recycle.context_due(context_navigations[context]):
+                        await retire_context(marketplace)
+                    if context in retired or recycle.page_due(navigations):
+                        # A fresh page (and renderer) for the next browser check
+                        await close_page(page, context)
+                        recycle.pages_recycled += 1
+                        page = None
+
+            record = report(position, url, result, attempt, timings)
+            delay = retry_policy.next_delay(result[0], retries_made) if retry_policy else None
+            if delay is not None:
+                # Back off without holding the worker; the row is final only later
+                print(f"🔁 {result[0]} for {url}, retry {attempt} in {delay:.0f}s")
+                retries_made = {**retries_made, result[0]: retries_made.get(result[0], 0) + 1}
+                schedule((position, url, key, None, attempt + 1, retries_made), delay)
+                continue
+
+            await complete(record, key, result, host, attempt)
+
+    tasks = []  # The feeder and the workers of every lane opened so far
+    tasks.append(asyncio.create_task(feeder()))
+    memory_watchdog.start()
+
+    async def run_all():
+        try:
+            # Wait for every task, also those of lanes opened meanwhile; the
+            # first failure is raised at once
+            while True:
+                lanes_changed.clear()
+                for task in tasks:
+                    if task.done():
+                        task.result()  # Also those that failed before they were waited for
+                running = [task for task in tasks if not task.done()]
+                if not running:
+                    break
+                watcher = asyncio.create_task(lanes_changed.wait())
+                try:
+                    finished_tasks, _ = await asyncio.wait(running + [watcher], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    watcher.cancel()
+                for task in finished_tasks:
+                    if task is not watcher:
+                        task.result()
+        finally:
+            await out.put(done)
+
+    runner = asyncio.create_task(run_all())
+    completed = 0
+
+    if progress_callback and total:
+        progress_callback(0.0)
+
+    try:
+        while True:
+            record = await out.get()
+            if record is done:
+                break
+            completed += 1
+            if progress_callback and total:
+                progress_callback(min(1.0, completed / total))
+            yield record
+        await runner  # Re-raises a worker failure
+        if journal:
+            journal.finish()  # Complete: the next run of the same input checks it afresh
+    finally:
+        # Also runs when the consumer stops early (aclose / break)
+        pending = tasks + [runner] + list(retry_tasks)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if journal:
+            journal.close()
+        if trace:
+            trace.close()
+        if recorder:
+            recorder.close()
+        if metrics_file:
+            metrics.write(metrics_file)
+        if selector_profiler:
+            selector_profiler.compile_all()
+            selector_profiler.save()
+        if snapshots:
+            snapshots.commit()
+        if listing_fetcher:
+            await listing_fetcher.close()
+        if browser_pool:
+            # Keep the pooled contexts (and their cookies) warm, only drop our pages
+            for page in pages:
+                if policy:
+                    policy.forget(page)
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            for context in list(contexts.values()) + list(retired):
+                await browser_pool.release(context)
+        if browser:
+            await browser.close()
+        if playwright:
+            await playwright.stop()
+        await memory_watchdog.stop()
+
+    if hasattr(limiter, "snapshot"):
+        for host, state in limiter.snapshot().items():
+            print(f"Pacing {host}: {state['requests_per_minute']} req/min, "
+                  f"{state['successes']} clean, {state['backoffs']} backoffs")
+    if cache:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    if retry_policy:
+        scheduled = {status: count - retry_counts[0].get(status, 0)
+                     for status, count in retry_policy.scheduled.items() if count > retry_counts[0].get(status, 0)}
+        if scheduled:
+            by_status = ", ".join(f"{status} {count}" for status, count in
+                                  sorted(scheduled.items(), key=lambda item: -item[1]))
+            print(f"Retries: {sum(scheduled.values())} scheduled ({by_status}), "
+                  f"{retry_policy.recovered - retry_counts[1]} rows recovered")
+    if fetcher:
+        print(f"HTTP tier: {fetcher.static_hits} pages from static HTML, "
+              f"{fetcher.escalations} escalated to the browser")
+    if listing and listing.pages:
+        stats = listing.summary()
+        print(f"Listing pages: {stats['pages']} pages covered {stats['found']} rows, "
+              f"{stats['fallbacks']} checked on their product page "
+              f"({stats['loads_per_row']} page loads per row)")
+    if len(lane_rows) > 1:
+        print("Checked per host: " + ", ".join(f"{host} {rows}" for host, rows in lane_rows.items()))
+    if policy and pages_opened:
+        blocked = policy.totals.since(policy_counts)
+        by_type = ", ".join(f"{resource_type} {count}" for resource_type, count in
+                            sorted(blocked.blocked_by_type.items(), key=lambda item: -item[1]))
+        print(f"Resource policy: blocked {blocked.blocked_requests} requests "
+              f"(~{blocked.blocked_bytes / (1024 * 1024):.1f} MB saved{': ' + by_type if by_type else ''}), "
+              f"allowed {blocked.allowed_requests}")
+    if snapshots:
+        captured = snapshots.captured - snapshot_counts[0]
+        print(f"Snapshots: {captured} pages captured, {snapshots.deduplicated - snapshot_counts[1]} already stored")
+    if selector_profiler:
+        for row in selector_profiler.savings_report():
+            print(f"Selector profile {row['marketplace']} ({row['tier']}): {row['full_ms']} -> {row['profile_ms']} ms "
+                  f"of selector scans per page, {row['mismatches']} mismatches in {row['pages']} audited pages")
+    memory = memory_watchdog.summary()
+    if memory:
+        browser_peak = f" (browser {memory['browser_peak_mb']} MB)" if memory["browser_peak_mb"] else ""
+        print(f"Memory: {memory['start_mb']} MB at start, peak {memory['peak_mb']} MB{browser_peak}, "
+              f"{memory['end_mb']} MB at end")
+    if recycle and (recycle.pages_recycled or recycle.contexts_recycled):
+        print(f"Recycled {recycle.pages_recycled} pages and {recycle.contexts_recycled} contexts "
+              f"({recycle.pressure_recycles} times on memory pressure)")
+    phase_means = metrics.summary()
+    if phase_means:
+        print("Mean time per phase: " + ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in phase_means.items()))
+
+async def process_products(df, progress_callback=None, **options):
     """
     Process a DataFrame of products and check for promotions.
     Compatible with Streamlit app.
+
+    Thin collector over iter_products (same keyword options): results are
+    written back into the DataFrame in input row order.
     """
     if "URL" not in df.columns:
         raise ValueError("The dataframe must have a 'URL' column")
 
-    estados = []
-    detalles_list = []
-    precios_actuales = []
-    precios_normales = []
-    descuentos_labels = []
-    
-    total = len(df)
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context(user_agent=USER_AGENT)
-        page = await context.new_page()
-
-        for index, row in df.iterrows():
-            url = row['URL']
-            
-            # Update progress
-            if progress_callback:
-                progress_callback((index) / total)
-            
-            status, details, price, norm_price, disc_label = await check_promotion(page, url)
-            
-            estados.append(status)
-            detalles_list.append(details)
-            precios_actuales.append(price)
-            precios_normales.append(norm_price)
-            descuentos_labels.append(disc_label)
-            
-            # Random delay
-            if index < total - 1:
-                delay = random.uniform(2, 5)
-                await asyncio.sleep(delay)
-                
-        await browser.close()
-        
-    df["Promo Status"] = estados
-    df["Details"] = detalles_list
-    df["Current Price"] = precios_actuales
-    df["Normal Price"] = precios_normales
-    df["Discount"] = descuentos_labels
+    results = [None] * len(df)
+    async for record in iter_products(list(df["URL"]), progress_callback=progress_callback, **options):
+        results[record["position"]] = record
+
+    for column in RESULT_COLUMNS:
+        df[column] = [record[column] for record in results]
+    df[ATTEMPTS_COLUMN] = [record.get(ATTEMPTS_COLUMN, 1) for record in results]
+    if options.get("recheck"):
+        df[LAST_CHECKED_COLUMN] = [record.get(LAST_CHECKED_COLUMN) for record in results]
+    if options.get("timing_columns"):
+        # Rows restored from the cache or a journal were not timed in this run
+        for phase in PHASES:
+            column = timing_column(phase)
+            df[column] = [record.get(column) for record in results]
+    add_price_columns(df)
     
     # Final progress update
     if progress_callback:
@@ -318,20 +784,150 @@ async def process_products(df, progress_callback=None, headless=True):
         
     return df
 
+async def iter_catalog(reader, progress_callback=None, **options):
+    """
+    Streams a CatalogReader (see catalog_reader.py) through iter_products:
+    rows are read chunk by chunk while the first URLs are already being
+    checked. Yields each record merged with the other columns of its input
+    row; only rows still in flight are kept in memory.
+    """
+    if not reader.has_urls:
+        raise ValueError("The catalog must have a 'URL' or 'ASIN' column")
+    in_flight = {}
+
+    def urls():
+        for position, row in enumerate(reader.rows()):
+            in_flight[position] = row
+            yield row["URL"]
+
+    async for record in iter_products(urls(), progress_callback=progress_callback,
+                                      total=options.pop("total", None) or reader.estimated_rows(), **options):
+        row = in_flight.pop(record["position"])
+        yield {**row, **record}
+
+async def process_catalog(reader, progress_callback=None, **options):
+    """
+    Like process_products, but streams the input from a CatalogReader instead
+    of a preloaded DataFrame. Returns the report DataFrame in input row order.
+    """
+    records = [record async for record in iter_catalog(reader, progress_callback=progress_callback, **options)]
+    df = catalog_frame(records, reader.columns)
+
+    if progress_callback:
+        progress_callback(1.0)
+
+    return df
+
+def catalog_frame(records, columns):
+    """
+    Report DataFrame (input row order, typed price columns) from iter_catalog
+    records received in any order; `columns` are the catalog's columns.
+    """
+    import pandas as pd
+
+    records = sorted(records, key=lambda record: record["position"])
+    if records:
+        df = pd.DataFrame.from_records(records).drop(columns="position")
+    else:
+        df = pd.DataFrame(columns=list(columns) + RESULT_COLUMNS + [ATTEMPTS_COLUMN])
+    add_price_columns(df)
+    return df
+
+async def write_catalog_report(reader, report, progress_callback=None, **options):
+    """
+    Checks a CatalogReader and streams every result into `report` (a
+    report_writer.ReportWriter) as it arrives, so neither the input nor the
+    report is ever fully in memory. Returns the number of rows written.
+    """
+    with report:
+        async for record in iter_catalog(reader, progress_callback=progress_callback, **options):
+            report.add(record)
+    if progress_callback:
+        progress_callback(1.0)
+    return report.rows_written
+
 async def main():
+    from catalog_reader import CatalogReader
+    from report_writer import open_report
+
     try:
         print("Reading input file...")
-        df = pd.read_excel(INPUT_FILE)
-        
+        # `--marketplaces de,fr,it` checks every product on each marketplace (wide report)
+        marketplaces = sys.argv[sys.argv.index("--marketplaces") + 1].split(",") if "--marketplaces" in sys.argv else None
+        # Streamed in chunks: checking starts while the rest of the file is still unread
+        reader = CatalogReader(INPUT_FILE, marketplaces=marketplaces)
+
         print("Starting check...")
         # Wrapper to print progress to console
         def console_progress(p):
             print(f"Progress: {p*100:.0f}%")
 
-        df = await process_products(df, progress_callback=console_progress, headless=False)
+        # `python promo_checker.py --resume` continues an interrupted run
+        resume = "--resume" in sys.argv
+        # `--shards N` spreads the run over N worker processes
+        shards = int(sys.argv[sys.argv.index("--shards") + 1]) if "--shards" in sys.argv else 1
+        # `--trace` writes per-URL phase timings and a Prometheus snapshot
+        trace_options = dict(trace_file=TRACE_FILE, metrics_file=METRICS_FILE) if "--trace" in sys.argv else {}
+        # `--budget N` only re-checks the N products most likely to have changed
+        if "--budget" in sys.argv:
+            from recheck_scheduler import RecheckScheduler
+            trace_options["recheck"] = RecheckScheduler(budget=int(sys.argv[sys.argv.index("--budget") + 1]))
+        # Every run is appended to the price history unless `--no-history`
+        if "--no-history" not in sys.argv:
+            from price_history import PriceHistory
+            trace_options["history"] = PriceHistory()
+        # `--profile-selectors` samples selector costs and runs the compiled per-marketplace profiles
+        if "--profile-selectors" in sys.argv:
+            from selector_profiler import SelectorProfiler
+            trace_options["selector_profiler"] = SelectorProfiler()
+        # `--snapshots [full]` keeps a compressed copy of every page for offline replay
+        if "--snapshots" in sys.argv:
+            from snapshot_store import SnapshotStore
+            full = sys.argv[sys.argv.index("--snapshots") + 1:][:1] == ["full"]
+            trace_options["snapshots"] = SnapshotStore(mode="full" if full else "region")
+        # `--listings [N]` reads N ASINs (20 by default) per search listing page before product pages
+        if "--listings" in sys.argv:
+            size = sys.argv[sys.argv.index("--listings") + 1:][:1]
+            trace_options["listing_batch"] = int(size[0]) if size and size[0].isdigit() else True
+        # `--output report.csv|.jsonl|.parquet` picks another report format
+        output_file = sys.argv[sys.argv.index("--output") + 1] if "--output" in sys.argv else OUTPUT_FILE
+        cache = ResultCache()
+        try:
+            if shards > 1 or reader.multi_marketplace:
+                if shards > 1:
+                    from sharding import process_products_sharded
+                    df = await process_products_sharded(reader.to_frame(), progress_callback=console_progress,
+                                                        shards=shards, headless=False, cache=cache,
+                                                        journal=JOURNAL_FILE, resume=resume, **trace_options)
+                else:
+                    # The wide report needs every row, so results are collected first
+                    df = await process_catalog(reader, progress_callback=console_progress, headless=False,
+                                               cache=cache, journal=JOURNAL_FILE, resume=resume, **trace_options)
+                if reader.multi_marketplace:
+                    from marketplaces import wide_report
+
+                    # One row per product and marketplace next to the wide report
+                    stem, extension = os.path.splitext(output_file)
+                    print(f"Saving the per-marketplace rows to {stem}.long{extension}...")
+                    with open_report(f"{stem}.long{extension}", price_columns=False) as report:
+                        report.write_frame(df)
+                    df = wide_report(df, reader.input_columns)
+                print(f"Saving report to {output_file}...")
+                with open_report(output_file, price_columns=False) as report:
+                    report.write_frame(df)
+            else:
+                # Rows are written to the report as they complete
+                print(f"Writing report to {output_file} as results arrive...")
+                await write_catalog_report(reader, open_report(output_file), progress_callback=console_progress,
+                                           headless=False, cache=cache, journal=JOURNAL_FILE, resume=resume,
+                                           **trace_options)
+        finally:
+            cache.close()
+            if "recheck" in trace_options:
+                trace_options["recheck"].stats.close()
+            if "snapshots" in trace_options:
+                trace_options["snapshots"].close()
 
-        print(f"Saving report to {OUTPUT_FILE}...")
-        df.to_excel(OUTPUT_FILE, index=False)
         print("Process completed!")
 
     except FileNotFoundError:
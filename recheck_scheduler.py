@@ -0,0 +1,201 @@
+import math
+import re
+import sqlite3
+import time
+
+DEFAULT_STATS_FILE = "promo_stats.sqlite"
+
+# Prior for the change rate of a product with little history:
+# one change per PRIOR_DAYS days
+PRIOR_CHANGES = 1.0
+PRIOR_DAYS = 7.0
+DAY = 24 * 60 * 60
+
+# Countdown timers and "lightning deal" badges: such a deal ends (a change)
+# within hours, so products that showed one are re-checked first
+LIGHTNING_PATTERN = re.compile(
+    r"lightning|blitzangebot|endet in|ends in|termina en|termine dans|termina tra|"
+    r"oferta relámpago|offerta lampo|vente flash|\b\d{1,2}:\d{2}:\d{2}\b",
+    re.IGNORECASE,
+)
+LIGHTNING_WINDOW = DAY
+
+MAX_QUERY_PARAMS = 900
+
+
+def result_signature(result):
+    """What counts as a change: status, prices and discount (not the details text, timers tick)."""
+    status, _, current_price, normal_price, discount = result
+    return f"{status}|{current_price}|{normal_price}|{discount}"
+
+
+class ChangeStats:
+    """
+    Per-ASIN change statistics (SQLite, keyed like ResultCache): how often a
+    product was checked and how often its result changed, when it was last
+    checked / changed, whether a lightning deal was seen, and its last result.
+    Error results are not observations and are ignored.
+    """
+
+    def __init__(self, path=DEFAULT_STATS_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS stats (
+                asin TEXT NOT NULL,
+                marketplace TEXT NOT NULL,
+                checks INTEGER,
+                changes INTEGER,
+                observed_seconds REAL,
+                last_checked REAL,
+                last_changed REAL,
+                last_lightning REAL,
+                signature TEXT,
+                status TEXT,
+                details TEXT,
+                current_price TEXT,
+                normal_price TEXT,
+                discount TEXT,
+                PRIMARY KEY (asin, marketplace)
+            )"""
+        )
+        self.conn.commit()
+
+    def __getstate__(self):
+        # Picklable for sharded runs: worker processes reopen the file
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def get_many(self, keys):
+        """{key: row dict} for every key with statistics."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), MAX_QUERY_PARAMS // 2):
+            chunk = keys[start:start + MAX_QUERY_PARAMS // 2]
+            where = " OR ".join(["(asin = ? AND marketplace = ?)"] * len(chunk))
+            cursor = self.conn.execute(
+                f"SELECT * FROM stats WHERE {where}", [value for key in chunk for value in key]
+            )
+            names = [column[0] for column in cursor.description]
+            for row in cursor:
+                row = dict(zip(names, row))
+                found[(row["asin"], row["marketplace"])] = row
+        return found
+
+    def record(self, key, result, now=None, commit=True):
+        """Update the statistics of `key` with a fresh check result."""
+        status = result[0]
+        if status.startswith("Error"):
+            return
+        now = now or time.time()
+        signature = result_signature(result)
+        lightning = now if LIGHTNING_PATTERN.search(result[1] or "") else None
+        previous = self.get_many([key]).get(key)
+
+        if previous is None:
+            checks, changes, observed, last_changed = 1, 0, 0.0, now
+            last_lightning = lightning
+        else:
+            changed = previous["signature"] != signature
+            checks = previous["checks"] + 1
+            changes = previous["changes"] + changed
+            observed = previous["observed_seconds"] + max(0.0, now - previous["last_checked"])
+            last_changed = now if changed else previous["last_changed"]
+            last_lightning = lightning or previous["last_lightning"]
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key[0], key[1], checks, changes, observed, now, last_changed, last_lightning, signature, *result),
+        )
+        if commit:
+            self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+
+class RecheckScheduler:
+    """
+    Picks which rows of a run to actually check, given a budget.
+
+    Each product's change rate is estimated from its history (changes per
+    observed day, smoothed with a prior), and turned into the probability
+    that it changed since its last check: 1 - exp(-rate * elapsed).
+    Products are checked in this order:
+    1. never checked, or last checked more than `max_staleness` ago
+       (always checked, even beyond the budget)
+    2. a lightning deal / countdown seen within LIGHTNING_WINDOW
+    3. highest change probability, until the budget is used
+
+    The budget is `budget` checks, or `time_budget` seconds at
+    `seconds_per_check`. Skipped rows are reported with their last known
+    result. Without a budget every row is checked (stats are still kept).
+    """
+
+    def __init__(self, stats=None, budget=None, time_budget=None, seconds_per_check=3.0,
+                 max_staleness=7 * DAY):
+        self.stats = stats if stats is not None else ChangeStats()
+        self.budget = budget
+        self.time_budget = time_budget
+        self.seconds_per_check = seconds_per_check
+        self.max_staleness = max_staleness
+        self.selected = 0
+        self.forced = 0
+        self.skipped = 0
+
+    def change_probability(self, row, now):
+        elapsed = max(0.0, now - row["last_checked"])
+        rate = (row["changes"] + PRIOR_CHANGES) / ((row["observed_seconds"] / DAY) + PRIOR_DAYS)
+        return 1 - math.exp(-rate * elapsed / DAY)
+
+    def checks_allowed(self):
+        budgets = []
+        if self.budget is not None:
+            budgets.append(int(self.budget))
+        if self.time_budget is not None:
+            budgets.append(int(self.time_budget / self.seconds_per_check))
+        return min(budgets) if budgets else None
+
+    def plan(self, keys, now=None):
+        """
+        `keys`: cache_key of every row, in input order.
+        Returns (positions to check, {position: stats row} of the skipped rows).
+        """
+        now = now or time.time()
+        known = self.stats.get_many(keys)
+        allowed = self.checks_allowed()
+
+        forced = []
+        ranked = []
+        for position, key in enumerate(keys):
+            row = known.get(key)
+            if row is None or now - row["last_checked"] >= self.max_staleness:
+                forced.append(position)
+            elif row["last_lightning"] and now - row["last_lightning"] < LIGHTNING_WINDOW:
+                ranked.append((2.0, position))  # Above any probability
+            else:
+                ranked.append((self.change_probability(row, now), position))
+
+        if allowed is None:
+            selected = forced + [position for _, position in ranked]
+        else:
+            if len(forced) > allowed:
+                print(f"⚠️ {len(forced)} products are new or past the max staleness, checking all of them "
+                      f"(budget was {allowed})")
+            ranked.sort(key=lambda item: item[0], reverse=True)
+            room = max(0, allowed - len(forced))
+            selected = forced + [position for _, position in ranked[:room]]
+
+        selected = set(selected)
+        skipped = {position: known[keys[position]] for position in range(len(keys)) if position not in selected}
+        self.selected, self.forced, self.skipped = len(selected), len(forced), len(skipped)
+        print(f"Re-check plan: {len(selected)} of {len(keys)} products ({len(forced)} new or stale), "
+              f"{len(skipped)} skipped as unlikely to have changed")
+        return selected, skipped
@@ -0,0 +1,246 @@
+import io
+import os
+import time
+
+import pandas as pd
+
+from price_parser import add_price_columns
+
+BATCH_SIZE = 5000  # Rows converted and written at a time
+FLUSH_INTERVAL = 10.0  # ...or every N seconds, so slow runs still reach the file
+
+# format -> (label, file extension, MIME type)
+REPORT_FORMATS = {
+    "xlsx": ("Excel", ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", ".csv", "text/csv"),
+    "jsonl": ("JSON Lines", ".jsonl", "application/x-ndjson"),
+    "parquet": ("Parquet", ".parquet", "application/vnd.apache.parquet"),
+}
+
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_URLS = 65530  # Hyperlinks per worksheet Excel accepts
+EXCEL_MAX_URL_LENGTH = 2079
+
+
+class ReportWriter:
+    """
+    Streams report rows to a file (path or binary file-like object) instead
+    of building the whole report in memory.
+
+    add(record) accepts iter_products / iter_catalog records in any order:
+    they are buffered until the rows before them arrive (record["position"])
+    and written in input order, every BATCH_SIZE rows or FLUSH_INTERVAL
+    seconds, with the typed price columns added per batch. write_frame(df) writes a finished
+    DataFrame. Subclasses implement _write_frame / _close for one format.
+    """
+
+    def __init__(self, target, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, price_columns=True):
+        self.target = target
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.price_columns = price_columns
+        self.columns = None
+        self.rows_written = 0
+        self.pending = {}  # position -> record that arrived early
+        self.next_position = 0
+        self.ready = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _make_directory(self):
+        if isinstance(self.target, (str, os.PathLike)):
+            directory = os.path.dirname(self.target)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def _open_binary(self):
+        if isinstance(self.target, (str, os.PathLike)):
+            self._make_directory()
+            return open(self.target, "wb")
+        return self.target
+
+    def add(self, record):
+        position = record.get("position", self.next_position)
+        self.pending[position] = record
+        while self.next_position in self.pending:
+            self.ready.append(self.pending.pop(self.next_position))
+            self.next_position += 1
+        if len(self.ready) >= self.batch_size or (
+                self.ready and time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.ready:
+            return
+        df = pd.DataFrame.from_records(self.ready).drop(columns="position", errors="ignore")
+        self.ready = []
+        if self.price_columns and "Current Price" in df.columns:
+            add_price_columns(df)
+        self.write_frame(df)
+
+    def write_frame(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        else:
+            df = df.reindex(columns=self.columns)  # Keep the first batch's layout
+        if len(df):
+            self._write_frame(df)
+            self.rows_written += len(df)
+
+    def close(self):
+        if self.pending:
+            # Rows that never arrived (e.g. a cancelled run): write the rest in order
+            self.ready.extend(self.pending[position] for position in sorted(self.pending))
+            self.pending = {}
+        self.flush()
+        self._close()
+
+    def _write_frame(self, df):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class ExcelReportWriter(ReportWriter):
+    """
+    xlsxwriter in constant_memory mode: each row is flushed to a temp file
+    as soon as it is written, and URLs are written as native hyperlinks.
+    Rows beyond Excel's sheet limit continue on "Report (2)", ...
+    """
+
+    def __init__(self, target, sheet_name="Report", **kwargs):
+        super().__init__(target, **kwargs)
+        import xlsxwriter
+
+        self.sheet_name = sheet_name
+        self._make_directory()
+        self.workbook = xlsxwriter.Workbook(self.target, {"constant_memory": True, "strings_to_urls": False})
+        self.worksheet = None
+        self.sheets = 0
+        self.row = 0
+        self.urls = 0
+
+    def _new_sheet(self):
+        self.sheets += 1
+        name = self.sheet_name if self.sheets == 1 else f"{self.sheet_name} ({self.sheets})"
+        self.worksheet = self.workbook.add_worksheet(name)
+        self.worksheet.write_row(0, 0, self.columns)
+        self.row = 1
+        self.urls = 0
+
+    def _write_frame(self, df):
+        url_col = self.columns.index("URL") if "URL" in self.columns else None
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self.worksheet is None or self.row >= EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self.worksheet.write_row(self.row, 0, row)
+            if url_col is not None:
+                url = row[url_col]
+                if (isinstance(url, str) and url.startswith("http") and len(url) <= EXCEL_MAX_URL_LENGTH
+                        and self.urls < EXCEL_MAX_URLS):
+                    self.worksheet.write_url(self.row, url_col, url, string=url)
+                    self.urls += 1
+            self.row += 1
+
+    def _close(self):
+        if self.worksheet is None and self.columns:
+            self._new_sheet()
+        self.workbook.close()
+
+
+class CsvReportWriter(ReportWriter):
+    """UTF-8 CSV with a BOM, so Excel opens accented text correctly."""
+
+    def __init__(self, target, **kwargs):
+        super().__init__(target, **kwargs)
+        self.file = self._open_binary()
+        self.text = io.TextIOWrapper(self.file, encoding="utf-8-sig", newline="")
+
+    def _write_frame(self, df):
+        df.to_csv(self.text, header=self.rows_written == 0, index=False)
+
+    def _close(self):
+        self.text.flush()
+        self.text.detach()
+        if self.file is not self.target:
+            self.file.close()
+
+
+class JsonLinesReportWriter(ReportWriter):
+    """One JSON object per row (NaN as null)."""
+
+    def __init__(self, target, **kwargs):
+        super().__init__(target, **kwargs)
+        self.file = self._open_binary()
+
+    def _write_frame(self, df):
+        self.file.write(df.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8"))
+        if not self.file.closed:
+            self.file.flush()
+
+    def _close(self):
+        if self.file is not self.target:
+            self.file.close()
+
+
+class ParquetReportWriter(ReportWriter):
+    """One Parquet row group per batch; the schema comes from the first batch."""
+
+    def __init__(self, target, **kwargs):
+        super().__init__(target, **kwargs)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet reports need pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.file = self._open_binary()
+        self.writer = None
+        self.schema = None
+
+    def _write_frame(self, df):
+        pa = self.pa
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.schema is None:
+            # Columns that are all empty in the first batch are typed as text
+            self.schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ]).remove_metadata()
+            self.writer = self.pq.ParquetWriter(self.file, self.schema)
+        self.writer.write_table(table.cast(self.schema, safe=False))
+
+    def _close(self):
+        if self.writer:
+            self.writer.close()
+        if self.file is not self.target:
+            self.file.close()
+
+
+WRITERS = {
+    "xlsx": ExcelReportWriter,
+    "csv": CsvReportWriter,
+    "jsonl": JsonLinesReportWriter,
+    "parquet": ParquetReportWriter,
+}
+
+
+def open_report(target, fmt=None, **kwargs):
+    """
+    ReportWriter for `fmt` ("xlsx", "csv", "jsonl" or "parquet"; taken from
+    the file extension of `target` when omitted).
+    """
+    if fmt is None:
+        fmt = os.path.splitext(str(target))[1].lstrip(".").lower() or "xlsx"
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown report format '{fmt}', choose one of {', '.join(WRITERS)}")
+    return WRITERS[fmt](target, **kwargs)
@@ -0,0 +1,157 @@
+import re
+from urllib.parse import urlparse
+
+# Resource types check_promotion never reads. Stylesheets are NOT blocked:
+# visibility checks (.a-offscreen, .aok-hidden, ...) depend on Amazon's CSS.
+DEFAULT_BLOCKED_TYPES = {"image", "media", "font", "imageset", "texttrack", "beacon", "ping"}
+
+# Ads, tracking and telemetry endpoints (matched against the full URL)
+DEFAULT_BLOCKED_PATTERNS = [
+    r"amazon-adsystem\.com",
+    r"doubleclick\.net",
+    r"googlesyndication\.com",
+    r"google-analytics\.com",
+    r"/uedata",
+    r"fls-[a-z]+\.amazon\.",
+    r"unagi",
+    r"/csm/",
+    r"/rd/uedata",
+]
+
+# Always let these through, even if a rule above would block them
+# (scripts/styles that build the price and buy-box widgets)
+DEFAULT_ALLOW_PATTERNS = [
+    r"\.css(\?|$)",
+    r"/ajax/",
+    r"twister",
+]
+
+# Hosts considered first party; anything else is a third-party request
+FIRST_PARTY_PATTERN = re.compile(r"(^|\.)(amazon\.[a-z.]+|media-amazon\.com|ssl-images-amazon\.com)$")
+
+# Rough average transfer size per blocked request (bytes). Aborted requests are
+# never downloaded, so "bytes saved" can only be an estimate.
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "imageset": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "script": 60_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+    "document": 50_000,
+}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+
+class PageStats:
+    """Request counters for one page (reset before every navigation)."""
+
+    def __init__(self):
+        self.allowed_requests = 0
+        self.blocked_requests = 0
+        self.blocked_bytes = 0
+        self.blocked_by_type = {}
+
+    def as_dict(self):
+        return {
+            "allowed_requests": self.allowed_requests,
+            "blocked_requests": self.blocked_requests,
+            "blocked_bytes": self.blocked_bytes,
+            "blocked_by_type": dict(self.blocked_by_type),
+        }
+
+    def since(self, earlier):
+        """The counts added after `earlier` (an as_dict() of these counters), as PageStats."""
+        stats = PageStats()
+        stats.allowed_requests = self.allowed_requests - earlier["allowed_requests"]
+        stats.blocked_requests = self.blocked_requests - earlier["blocked_requests"]
+        stats.blocked_bytes = self.blocked_bytes - earlier["blocked_bytes"]
+        for resource_type, count in self.blocked_by_type.items():
+            count -= earlier["blocked_by_type"].get(resource_type, 0)
+            if count:
+                stats.blocked_by_type[resource_type] = count
+        return stats
+
+
+class ResourcePolicy:
+    """
+    Request interception for a browser context.
+    Aborts resource types and URL patterns that check_promotion doesn't need,
+    and counts the requests (and estimated bytes) saved per page.
+    """
+
+    def __init__(self, blocked_types=None, blocked_patterns=None, allow_patterns=None,
+                 block_third_party=True):
+        self.blocked_types = set(DEFAULT_BLOCKED_TYPES if blocked_types is None else blocked_types)
+        self.blocked_patterns = [re.compile(p) for p in (DEFAULT_BLOCKED_PATTERNS if blocked_patterns is None else blocked_patterns)]
+        self.allow_patterns = [re.compile(p) for p in (DEFAULT_ALLOW_PATTERNS if allow_patterns is None else allow_patterns)]
+        self.block_third_party = block_third_party
+        self.pages = {}
+        self.totals = PageStats()
+
+    def should_block(self, url, resource_type, page_host=None):
+        """
+        Returns the reason a request should be aborted, or None to let it through.
+        `page_host` (the host of the page being checked) always counts as first party.
+        """
+        if any(p.search(url) for p in self.allow_patterns):
+            return None
+        if resource_type in self.blocked_types:
+            return resource_type
+        if any(p.search(url) for p in self.blocked_patterns):
+            return "pattern"
+        if self.block_third_party:
+            host = urlparse(url).hostname or ""
+            if host and host != page_host and not FIRST_PARTY_PATTERN.search(host):
+                return "third-party"
+        return None
+
+    async def attach(self, context):
+        """Install the policy on a Playwright browser context."""
+        await context.route("**/*", self._handle)
+
+    def reset(self, page):
+        self.pages[page] = PageStats()
+
+    def stats(self, page):
+        return self.pages.get(page) or PageStats()
+
+    def forget(self, page):
+        self.pages.pop(page, None)
+
+    def _page_of(self, request):
+        try:
+            return request.frame.page
+        except Exception:
+            # Service worker / detached frame requests have no page
+            return None
+
+    async def _handle(self, route):
+        request = route.request
+        resource_type = request.resource_type
+        page = self._page_of(request)
+        page_stats = self.pages.get(page) if page else None
+
+        if request.is_navigation_request() and page and request.frame == page.main_frame:
+            # Never block the product page itself
+            reason = None
+        else:
+            page_host = urlparse(page.url).hostname if page else None
+            reason = self.should_block(request.url, resource_type, page_host)
+
+        if reason is None:
+            self.totals.allowed_requests += 1
+            if page_stats:
+                page_stats.allowed_requests += 1
+            await route.continue_()
+            return
+
+        size = ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+        for stats in (self.totals, page_stats):
+            if stats is None:
+                continue
+            stats.blocked_requests += 1
+            stats.blocked_bytes += size
+            stats.blocked_by_type[resource_type] = stats.blocked_by_type.get(resource_type, 0) + 1
+        await route.abort()
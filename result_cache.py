@@ -0,0 +1,105 @@
+import sqlite3
+import time
+
+from utils import extract_asin, marketplace_of
+
+DEFAULT_CACHE_FILE = "promo_cache.sqlite"
+
+# Seconds a result stays valid, per status. Statuses not listed here
+# (Error/Timeout, Error/Captcha, Error/Exception, ...) are never cached.
+DEFAULT_TTLS = {
+    "ACTIVE": 30 * 60,        # Deals change quickly
+    "NO PROMO": 6 * 60 * 60,
+}
+
+# SQLite's default limit on "?" parameters per statement is 999
+MAX_QUERY_PARAMS = 900
+
+
+def cache_key(url):
+    """
+    (product, marketplace) key for a URL. The product is the normalized ASIN;
+    URLs without one fall back to the URL itself.
+    """
+    return extract_asin(url) or str(url).strip(), marketplace_of(url)
+
+
+class ResultCache:
+    """
+    Persistent check_promotion results keyed by ASIN + marketplace, with a TTL
+    per status. Counts hits and misses for the run summary.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttls=None):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                asin TEXT NOT NULL,
+                marketplace TEXT NOT NULL,
+                status TEXT,
+                details TEXT,
+                current_price TEXT,
+                normal_price TEXT,
+                discount TEXT,
+                checked_at REAL,
+                expires_at REAL,
+                PRIMARY KEY (asin, marketplace)
+            )"""
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def get_many(self, keys):
+        """
+        Batched lookup. Returns {key: result_tuple} for every key with a fresh
+        entry. Doesn't touch the hit / miss counters: callers count each row
+        they answer from the batch with record_lookup(), so rows served some
+        other way (journal, re-check plan) are not counted as lookups.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        for start in range(0, len(keys), MAX_QUERY_PARAMS // 2):
+            chunk = keys[start:start + MAX_QUERY_PARAMS // 2]
+            where = " OR ".join(["(asin = ? AND marketplace = ?)"] * len(chunk))
+            params = [value for key in chunk for value in key]
+            rows = self.conn.execute(
+                f"SELECT asin, marketplace, status, details, current_price, normal_price, discount "
+                f"FROM results WHERE expires_at > ? AND ({where})",
+                [now] + params,
+            )
+            for asin, marketplace, *result in rows:
+                found[(asin, marketplace)] = tuple(result)
+        return found
+
+    def record_lookup(self, hit):
+        """Count one row looked up in a get_many() batch."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key, result, commit=True):
+        """Store a result tuple if its status is cacheable."""
+        status = result[0]
+        ttl = self.ttls.get(status)
+        if not ttl:
+            return
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key[0], key[1], *result, now, now + ttl),
+        )
+        if commit:
+            self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
@@ -0,0 +1,46 @@
+import random
+
+# Retries per URL for each error class; other statuses are final
+DEFAULT_RETRY_BUDGETS = {
+    "Error/Timeout": 3,
+    "Error/Exception": 2,
+    "Error/Captcha": 2,
+}
+
+# First backoff (s) per error class; a CAPTCHA needs a longer cool-down
+DEFAULT_BASE_DELAYS = {
+    "Error/Timeout": 5.0,
+    "Error/Exception": 5.0,
+    "Error/Captcha": 60.0,
+}
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed check is retried and after how long.
+    Each error class has its own retry budget per URL; delays grow
+    exponentially (base * 2^n, capped at `max_delay`) with full jitter so
+    retries of a burst of failures don't all come back at once.
+    """
+
+    def __init__(self, budgets=None, base_delays=None, max_delay=300.0, jitter=True):
+        self.budgets = dict(DEFAULT_RETRY_BUDGETS if budgets is None else budgets)
+        self.base_delays = dict(DEFAULT_BASE_DELAYS if base_delays is None else base_delays)
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.scheduled = {}  # status -> retries scheduled in this run
+        self.recovered = 0   # URLs that succeeded after at least one retry
+
+    def next_delay(self, status, retries):
+        """
+        Seconds to wait before the next attempt, or None if the budget of
+        `status` is used up. `retries` is {status: retries already made}.
+        """
+        used = retries.get(status, 0)
+        if used >= self.budgets.get(status, 0):
+            return None
+        delay = min(self.max_delay, self.base_delays.get(status, 5.0) * 2 ** used)
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        self.scheduled[status] = self.scheduled.get(status, 0) + 1
+        return delay
@@ -0,0 +1,376 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from extraction import (
+    DEAL_SELECTORS, DISCOUNT_SELECTOR, EXTRACT_ARGS, EXTRACT_SCRIPT, PRICE_CONTAINERS, PROFILE_SCRIPT,
+    analyze_extraction, extract_args, extract_from_html, profile_html, split_selector,
+)
+from metrics import Timings
+from price_parser import parse_price
+
+DEFAULT_PROFILE_FILE = "selector_profiles.json"
+SAMPLE_RATE = 0.05  # Share of pages profiled (and audited against all selectors)
+MIN_PAGES = 50  # Profiled pages of a marketplace before its selectors are pruned
+MIN_OBSERVATIONS = 50  # Profiled pages a selector is seen on before it may be dropped or scoped
+EXPENSIVE_SHARE = 0.25  # Selectors taking this share of the scan time are scoped when possible
+
+# Containers a match is attributed to, narrowest first. Expensive selectors
+# are rewritten to only search the containers their useful matches came from.
+SCOPES = [
+    "#corePriceDisplay_desktop_feature_div",
+    "#corePrice_feature_div",
+    "#apex_desktop",
+    "#buybox",
+    "#centerCol",
+    "#ppd",
+]
+SCAN_PHASES = ("price_scan", "badge_scan", "discount_scan")
+# Deal selectors that count even without text (see analyze_extraction)
+TEXTLESS_BADGE_MARKERS = ("acBadge", "ac-badge", "bestSeller")
+
+
+def part_selector(css, text):
+    """Selector string of one [css, has_text] part (inverse of split_selector)."""
+    return css if text is None else f"{css}:has-text('{text}')"
+
+
+def selector_groups(args=EXTRACT_ARGS):
+    """[group, parts] pairs of an extract_args() selector set, as PROFILE_SCRIPT takes them."""
+    return [
+        ["price", [part for parts in args["priceSelectors"] for part in parts]],
+        ["deal", [part for _, parts in args["badgeSelectors"] for part in parts]],
+        ["discount", args["discountSelector"]],
+    ]
+
+
+FULL_GROUPS = selector_groups()
+
+
+def contributions(rows, result, marketplace=None):
+    """
+    For each PROFILE_SCRIPT / profile_html row, the scopes of its visible
+    matches that made it into `result` (empty: the selector did not
+    contribute): the chosen current / normal price, a badge, the discount.
+    """
+    _, _, current_price, normal_price, discount = result
+    used_prices = {parse_price(price, marketplace)[0] for price in (current_price, normal_price)}
+    used_prices.discard(None)
+    found = []
+    for row in rows:
+        if row["group"] == "price":
+            hits = [scope for text, scope in row["visible"] if parse_price(text, marketplace)[0] in used_prices]
+        elif row["group"] == "deal":
+            textless = any(marker in row["css"] for marker in TEXTLESS_BADGE_MARKERS)
+            hits = [scope for text, scope in row["visible"] if textless or text]
+        else:
+            hits = [scope for text, scope in row["visible"] if text == discount]
+        found.append(hits)
+    return found
+
+
+class SelectorProfiler:
+    """
+    Per-marketplace selector telemetry and compiled selector profiles.
+
+    A sample of the pages (`sample_rate`) is profiled with every selector on
+    its own: evaluation time, matches, visible matches and whether it
+    contributed to the final result, aggregated per marketplace and tier
+    (browser / static). Once a marketplace has `min_pages` profiled pages,
+    compile() builds its profile: selectors that never contributed in at
+    least `min_observations` profiled pages are dropped, and expensive ones (bare tag `:has-text()` scans, or a large
+    share of the scan time) are scoped to the containers their useful
+    matches came from. The other pages of that marketplace then only run
+    the profile.
+
+    Sampled pages are also extracted with all selectors and the full result
+    is kept. The time the profile saves is measured there, and a profile
+    that gives a different result is dropped until compile() rebuilds it
+    from the updated statistics.
+
+    One profiler can be shared by concurrent runs (e.g. the app's sessions):
+    its statistics and profiles are only changed and read under `lock`.
+    """
+
+    def __init__(self, path=DEFAULT_PROFILE_FILE, sample_rate=SAMPLE_RATE, min_pages=MIN_PAGES,
+                 min_observations=MIN_OBSERVATIONS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.min_pages = min_pages
+        self.min_observations = min_observations
+        self.lock = threading.RLock()
+        self.stats = {}  # marketplace -> tier -> {"pages": n, "selectors": {"<group> <selector>": counters}}
+        self.savings = {}  # marketplace -> tier -> {"pages", "full_ms", "profile_ms", "mismatches"}
+        self.profiles = {}  # marketplace -> compiled profile
+        self._args = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        with self.lock:
+            self.stats = state.get("stats", {})
+            self.savings = state.get("savings", {})
+            self.profiles = state.get("profiles", {})
+            self._args = {}
+
+    def save(self, path=None):
+        """Atomically write the statistics and profiles."""
+        path = path or self.path
+        tmp_path = f"{path}.tmp"
+        with self.lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stats": self.stats, "savings": self.savings, "profiles": self.profiles}, f, indent=1)
+            os.replace(tmp_path, path)
+
+    # --- Checking pages ---
+    def extract_args(self, marketplace):
+        """Selector set for a page of `marketplace`: its compiled profile, or all selectors."""
+        marketplace = marketplace or "unknown"
+        with self.lock:
+            profile = self.profiles.get(marketplace)
+            if profile is None:
+                return EXTRACT_ARGS
+            if marketplace not in self._args:
+                self._args[marketplace] = extract_args(
+                    profile["price_containers"], profile["deal_selectors"], profile["discount_selector"]
+                )
+            return self._args[marketplace]
+
+    def should_sample(self, result):
+        """Whether to profile this page (never errors and CAPTCHAs, nothing to learn there)."""
+        return self.sample_rate > 0 and not result[0].startswith("Error") and random.random() < self.sample_rate
+
+    async def profile_page(self, page, marketplace, args, data, result):
+        """
+        Browser tier: profile the loaded page's selectors and audit `result`
+        (extracted with `args`, payload `data`) against all selectors.
+        Returns the result of all selectors.
+        """
+        rows = await page.evaluate(PROFILE_SCRIPT, {"groups": FULL_GROUPS, "scopes": SCOPES})
+        full_result = result
+        if args is not EXTRACT_ARGS:
+            full_data = await page.evaluate(EXTRACT_SCRIPT, EXTRACT_ARGS)
+            full_result = analyze_extraction(full_data, marketplace)
+            self._audit(marketplace, "browser", sum(full_data["timings"].values()),
+                        sum(data["timings"].values()), result, full_result)
+        self.observe(marketplace, "browser", rows, full_result)
+        return full_result
+
+    def profile_tree(self, tree, marketplace, args, result):
+        """Static tier counterpart of profile_page, on the parsed HTML (extraction.parse_html)."""
+        rows = profile_html(tree, FULL_GROUPS, SCOPES)
+        full_result = result
+        if args is not EXTRACT_ARGS:
+            full_ms, full_data = self._timed_extract(tree, EXTRACT_ARGS)
+            profile_ms, _ = self._timed_extract(tree, args)
+            full_result = analyze_extraction(full_data, marketplace)
+            self._audit(marketplace, "static", full_ms, profile_ms, result, full_result)
+        self.observe(marketplace, "static", rows, full_result)
+        return full_result
+
+    def _timed_extract(self, tree, args):
+        timings = Timings()
+        data = extract_from_html(tree, timings, args)
+        return sum(timings.spans.get(phase, 0.0) for phase in SCAN_PHASES) * 1000, data
+
+    def _audit(self, marketplace, tier, full_ms, profile_ms, result, full_result):
+        marketplace = marketplace or "unknown"
+        with self.lock:
+            saving = self.savings.setdefault(marketplace, {}).setdefault(
+                tier, {"pages": 0, "full_ms": 0.0, "profile_ms": 0.0, "mismatches": 0}
+            )
+            saving["pages"] += 1
+            saving["full_ms"] += full_ms
+            saving["profile_ms"] += profile_ms
+            if result != full_result:
+                saving["mismatches"] += 1
+                print(f"⚠️ Selector profile for {marketplace} missed something ({result[0]} instead of "
+                      f"{full_result[0]}), using all selectors until it is recompiled")
+                self.profiles.pop(marketplace, None)
+                self._args.pop(marketplace, None)
+
+    def observe(self, marketplace, tier, rows, result):
+        """Add one profiled page (PROFILE_SCRIPT rows and the final result) to the statistics."""
+        found = contributions(rows, result, marketplace)
+        with self.lock:
+            stats = self.stats.setdefault(marketplace or "unknown", {}).setdefault(tier, {"pages": 0, "selectors": {}})
+            stats["pages"] += 1
+            for row, hits in zip(rows, found):
+                key = f"{row['group']} {part_selector(row['css'], row['text'])}"
+                counters = stats["selectors"].setdefault(
+                    key, {"pages": 0, "ms": 0.0, "matches": 0, "visible": 0, "contributed": 0, "scopes": {}}
+                )
+                # Statistics saved before selectors counted their own pages were seen on every page
+                counters["pages"] = counters.get("pages", stats["pages"] - 1) + 1
+                counters["ms"] += row["ms"]
+                counters["matches"] += row["matches"]
+                counters["visible"] += row["visible_count"]
+                if hits:
+                    counters["contributed"] += 1
+                    for scope in set(hits):
+                        name = SCOPES[scope] if scope >= 0 else ""  # "" = outside every scope
+                        counters["scopes"][name] = counters["scopes"].get(name, 0) + 1
+
+    # --- Compiling ---
+    def compile(self, marketplace):
+        """
+        Build (or refresh) the profile of `marketplace` from its statistics.
+        Returns it, or None while it has fewer than `min_pages` profiled
+        pages or no price selector ever contributed. Selectors seen on fewer
+        than `min_observations` pages (e.g. ones added since) are kept as they are.
+        """
+        with self.lock:
+            return self._compile(marketplace or "unknown")
+
+    def _compile(self, marketplace):
+        tiers = self.stats.get(marketplace, {})
+        pages = sum(tier["pages"] for tier in tiers.values())
+        if pages < self.min_pages:
+            return None
+
+        share, observed, contributed, scopes = {}, {}, {}, {}
+        for tier in tiers.values():
+            total_ms = sum(counters["ms"] for counters in tier["selectors"].values()) or 1.0
+            for key, counters in tier["selectors"].items():
+                share[key] = max(share.get(key, 0.0), counters["ms"] / total_ms)
+                observed[key] = observed.get(key, 0) + counters.get("pages", tier["pages"])
+                contributed[key] = contributed.get(key, 0) + counters["contributed"]
+                seen = scopes.setdefault(key, {})
+                for scope, count in counters["scopes"].items():
+                    seen[scope] = seen.get(scope, 0) + count
+
+        dropped, scoped = [], []
+
+        def compile_part(group, css, text):
+            selector = part_selector(css, text)
+            key = f"{group} {selector}"
+            if observed.get(key, 0) < self.min_observations:
+                return [selector]
+            if not contributed.get(key):
+                dropped.append(key)
+                return []
+            seen = scopes.get(key, {})
+            # A :has-text() on a bare tag tests the text of every such element on the page
+            bare_text_scan = text is not None and not any(c in css for c in "#.[")
+            if (bare_text_scan or share.get(key, 0.0) >= EXPENSIVE_SHARE) and seen and "" not in seen:
+                scoped.append(key)
+                return [f"{scope} {selector}" for scope in SCOPES if scope in seen]
+            return [selector]
+
+        def compile_list(group, selector_list):
+            return ", ".join(
+                compiled for css, text in split_selector(selector_list) for compiled in compile_part(group, css, text)
+            )
+
+        price_containers = [compiled for compiled in (compile_list("price", s) for s in PRICE_CONTAINERS) if compiled]
+        if not price_containers:
+            return None
+        deal_selectors = []
+        for i, selector in enumerate(DEAL_SELECTORS):
+            compiled = compile_list("deal", selector)
+            if compiled:
+                deal_selectors.append(i if compiled == selector else [i, compiled])
+
+        profile = {
+            "price_containers": price_containers,
+            "deal_selectors": deal_selectors,
+            "discount_selector": compile_list("discount", DISCOUNT_SELECTOR),
+            "pages": pages,
+            "compiled_at": time.strftime("%Y-%m-%d %H:%M"),
+            "dropped": dropped,
+            "scoped": scoped,
+        }
+        self.profiles[marketplace] = profile
+        self._args.pop(marketplace, None)
+        return profile
+
+    def compile_all(self):
+        """Compile every marketplace with enough profiled pages; returns {marketplace: profile}."""
+        compiled = {}
+        with self.lock:
+            for marketplace in self.stats:
+                profile = self._compile(marketplace)
+                if profile:
+                    compiled[marketplace] = profile
+        return compiled
+
+    # --- Reports ---
+    def selector_report(self):
+        """
+        One row per marketplace, tier and selector: mean cost, matches and
+        visible matches per page, contribution rate and its fate in the
+        compiled profile (kept / dropped / scoped, "-" if not compiled yet).
+        """
+        with self.lock:
+            return self._selector_report()
+
+    def _selector_report(self):
+        rows = []
+        for marketplace, tiers in sorted(self.stats.items()):
+            profile = self.profiles.get(marketplace)
+            for tier, stats in sorted(tiers.items()):
+                pages = stats["pages"] or 1
+                for key, counters in sorted(stats["selectors"].items(), key=lambda item: -item[1]["ms"]):
+                    group, selector = key.split(" ", 1)
+                    if profile is None:
+                        fate = "-"
+                    elif key in profile["dropped"]:
+                        fate = "dropped"
+                    elif key in profile["scoped"]:
+                        fate = "scoped"
+                    else:
+                        fate = "kept"
+                    rows.append({
+                        "marketplace": marketplace,
+                        "tier": tier,
+                        "group": group,
+                        "selector": selector,
+                        "pages": stats["pages"],
+                        "mean_ms": round(counters["ms"] / pages, 3),
+                        "matches_per_page": round(counters["matches"] / pages, 2),
+                        "visible_per_page": round(counters["visible"] / pages, 2),
+                        "contribution_rate": round(counters["contributed"] / pages, 3),
+                        "profile": fate,
+                    })
+        return rows
+
+    def savings_report(self):
+        """Scan time per page with all selectors vs. the profile, measured on the audited pages."""
+        with self.lock:
+            return self._savings_report()
+
+    def _savings_report(self):
+        rows = []
+        for marketplace, tiers in sorted(self.savings.items()):
+            for tier, saving in sorted(tiers.items()):
+                pages = saving["pages"] or 1
+                full_ms = saving["full_ms"] / pages
+                profile_ms = saving["profile_ms"] / pages
+                rows.append({
+                    "marketplace": marketplace,
+                    "tier": tier,
+                    "pages": saving["pages"],
+                    "full_ms": round(full_ms, 3),
+                    "profile_ms": round(profile_ms, 3),
+                    "saved_ms_per_page": round(full_ms - profile_ms, 3),
+                    "saved_pct": round((full_ms - profile_ms) / full_ms * 100, 1) if full_ms else None,
+                    "mismatches": saving["mismatches"],
+                })
+        return rows
+
+
+if __name__ == "__main__":
+    # `python selector_profiler.py [selector_profiles.json]` prints the reports
+    import pandas as pd
+
+    profiler = SelectorProfiler(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PROFILE_FILE)
+    with pd.option_context("display.width", 200, "display.max_rows", 500, "display.max_colwidth", 70):
+        print("Selector telemetry:")
+        print(pd.DataFrame(profiler.selector_report()).to_string(index=False))
+        print("\nTime saved per page by the compiled profiles:")
+        print(pd.DataFrame(profiler.savings_report()).to_string(index=False))
@@ -0,0 +1,213 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import PHASES, PhaseMetrics, timing_column
+from promo_checker import ATTEMPTS_COLUMN, DEFAULT_REQUESTS_PER_MINUTE, RESULT_COLUMNS, iter_products
+from price_parser import add_price_columns
+from result_cache import ResultCache
+from utils import host_of
+
+DEFAULT_SHARD_RETRIES = 1
+
+
+def plan_shards(urls, shards):
+    """
+    Split row positions into up to `shards` partitions grouped by marketplace
+    host, so each host's request budget lives in (mostly) one process.
+    Hosts are assigned largest-first to the least loaded shard; when there are
+    fewer hosts than shards, the biggest host groups are split further.
+    Returns a list of (positions, host_split) where host_split is the number
+    of shards sharing that partition's host (used to divide its rate budget).
+    """
+    groups = {}
+    for position, url in enumerate(urls):
+        groups.setdefault(host_of(url), []).append(position)
+
+    # Split the largest groups until there are enough pieces to fill every shard
+    pieces = list(groups.items())
+    while len(pieces) < shards:
+        pieces.sort(key=lambda piece: len(piece[1]), reverse=True)
+        host, positions = pieces[0]
+        if len(positions) < 2:
+            break
+        half = len(positions) // 2
+        pieces[0] = (host, positions[:half])
+        pieces.append((host, positions[half:]))
+    splits = {}
+    for host, _ in pieces:
+        splits[host] = splits.get(host, 0) + 1
+
+    plan = [([], 1) for _ in range(min(shards, len(pieces)))]
+    for host, positions in sorted(pieces, key=lambda piece: len(piece[1]), reverse=True):
+        target = min(range(len(plan)), key=lambda i: len(plan[i][0]))
+        shard_positions, shard_split = plan[target]
+        plan[target] = (shard_positions + positions, max(shard_split, splits[host]))
+    return [(sorted(positions), split) for positions, split in plan if positions]
+
+
+def _run_shard(shard_id, attempt, urls, options, cache_path, progress_queue):
+    """Worker process entry point: checks one shard with its own Playwright instance."""
+
+    async def run():
+        cache = ResultCache(cache_path) if cache_path else None
+        metrics = PhaseMetrics()
+        records = []
+        try:
+            async for record in iter_products(urls, cache=cache, metrics=metrics, **options):
+                records.append(record)
+                progress_queue.put((shard_id, attempt, len(records)))
+        finally:
+            if cache:
+                cache.close()
+        return records, metrics
+
+    return asyncio.run(run())
+
+
+async def process_products_sharded(df, progress_callback=None, shards=None,
+                                   max_shard_retries=DEFAULT_SHARD_RETRIES, **options):
+    """
+    Sharded version of process_products for multi-core boxes.
+
+    The DataFrame is split into `shards` partitions (default: CPU count),
+    grouped by marketplace host. Each partition runs in its own worker process
+    with its own Playwright instance and `concurrency` budget. Results are
+    merged back in original row order and progress from all workers is
+    aggregated into the single progress_callback.
+
+    A failing worker only affects its own shard, which is retried up to
+    `max_shard_retries` times; each shard keeps a journal so a retry resumes
+    where the crashed attempt stopped. Rows of a shard that keeps failing are
+    reported as Error/Exception.
+
+    Accepts the same options as iter_products, except browser_pool,
+    rate_limiter, recheck, pause_gate, selector_profiler and memory_watchdog
+    (not shareable between processes / shards). A `cache` is reopened by
+    path in every worker, `snapshots` by its directory; `journal` and
+    `trace_file` are used as per-shard path prefixes. Phase metrics of all
+    shards are merged into `metrics_file`.
+    """
+    if "URL" not in df.columns:
+        raise ValueError("The dataframe must have a 'URL' column")
+    for option in ("browser_pool", "rate_limiter", "recheck", "pause_gate", "selector_profiler", "memory_watchdog"):
+        if options.pop(option, None) is not None:
+            print(f"⚠️ {option} is ignored in sharded mode")
+
+    urls = list(df["URL"])
+    total = len(urls)
+    shards = max(1, int(shards or os.cpu_count() or 1))
+    plan = plan_shards(urls, shards)
+
+    cache = options.pop("cache", None)
+    cache_path = cache.path if cache else None
+    journal_prefix = options.pop("journal", None)
+    resume = options.pop("resume", False)
+    trace_prefix = options.pop("trace_file", None)
+    metrics_file = options.pop("metrics_file", None)
+    metrics = options.pop("metrics", None) or PhaseMetrics()
+    journal_dir = None if journal_prefix else tempfile.TemporaryDirectory(prefix="promo_shards_")
+
+    results = [None] * total
+    progress = {}  # shard_id -> rows done in the current attempt
+    attempts = {}  # shard_id -> current attempt (ignore late messages from crashed ones)
+    rpm = options.pop("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)
+
+    print(f"Sharded run: {total} URLs in {len(plan)} worker processes")
+    if progress_callback:
+        progress_callback(0.0)
+
+    ctx = multiprocessing.get_context("spawn")  # Fresh interpreter per worker, no forked event loops
+    manager = ctx.Manager()
+    progress_queue = manager.Queue()
+    loop = asyncio.get_running_loop()
+
+    async def run_shard(shard_id, positions, host_split):
+        shard_urls = [urls[p] for p in positions]
+        base = journal_prefix or os.path.join(journal_dir.name, "shard")
+        shard_options = dict(
+            options,
+            requests_per_minute=rpm / host_split if rpm else rpm,
+            journal=f"{base}.shard{shard_id}.jsonl",
+        )
+        if trace_prefix:
+            shard_options["trace_file"] = f"{trace_prefix}.shard{shard_id}"
+        last_error = None
+        for attempt in range(max_shard_retries + 1):
+            shard_options["resume"] = resume or attempt > 0
+            attempts[shard_id] = attempt
+            progress[shard_id] = 0
+            # One executor per attempt: a crashed worker only breaks its own pool
+            executor = ProcessPoolExecutor(max_workers=1, mp_context=ctx)
+            try:
+                records, shard_metrics = await loop.run_in_executor(
+                    executor, _run_shard, shard_id, attempt, shard_urls, shard_options, cache_path, progress_queue
+                )
+            except asyncio.CancelledError:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            except Exception as e:
+                last_error = e
+                records = None
+                print(f"⚠️ Shard {shard_id} failed (attempt {attempt + 1}): {e!r}")
+            # Joining the worker process blocks: do it off the event loop, so
+            # progress callbacks (and a BrowserPool loop running this) go on
+            await loop.run_in_executor(None, executor.shutdown)
+            if records is None:
+                continue
+            metrics.merge(shard_metrics)
+            for record in records:
+                record["position"] = positions[record["position"]]
+                results[record["position"]] = record
+            progress[shard_id] = len(positions)
+            return
+
+        print(f"❌ Shard {shard_id} gave up after {max_shard_retries + 1} attempts")
+        for position in positions:
+            results[position] = {"position": position, "URL": urls[position]}
+            results[position].update(zip(RESULT_COLUMNS, (
+                "Error/Exception", f"Worker failed: {last_error!r}", "Error", "Error", "Error"
+            )))
+            results[position][ATTEMPTS_COLUMN] = 0
+        progress[shard_id] = len(positions)
+
+    async def report_progress():
+        while True:
+            try:
+                while True:
+                    shard_id, attempt, count = progress_queue.get_nowait()
+                    if attempts.get(shard_id) == attempt:
+                        progress[shard_id] = count
+            except queue.Empty:
+                pass
+            if progress_callback and total:
+                progress_callback(min(1.0, sum(progress.values()) / total))
+            await asyncio.sleep(0.5)
+
+    reporter = asyncio.create_task(report_progress())
+    try:
+        await asyncio.gather(*(run_shard(i, positions, split) for i, (positions, split) in enumerate(plan)))
+    finally:
+        reporter.cancel()
+        await loop.run_in_executor(None, manager.shutdown)
+        if journal_dir:
+            journal_dir.cleanup()
+
+    for column in RESULT_COLUMNS:
+        df[column] = [record[column] for record in results]
+    df[ATTEMPTS_COLUMN] = [record.get(ATTEMPTS_COLUMN, 1) for record in results]
+    if options.get("timing_columns"):
+        for phase in PHASES:
+            column = timing_column(phase)
+            df[column] = [record.get(column) for record in results]
+    add_price_columns(df)
+    if metrics_file:
+        metrics.write(metrics_file)
+
+    if progress_callback:
+        progress_callback(1.0)
+
+    return df
@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import html as html_lib
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from extraction import analyze_extraction, extract_from_html, parse_html
+from promo_checker import RESULT_COLUMNS
+from result_cache import cache_key
+
+DEFAULT_SNAPSHOT_DIR = "snapshots"
+COMPRESSION_LEVEL = 6
+COMMIT_EVERY = 100  # Index rows written per SQLite commit
+REPLAY_CHUNK_SIZE = 200  # Snapshots per task sent to a replay worker
+
+# Page regions kept in "region" mode, outermost first (nested ones are
+# skipped): everything extraction reads lives in the product / buy box area
+CAPTURE_REGIONS = [
+    "#ppd",
+    "#centerCol",
+    "#rightCol",
+    "#buybox",
+    "#apex_desktop",
+    "#corePrice_feature_div",
+    "#corePriceDisplay_desktop_feature_div",
+]
+
+# In-page counterpart of region_html(): the title and the outer HTML of the
+# capture regions, or null if the page has none of them
+CAPTURE_SCRIPT = """
+(regions) => {
+    const taken = [];
+    for (const selector of regions) {
+        const el = document.querySelector(selector);
+        if (el && !taken.some((other) => other.contains(el))) taken.push(el);
+    }
+    if (!taken.length) return null;
+    return {title: document.title, parts: taken.map((el) => el.outerHTML)};
+}
+"""
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Page snapshots need zstandard: pip install zstandard")
+    return zstandard
+
+
+_decompressor = None
+
+
+def load_html(root, digest):
+    """Decompress one stored snapshot (no index needed, used by replay workers)."""
+    global _decompressor
+    if _decompressor is None:
+        _decompressor = _zstd().ZstdDecompressor()
+    with open(object_path(root, digest), "rb") as f:
+        return _decompressor.decompress(f.read()).decode("utf-8")
+
+
+def object_path(root, digest):
+    return os.path.join(root, "objects", digest[:2], f"{digest[2:]}.zst")
+
+
+def region_document(title, parts):
+    return (f"<!doctype html><html><head><title>{html_lib.escape(title or '')}</title></head>"
+            f"<body>{''.join(parts)}</body></html>")
+
+
+def region_html(html, tree=None):
+    """
+    The title and the CAPTURE_REGIONS of a page as a small standalone
+    document, or the full HTML if it has none of the regions.
+    """
+    tree = tree or parse_html(html)
+    taken = []
+    taken_ids = set()
+    for selector in CAPTURE_REGIONS:
+        node = tree.css_first(selector)
+        parent = node
+        while parent is not None and parent.mem_id not in taken_ids:
+            parent = parent.parent
+        if node is not None and parent is None:  # Not inside a region already taken
+            taken.append(node)
+            taken_ids.add(node.mem_id)
+    if not taken:
+        return html
+    title = tree.css_first("title")
+    return region_document(title.text() if title else "", [node.html for node in taken])
+
+
+class SnapshotStore:
+    """
+    Content-addressed store of fetched product pages, for re-running the
+    extraction offline (see replay()).
+
+    Each snapshot is zstd-compressed and stored once under the SHA-256 of
+    its HTML (objects/ab/cdef....zst), so unchanged pages seen again cost
+    only an index row. The SQLite index maps every capture (URL, ASIN,
+    marketplace, time, tier) to its object, with the result the live
+    check reported. mode="region" keeps only the title and the product /
+    buy box regions (CAPTURE_REGIONS), "full" the whole HTML.
+    """
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_DIR, mode="region", level=COMPRESSION_LEVEL):
+        if mode not in ("region", "full"):
+            raise ValueError(f"Unknown snapshot mode '{mode}', choose 'region' or 'full'")
+        self.root = root
+        self.mode = mode
+        self.level = level
+        self.compressor = _zstd().ZstdCompressor(level=level)
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30,
+                                    check_same_thread=False)  # Shards share the index
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, raw_bytes INTEGER, stored_bytes INTEGER)"
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                digest TEXT NOT NULL,
+                url TEXT,
+                asin TEXT,
+                marketplace TEXT,
+                captured_at REAL,
+                tier TEXT,
+                mode TEXT,
+                status TEXT,
+                details TEXT,
+                current_price TEXT,
+                normal_price TEXT,
+                discount TEXT
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS snapshots_item ON snapshots (asin, marketplace, captured_at)")
+        self.conn.commit()
+        self.pending = 0
+        self.captured = 0
+        self.deduplicated = 0
+
+    def __getstate__(self):
+        # Picklable for sharded runs: worker processes reopen the store
+        return {"root": self.root, "mode": self.mode, "level": self.level}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"], state["mode"], state["level"])
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    # --- Capture ---
+    def put_html(self, html):
+        """Store `html` (if not stored yet) and return its digest."""
+        raw = html.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = object_path(self.root, digest)
+        if os.path.exists(path):
+            self.deduplicated += 1
+            return digest
+        data = self.compressor.compress(raw)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Atomic, concurrent shards may store the same page
+        self.conn.execute("INSERT OR IGNORE INTO objects VALUES (?, ?, ?)", (digest, len(raw), len(data)))
+        return digest
+
+    def capture(self, url, html, tier, result, tree=None, trim=True):
+        """
+        Store a fetched page with the result the live check found for it.
+        `tree`: the already parsed HTML, if any (saves re-parsing it for
+        the region cut). Returns the snapshot digest.
+        """
+        if self.mode == "region" and trim:
+            html = region_html(html, tree)
+        digest = self.put_html(html)
+        asin, marketplace = cache_key(url)
+        self.conn.execute(
+            "INSERT INTO snapshots (digest, url, asin, marketplace, captured_at, tier, mode, status, details, "
+            "current_price, normal_price, discount) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, url, asin, marketplace, time.time(), tier, self.mode, *result),
+        )
+        self.captured += 1
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.commit()
+        return digest
+
+    async def capture_page(self, page, url, result):
+        """Browser tier: store the loaded page's regions (or full HTML) with its result."""
+        regions = await page.evaluate(CAPTURE_SCRIPT, CAPTURE_REGIONS) if self.mode == "region" else None
+        if regions:
+            return self.capture(url, region_document(regions["title"], regions["parts"]), "browser", result, trim=False)
+        return self.capture(url, await page.content(), "browser", result, trim=False)
+
+    # --- Reading ---
+    def get_html(self, digest):
+        return load_html(self.root, digest)
+
+    def entries(self, marketplace=None, since=None, latest_only=True):
+        """
+        Index rows as dicts, oldest first: the latest snapshot of every
+        product (or every capture with latest_only=False), optionally only
+        one marketplace and / or captures after `since` (epoch seconds).
+        """
+        conditions, params = [], []
+        if latest_only:
+            conditions.append("id IN (SELECT MAX(id) FROM snapshots GROUP BY COALESCE(asin, url), marketplace)")
+        if marketplace:
+            conditions.append("marketplace = ?")
+            params.append(marketplace)
+        if since is not None:
+            conditions.append("captured_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.execute(f"SELECT * FROM snapshots {where} ORDER BY id", params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def stats(self):
+        """Captures, distinct pages stored and their raw / compressed size."""
+        captures = self.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        objects, raw_bytes, stored_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM objects"
+        ).fetchone()
+        return {
+            "captures": captures,
+            "objects": objects,
+            "raw_mb": round(raw_bytes / (1024 * 1024), 2),
+            "stored_mb": round(stored_bytes / (1024 * 1024), 2),
+            "compression_ratio": round(raw_bytes / stored_bytes, 1) if stored_bytes else None,
+        }
+
+
+# --- Replay ---
+
+def _replay_chunk(root, items):
+    """Replay worker: re-extract [(digest, marketplace)] pairs, returns their result tuples."""
+    results = []
+    for digest, marketplace in items:
+        try:
+            data = extract_from_html(load_html(root, digest))
+            results.append(analyze_extraction(data, marketplace))
+        except Exception as e:
+            results.append(("Error/Exception", f"Replay failed: {e}", "Error", "Error", "Error"))
+    return results
+
+
+def replay(store, workers=None, marketplace=None, since=None, latest_only=True,
+           chunk_size=REPLAY_CHUNK_SIZE, progress_callback=None):
+    """
+    Re-run the current extraction and analysis code over stored snapshots,
+    without a browser or network, across `workers` processes (default: CPU
+    count; 1 runs in this process). Identical pages of a marketplace are
+    extracted once. Returns a DataFrame with the live and replayed result
+    of every snapshot and a "Changed" flag.
+    """
+    import pandas as pd
+
+    entries = store.entries(marketplace=marketplace, since=since, latest_only=latest_only)
+    unique = list(dict.fromkeys((entry["digest"], entry["marketplace"]) for entry in entries))
+    chunks = [unique[start:start + chunk_size] for start in range(0, len(unique), chunk_size)]
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    print(f"Replaying {len(entries)} snapshots ({len(unique)} distinct pages) with {min(workers, len(chunks) or 1)} workers")
+
+    start = time.perf_counter()
+    replayed = {}
+    done = 0
+    if workers == 1 or len(chunks) <= 1:
+        results = (_replay_chunk(store.root, chunk) for chunk in chunks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        results = pool.map(_replay_chunk, [store.root] * len(chunks), chunks)
+    try:
+        for chunk, chunk_results in zip(chunks, results):
+            replayed.update(zip(chunk, chunk_results))
+            done += len(chunk)
+            if progress_callback:
+                progress_callback(done / len(unique))
+    finally:
+        if pool:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(unique)} pages in {elapsed:.1f}s ({len(unique) / elapsed if elapsed else 0:.0f} pages/s)")
+
+    rows = []
+    for entry in entries:
+        new = replayed[(entry["digest"], entry["marketplace"])]
+        old = (entry["status"], entry["details"], entry["current_price"], entry["normal_price"], entry["discount"])
+        row = {
+            "URL": entry["url"],
+            "ASIN": entry["asin"],
+            "Marketplace": entry["marketplace"],
+            "Captured At": time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["captured_at"])),
+            "Tier": entry["tier"],
+            "Snapshot": entry["digest"][:16],
+        }
+        for column, old_value, new_value in zip(RESULT_COLUMNS, old, new):
+            row[f"Live {column}"] = old_value
+            row[f"Replay {column}"] = new_value
+        # Details text is informative only; a change is a different status, price or discount
+        row["Changed"] = (old[0], *old[2:]) != (new[0], *new[2:])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def replay_summary(df):
+    """
+    {change: count} of the changed rows, most common first. A change is
+    "Live status -> Replay status", or "status: changed fields" when only
+    prices / discount differ (e.g. "ACTIVE: Normal Price").
+    """
+    if df.empty:
+        return {}
+    changes = []
+    for _, row in df[df["Changed"]].iterrows():
+        live, new = row["Live Promo Status"], row["Replay Promo Status"]
+        if live != new:
+            changes.append(f"{live} -> {new}")
+        else:
+            fields = [c for c in RESULT_COLUMNS[2:] if row[f"Live {c}"] != row[f"Replay {c}"]]
+            changes.append(f"{live}: {', '.join(fields)}")
+    counts = {}
+    for change in changes:
+        counts[change] = counts.get(change, 0) + 1
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page snapshot store: statistics and offline replay.")
+    parser.add_argument("command", choices=["stats", "replay"])
+    parser.add_argument("--root", default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--workers", type=int, help="Replay processes (default: CPU count)")
+    parser.add_argument("--marketplace", help="Only this marketplace (e.g. de)")
+    parser.add_argument("--days", type=float, help="Only snapshots of the last N days")
+    parser.add_argument("--all", action="store_true", help="Every capture, not just the latest per product")
+    parser.add_argument("--output", help="Write the replay report (.xlsx, .csv, .jsonl or .parquet)")
+    parser.add_argument("--changed-only", action="store_true", help="Only report rows whose result changed")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.root)
+    try:
+        print(store.stats())
+        if args.command == "replay":
+            since = time.time() - args.days * 86400 if args.days else None
+            df = replay(store, workers=args.workers, marketplace=args.marketplace, since=since,
+                        latest_only=not args.all)
+            print(f"{int(df['Changed'].sum()) if len(df) else 0} of {len(df)} results changed")
+            for change, count in replay_summary(df).items():
+                print(f"  {change}: {count}")
+            if args.output:
+                from report_writer import open_report
+
+                with open_report(args.output, price_columns=False) as report:
+                    report.write_frame(df[df["Changed"]] if args.changed_only else df)
+                print(f"Saved to {args.output}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from browser_setup import probe_chromium  # noqa: E402
+from fixture_server import FIXTURES_DIR, start_fixture_server  # noqa: E402
+
+# Tests that drive a real Chromium; `playwright install chromium` enables them
+needs_chromium = pytest.mark.skipif(not probe_chromium(), reason="Playwright or its Chromium is not installed")
+
+
+def load_expected():
+    """{fixture name: {status, current_price, normal_price, discount}} of benchmarks/fixtures/expected.json."""
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def outcome(record):
+    """The expected.json fields of a record (or a result tuple)."""
+    if isinstance(record, tuple):
+        return {"status": record[0], "current_price": record[2], "normal_price": record[3], "discount": record[4]}
+    return {"status": record["Promo Status"], "current_price": record["Current Price"],
+            "normal_price": record["Normal Price"], "discount": record["Discount"]}
+
+
+def collect(urls, **options):
+    """Records of an offline iter_products run (no pacing sleeps), in input order."""
+    import promo_checker
+
+    options = {"requests_per_minute": None, "adaptive_pacing": False, **options}
+
+    async def run():
+        return [record async for record in promo_checker.iter_products(urls, **options)]
+
+    return sorted(asyncio.run(run()), key=lambda record: record["position"])
+
+
+@pytest.fixture(scope="session")
+def fixture_base():
+    """Base URL of a local fixture server (see benchmarks/fixture_server.py)."""
+    server, base_url = start_fixture_server()
+    yield base_url
+    server.shutdown()
@@ -0,0 +1,43 @@
+import playwright.async_api
+
+import promo_checker
+from conftest import collect
+from retry_policy import RetryPolicy
+
+
+class FailingPlaywright:
+    """async_playwright() whose Chromium can't be launched."""
+
+    starts = 0
+    launches = 0
+    stops = 0
+
+    def __init__(self):
+        self.chromium = self
+
+    async def start(self):
+        FailingPlaywright.starts += 1
+        return self
+
+    async def launch(self, **kwargs):
+        FailingPlaywright.launches += 1
+        raise RuntimeError("BrowserType.launch: Executable doesn't exist")
+
+    async def stop(self):
+        FailingPlaywright.stops += 1
+
+
+def test_browser_launch_failure_fails_rows_not_the_run(fixture_base, monkeypatch):
+    monkeypatch.setattr(playwright.async_api, "async_playwright", FailingPlaywright)
+    monkeypatch.setattr(promo_checker, "ensure_playwright_browsers", lambda: None)
+    urls = [f"{fixture_base}/dp/deal?i={i}" for i in range(4)]
+    retry_policy = RetryPolicy(base_delays={"Error/Exception": 0.01}, jitter=False)
+
+    records = collect(urls, http_first=False, concurrency=2, retry_policy=retry_policy)
+
+    assert [record["Promo Status"] for record in records] == ["Error/Exception"] * 4
+    assert all(record["Details"].startswith("Browser unavailable: BrowserType.launch") for record in records)
+    # Every attempt (first try plus 2 retries) launches afresh, and nothing started is left running
+    assert [record["Attempts"] for record in records] == [3] * 4
+    assert FailingPlaywright.launches == 12
+    assert FailingPlaywright.starts == FailingPlaywright.stops > 0
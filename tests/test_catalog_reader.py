@@ -0,0 +1,87 @@
+import asyncio
+import io
+
+import pandas as pd
+
+import promo_checker
+from catalog_reader import CatalogReader
+from promo_checker import iter_catalog
+
+ASINS = ["0123456789", "B000000001", "B000000002", "0987654321", "B000000003"]
+
+
+def test_csv_is_read_in_chunks(tmp_path):
+    path = tmp_path / "productos.csv"
+    pd.DataFrame({"ASIN": ASINS, "Name": list("abcde")}).to_csv(path, index=False)
+
+    reader = CatalogReader(str(path), chunk_size=2)
+
+    assert reader.columns == ["ASIN", "Name", "URL"]
+    assert reader.estimated_rows() == 5
+    assert [len(chunk) for chunk in reader.chunks()] == [2, 2, 1]
+    rows = list(reader.rows())
+    # ISBN-style ASINs keep their leading zero
+    assert [row["URL"] for row in rows] == [f"https://www.amazon.de/dp/{asin}" for asin in ASINS]
+    assert reader.preview(2)["URL"].tolist() == [f"https://www.amazon.de/dp/{asin}" for asin in ASINS[:2]]
+
+
+def test_csv_encoding_is_sniffed():
+    utf8 = io.BytesIO("\ufeffURL,Name\nhttps://www.amazon.de/dp/B000000001,Müsli\n".encode("utf-8"))
+    utf8.name = "upload.csv"
+    latin1 = io.BytesIO("URL,Name\nhttps://www.amazon.de/dp/B000000001,Müsli\n".encode("latin1"))
+    latin1.name = "upload.csv"
+
+    for upload, encoding in [(utf8, "utf-8-sig"), (latin1, "latin1")]:
+        reader = CatalogReader(upload)
+        assert reader.encoding == encoding
+        assert reader.columns == ["URL", "Name"]  # No BOM in the first header
+        assert [row["Name"] for row in reader.rows()] == ["Müsli"]
+
+
+def test_excel_is_read_in_chunks(tmp_path):
+    path = tmp_path / "productos.xlsx"
+    pd.DataFrame({"ASIN": ASINS, "Name": list("abcde")}).to_excel(path, index=False)
+
+    reader = CatalogReader(str(path), marketplace="fr", chunk_size=2)
+
+    assert reader.estimated_rows() == 5
+    assert [len(chunk) for chunk in reader.chunks()] == [2, 2, 1]
+    assert [row["URL"] for row in reader.rows()] == [f"https://www.amazon.fr/dp/{asin}" for asin in ASINS]
+
+
+def test_checking_starts_before_the_file_is_read(fixture_base, tmp_path, monkeypatch):
+    # Small batches and read-ahead, so 40 rows are a long file
+    monkeypatch.setattr(promo_checker, "FEED_BATCH_SIZE", 4)
+    monkeypatch.setattr(promo_checker, "LANE_READ_AHEAD", 4)
+    path = tmp_path / "productos.csv"
+    names = ["deal", "no_promo", "coupon"]
+    pd.DataFrame({"URL": [f"{fixture_base}/dp/{names[i % 3]}?row={i}" for i in range(40)],
+                  "Row": range(40)}).to_csv(path, index=False)
+    reader = CatalogReader(str(path), chunk_size=4)
+    chunks_read = []
+    read_chunks = reader.chunks
+
+    def counting_chunks():
+        for chunk in read_chunks():
+            chunks_read.append(len(chunk))
+            yield chunk
+
+    reader.chunks = counting_chunks
+
+    async def run():
+        records, read_at_first = [], None
+        async for record in iter_catalog(reader, requests_per_minute=None, adaptive_pacing=False):
+            if read_at_first is None:
+                read_at_first = len(chunks_read)
+            records.append(record)
+        return records, read_at_first
+
+    records, read_at_first = asyncio.run(run())
+
+    # A few of the 10 chunks were read when the first result came back
+    assert read_at_first <= 3
+    assert len(chunks_read) == 10
+    # Each record carries the other columns of its input row
+    assert sorted(record["Row"] for record in records) == list(range(40))
+    assert all(record["position"] == record["Row"] for record in records)
+    assert {record["Promo Status"] for record in records} == {"ACTIVE", "NO PROMO"}
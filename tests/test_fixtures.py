@@ -0,0 +1,68 @@
+import asyncio
+
+import promo_checker
+from conftest import collect, load_expected, needs_chromium, outcome
+from http_fetcher import StaticFetcher
+
+# Pages the static tier can't read: it hands them to the browser
+BROWSER_ONLY = {"captcha", "missing_price"}
+
+
+def test_static_tier_matches_expected(fixture_base):
+    expected = load_expected()
+
+    async def check_all():
+        async with StaticFetcher(promo_checker.USER_AGENT) as fetcher:
+            return {name: await fetcher.check(f"{fixture_base}/dp/{name}") for name in expected}
+
+    results = asyncio.run(check_all())
+    for name, want in expected.items():
+        if name in BROWSER_ONLY:
+            assert results[name] is None, name
+        else:
+            assert outcome(results[name]) == want, name
+
+
+@needs_chromium
+def test_browser_matches_expected(fixture_base, monkeypatch):
+    """One navigation per page, then the ready-selector wait, gives the expected results."""
+    from playwright.async_api import Page
+
+    navigations = []
+    goto = Page.goto
+
+    async def counting_goto(page, url, *args, **kwargs):
+        navigations.append(url)
+        return await goto(page, url, *args, **kwargs)
+
+    monkeypatch.setattr(Page, "goto", counting_goto)
+    monkeypatch.setattr(promo_checker, "READY_TIMEOUT_MS", 2000)
+    expected = load_expected()
+    urls = [f"{fixture_base}/dp/{name}" for name in expected]
+
+    records = collect(urls, http_first=False, concurrency=2, retries=False)
+
+    assert {name: outcome(record) for name, record in zip(expected, records)} == expected
+    assert sorted(navigations) == sorted(urls)
+
+
+def test_pipeline_matches_expected(fixture_base):
+    """The whole pipeline over the static tier, several pages in flight."""
+    expected = {name: want for name, want in load_expected().items() if name not in BROWSER_ONLY}
+    urls = [f"{fixture_base}/dp/{name}?i={i}" for i in range(3) for name in expected]
+
+    records = collect(urls, concurrency=3, retries=False)
+
+    assert [outcome(record) for record in records] == [want for _ in range(3) for want in expected.values()]
+
+
+@needs_chromium
+def test_browser_pipeline_matches_expected(fixture_base, monkeypatch):
+    """The same, through check_promotion / EXTRACT_SCRIPT: several browser pages in flight."""
+    monkeypatch.setattr(promo_checker, "READY_TIMEOUT_MS", 2000)
+    expected = load_expected()
+    urls = [f"{fixture_base}/dp/{name}?i={i}" for i in range(3) for name in expected]
+
+    records = collect(urls, http_first=False, concurrency=3, retries=False)
+
+    assert [outcome(record) for record in records] == [want for _ in range(3) for want in expected.values()]
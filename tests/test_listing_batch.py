@@ -0,0 +1,60 @@
+from conftest import collect
+from fixture_server import load_asins, start_fixture_server
+from listing_batch import ListingBatcher
+from promo_checker import RESULT_COLUMNS
+
+# The product page of B0FIXMISS1 needs the browser
+ASINS = [asin for asin in load_asins() if asin != "B0FIXMISS1"]
+# Coupon and lightning deal tiles, variations with several prices, and an
+# ASIN missing from the listing: checked on their product page
+PRODUCT_PAGE_ASINS = {"B0FIXDEAL1", "B0FIXCOUP1", "B0FIXLIGH1", "B0FIXVARI1", "B0FIXGONE1"}
+
+
+def results(records):
+    return [{column: record[column] for column in RESULT_COLUMNS} for record in records]
+
+
+def test_listing_rows_match_product_page_rows():
+    server, base_url = start_fixture_server()
+    try:
+        urls = [f"{base_url}/dp/{asin}" for asin in ASINS]
+        per_product = collect(urls, concurrency=2, retries=False)
+        server.hits.clear()
+
+        from_listing = collect(urls, concurrency=2, retries=False, listing_batch=True)
+
+        assert results(from_listing) == results(per_product)
+        assert server.hits == {"listing": 1, "product": len(PRODUCT_PAGE_ASINS)}
+    finally:
+        server.shutdown()
+
+
+def test_failed_listing_lookups_fall_back_to_product_pages(monkeypatch):
+    import promo_checker
+    from http_fetcher import StaticFetcher
+
+    async def failing_fetch(self, url, timings=None):
+        raise RuntimeError("connection pool closed")
+
+    def failing_analysis(*args):
+        raise ValueError("unexpected tile layout")
+
+    server, base_url = start_fixture_server()
+    try:
+        urls = [f"{base_url}/dp/{asin}" for asin in ASINS]
+        per_product = collect(urls, retries=False)
+
+        for target, name, failure in [(StaticFetcher, "fetch_page", failing_fetch),
+                                      (promo_checker, "analyze_extraction", failing_analysis)]:
+            with monkeypatch.context() as patch:
+                patch.setattr(target, name, failure)
+                server.hits.clear()
+                listing = ListingBatcher()
+
+                from_listing = collect(urls, retries=False, listing_batch=listing)
+
+            assert results(from_listing) == results(per_product), name
+            assert server.hits["product"] == len(ASINS), name
+            assert (listing.pages, listing.found, listing.fallbacks) == (1, 0, len(ASINS)), name
+    finally:
+        server.shutdown()
@@ -0,0 +1,87 @@
+import asyncio
+
+import pandas as pd
+
+from catalog_reader import CatalogReader
+from marketplaces import normalize_marketplace, wide_report
+from promo_checker import process_catalog
+
+
+def test_marketplace_names_are_normalized():
+    assert [normalize_marketplace(value) for value in ["DE", " amazon.fr ", "www.amazon.co.uk", "uk", "mx",
+                                                       "https://www.amazon.co.jp/dp/B000000001"]] == \
+        ["de", "fr", "co.uk", "co.uk", "com.mx", "co.jp"]
+    assert [normalize_marketplace(value, "es") for value in [None, float("nan"), "", "  "]] == ["es"] * 4
+
+
+def test_rows_are_fanned_out_to_every_marketplace(tmp_path):
+    path = tmp_path / "productos.csv"
+    pd.DataFrame({"URL": ["https://www.amazon.de/dp/B000000001", "https://example.com/no-asin",
+                          "https://www.amazon.de/dp/0123456789"],
+                  "Name": ["a", "b", "c"]}).to_csv(path, index=False)
+
+    reader = CatalogReader(str(path), marketplaces=["de", "FR", "uk"], chunk_size=2)
+    rows = list(reader.rows())
+
+    assert reader.multi_marketplace
+    assert reader.estimated_rows() == 9
+    assert [(row["Name"], row["Marketplace"], row["URL"]) for row in rows] == [
+        ("a", "de", "https://www.amazon.de/dp/B000000001"),
+        ("a", "fr", "https://www.amazon.fr/dp/B000000001"),
+        ("a", "co.uk", "https://www.amazon.co.uk/dp/B000000001"),
+        ("b", "example.com", "https://example.com/no-asin"),  # No ASIN: checked once, as it is
+        ("c", "de", "https://www.amazon.de/dp/0123456789"),
+        ("c", "fr", "https://www.amazon.fr/dp/0123456789"),
+        ("c", "co.uk", "https://www.amazon.co.uk/dp/0123456789"),
+    ]
+
+
+def test_marketplace_column_picks_each_rows_marketplace(tmp_path):
+    path = tmp_path / "productos.csv"
+    pd.DataFrame({"ASIN": ["B000000001", "B000000002", "B000000003"],
+                  "Marketplace": ["amazon.fr", "UK", None]}).to_csv(path, index=False)
+
+    reader = CatalogReader(str(path), marketplace="es", marketplaces=["de", "it"])  # The column wins
+
+    assert reader.marketplaces is None and reader.multi_marketplace
+    assert [row["URL"] for row in reader.rows()] == [
+        "https://www.amazon.fr/dp/B000000001", "https://www.amazon.co.uk/dp/B000000002",
+        "https://www.amazon.es/dp/B000000003"]
+
+
+def test_wide_report_puts_marketplaces_side_by_side():
+    long = pd.DataFrame({
+        "URL": ["https://www.amazon.de/dp/B000000001", "https://www.amazon.fr/dp/B000000001",
+                "https://www.amazon.de/dp/B000000002", "https://www.amazon.fr/dp/B000000002",
+                "https://www.amazon.fr/dp/B000000003"],
+        "Name": ["a", "a", "b", "b", "c"],
+        "Promo Status": ["ACTIVE", "NO PROMO", "NO PROMO", "Error/Timeout", "ACTIVE"],
+        "Current Price": ["29,99 €", "31,99 €", "10,00 €", "N/A", "5,00 €"],
+    })
+
+    wide = wide_report(long, ["Name"])
+
+    assert list(wide.columns) == ["ASIN", "Name", "Promo Status (de)", "Current Price (de)", "Promo Status (fr)",
+                                  "Current Price (fr)"]
+    assert wide["ASIN"].tolist() == ["B000000001", "B000000002", "B000000003"]
+    assert wide["Promo Status (fr)"].tolist() == ["NO PROMO", "Error/Timeout", "ACTIVE"]
+    assert wide["Current Price (de)"].tolist()[:2] == ["29,99 €", "10,00 €"]
+    assert pd.isna(wide.loc[2, "Promo Status (de)"])  # Not checked there
+
+
+def test_catalog_run_gives_one_wide_row_per_product(fixture_base, tmp_path):
+    # The fixture server stands in for both marketplaces; its pages are found by ASIN
+    path = tmp_path / "productos.csv"
+    pd.DataFrame({"URL": [f"{fixture_base}/dp/{asin}" for asin in
+                          ["B0FIXDEAL1", "B0FIXDEAL1", "B0FIXNOPR1", "B0FIXNOPR1", "B0FIXCOUP1"]],
+                  "Marketplace": ["de", "fr", "de", "fr", "fr"],
+                  "Name": ["deal", "deal", "no promo", "no promo", "coupon"]}).to_csv(path, index=False)
+    reader = CatalogReader(str(path))
+
+    df = asyncio.run(process_catalog(reader, concurrency=2, requests_per_minute=None, adaptive_pacing=False))
+    wide = wide_report(df, reader.input_columns)
+
+    assert wide["Name"].tolist() == ["deal", "no promo", "coupon"]
+    assert wide["Promo Status (de)"].fillna("").tolist() == ["ACTIVE", "NO PROMO", ""]
+    assert wide["Promo Status (fr)"].tolist() == ["ACTIVE", "NO PROMO", "ACTIVE"]
+    assert wide["Current Price (fr)"].tolist()[0] == "29,99 €"
@@ -0,0 +1,154 @@
+import asyncio
+
+import playwright.async_api
+
+import promo_checker
+from conftest import collect
+from extraction import extract_from_html
+from fixture_server import load_fixtures
+from memory_guard import MAX_SAMPLES, MemoryWatchdog, RecyclePolicy
+
+FIXTURES = load_fixtures()
+
+
+class FakePlaywright:
+    """async_playwright() whose Chromium serves the fixture named by the URL's last path part."""
+
+    contexts = []
+
+    def __init__(self):
+        self.chromium = self
+
+    async def start(self):
+        FakePlaywright.contexts = []
+        return self
+
+    async def launch(self, **kwargs):
+        return FakeBrowser()
+
+    async def stop(self):
+        pass
+
+
+class FakeBrowser:
+    async def new_context(self, storage_state=None, **options):
+        context = FakeContext(storage_state)
+        FakePlaywright.contexts.append(context)
+        return context
+
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, storage_state):
+        self.storage_state_in = storage_state
+        self.pages = []
+        self.closed = False
+
+    async def add_cookies(self, cookies):
+        pass
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+    async def storage_state(self):
+        return {"cookies": [{"name": "session-id", "value": str(len(FakePlaywright.contexts))}]}
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    def __init__(self):
+        self.navigations = 0
+        self.closed = False
+        self.html = None
+
+    async def goto(self, url, **kwargs):
+        await asyncio.sleep(0.02)  # Leaves the memory watchdog time to sample
+        self.navigations += 1
+        self.html = FIXTURES[url.split("?")[0].rsplit("/", 1)[-1]]
+
+    async def wait_for_selector(self, selector, **kwargs):
+        pass
+
+    async def evaluate(self, script, args):
+        return extract_from_html(self.html, None, args)
+
+    async def close(self):
+        self.closed = True
+
+
+def browser_run(monkeypatch, urls, **options):
+    monkeypatch.setattr(playwright.async_api, "async_playwright", FakePlaywright)
+    monkeypatch.setattr(promo_checker, "ensure_playwright_browsers", lambda: None)
+    return collect(urls, http_first=False, block_resources=False, **options)
+
+
+def test_pages_and_contexts_are_recycled_every_n_navigations(monkeypatch):
+    recycle = RecyclePolicy(pages_every=3, contexts_every=5, max_rss_mb=None)
+    urls = [f"https://www.amazon.de/dp/deal?i={i}" for i in range(12)]
+
+    records = browser_run(monkeypatch, urls, recycle=recycle)
+
+    assert [record["Promo Status"] for record in records] == ["ACTIVE"] * 12
+    contexts = FakePlaywright.contexts
+    pages = [page for context in contexts for page in context.pages]
+    # Pages: 3 navigations, or fewer when their context was replaced under them
+    assert [page.navigations for page in pages] == [3, 2, 3, 2, 2]
+    assert (recycle.pages_recycled, recycle.contexts_recycled) == (4, 2)
+    assert [context.closed for context in contexts] == [True, True, False]
+    assert all(page.closed for page in pages[:-1])
+    # A replacement context starts with the cookies of the one it replaces
+    assert contexts[0].storage_state_in is None
+    assert contexts[1].storage_state_in["cookies"][0]["name"] == "session-id"
+
+
+def test_memory_pressure_replaces_every_context_once_per_cooldown(monkeypatch):
+    recycle = RecyclePolicy(pages_every=None, contexts_every=None, max_rss_mb=1, cooldown=3600)
+    watchdog = MemoryWatchdog(interval=0.01, policy=recycle)
+    urls = [f"https://www.amazon.{domain}/dp/deal?i={i}" for i in range(3) for domain in ["de", "fr"]]
+
+    records = browser_run(monkeypatch, urls, recycle=recycle, memory_watchdog=watchdog)
+
+    assert [record["Promo Status"] for record in records] == ["ACTIVE"] * 6
+    assert recycle.pressure_recycles == 1
+    assert recycle.contexts_recycled == len([c for c in FakePlaywright.contexts if c.closed]) >= 1
+    assert watchdog.summary()["peak_mb"] > 1
+
+
+def test_recycling_off_keeps_one_page(monkeypatch):
+    urls = [f"https://www.amazon.de/dp/no_promo?i={i}" for i in range(5)]
+
+    browser_run(monkeypatch, urls, recycle=False)
+
+    assert [[page.navigations for page in c.pages] for c in FakePlaywright.contexts] == [[5]]
+
+
+def test_pressure_is_flagged_above_the_limit_outside_the_cooldown(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("memory_guard.time.monotonic", lambda: clock[0])
+    recycle = RecyclePolicy(max_rss_mb=500, cooldown=60)
+
+    assert [recycle.observe(mb) for mb in [None, 200, 600, 700]] == [False, False, True, False]
+    clock[0] += 61
+    assert recycle.observe(650)
+    assert recycle.pressure_recycles == 2
+    assert RecyclePolicy(max_rss_mb=None).observe(10 ** 6) is False
+
+
+def test_long_runs_keep_a_bounded_number_of_samples():
+    watchdog = MemoryWatchdog()
+
+    for _ in range(MAX_SAMPLES * 3):
+        watchdog.sample()
+
+    assert len(watchdog.samples) <= MAX_SAMPLES
+    summary = watchdog.summary()
+    assert summary["start_mb"] > 0 and summary["peak_mb"] >= summary["end_mb"]
@@ -0,0 +1,124 @@
+import glob
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from conftest import ROOT
+from fixture_server import start_fixture_server
+from job_journal import JobJournal
+from price_history import PriceHistory
+
+MARKETPLACES = ["amazon.de", "amazon.fr", "amazon.co.uk"]
+
+
+def record(i):
+    return {"URL": f"https://www.{MARKETPLACES[i % 3]}/dp/B{i:09d}", "Promo Status": "ACTIVE",
+            "Details": "", "Current Price": "19,99 €", "Normal Price": "24,99 €", "Discount": "-20%"}
+
+
+# A journaled, recorded run whose history files are moved into place every 0.3 s
+RUN_SCRIPT = """
+import asyncio, sys
+sys.path.insert(0, {root!r})
+import price_history
+from promo_checker import iter_products
+
+price_history.FILE_INTERVAL = 0.3
+
+async def run():
+    async for _ in iter_products({urls!r}, journal="run.journal.jsonl", resume={resume},
+                                 history=price_history.PriceHistory("history"),
+                                 requests_per_minute=None, adaptive_pacing=False):
+        pass
+
+asyncio.run(run())
+"""
+
+
+def parquet_files(root):
+    return glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True)
+
+
+def hidden_files(root):
+    return glob.glob(os.path.join(root, "*", "*", ".*.parquet.tmp"))
+
+
+def start_run(directory, urls, resume):
+    return subprocess.Popen([sys.executable, "-c", RUN_SCRIPT.format(root=ROOT, urls=urls, resume=resume)],
+                            cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def test_recorder_writes_one_file_per_partition(tmp_path):
+    history = PriceHistory(str(tmp_path / "history"))
+    recorder = history.recorder()
+    recorder.batch_size = 4  # Many flushes in one run
+    for i in range(60):
+        recorder.add(record(i))
+        if i == 30:
+            # Open files stay hidden: mid-run queries see none of them
+            assert parquet_files(history.root) == []
+            assert history.observations().empty
+    recorder.close()
+
+    assert len(parquet_files(history.root)) == len(MARKETPLACES)
+    observations = history.observations()
+    assert len(observations) == 60
+    assert observations.groupby("marketplace").size().to_dict() == {"de": 20, "fr": 20, "co.uk": 20}
+    assert observations["current_price"].eq(19.99).all()
+
+    # A second run adds its own file per partition, nothing more
+    recorder = history.recorder()
+    recorder.batch_size = 4
+    for i in range(9):
+        recorder.add(record(i))
+    recorder.close()
+    assert len(parquet_files(history.root)) == 2 * len(MARKETPLACES)
+    assert len(history.observations()) == 69
+
+
+def test_stale_hidden_files_are_removed(tmp_path):
+    history = PriceHistory(str(tmp_path / "history"))
+    directory = history.partition_dir("2026-01-31", "de")
+    os.makedirs(directory)
+    gone = subprocess.Popen([sys.executable, "-c", "pass"])
+    gone.wait()
+    stale = os.path.join(directory, f".run-1.{gone.pid}.parquet.tmp")
+    live = os.path.join(directory, f".run-2.{os.getpid()}.parquet.tmp")
+    for path in (stale, live):
+        open(path, "wb").close()
+
+    history.recorder().close()
+
+    assert hidden_files(history.root) == [live]
+
+
+def test_killed_recording_run_is_completed_on_resume(tmp_path):
+    server, base_url = start_fixture_server(latency=0.05)
+    try:
+        urls = [f"{base_url}/dp/{page}?row={i}" for i, page in enumerate(["deal", "coupon", "no_promo"] * 14)]
+        history = PriceHistory(str(tmp_path / "history"))
+        journal = JobJournal(str(tmp_path / "run.journal.jsonl"))
+
+        run = start_run(tmp_path, urls, resume=False)
+        deadline = time.monotonic() + 60
+        while len(journal.load()) < 20 and run.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert run.poll() is None, "the run ended before it could be killed"
+        run.send_signal(signal.SIGKILL)
+        run.wait()
+        # The chunks moved into place before the kill are kept
+        finished = journal.load()
+        assert 0 < len(history.observations()) <= len(finished) < len(urls)
+
+        resumed = start_run(tmp_path, urls, resume=True)
+        assert resumed.wait(timeout=120) == 0, resumed.stderr.read().decode()
+
+        # Every row exactly once, under the run's one id, and no leftovers
+        observations = history.observations()
+        assert sorted(observations["url"]) == sorted(urls)
+        assert observations["run_id"].nunique() == 1
+        assert hidden_files(history.root) == []
+    finally:
+        server.shutdown()
@@ -0,0 +1,77 @@
+import math
+
+import pandas as pd
+
+from price_parser import add_price_columns, parse_price, parse_price_column
+
+# (displayed text, marketplace, value, currency)
+CASES = [
+    ("¥1,980", "co.jp", 1980.0, "JPY"),
+    ("￥ 12,800", "co.jp", 12800.0, "JPY"),
+    ("MX$1,299.00", "com.mx", 1299.0, "MXN"),
+    ("$1,299.00", "com.mx", 1299.0, "MXN"),  # A bare "$" is the local dollar
+    ("C$ 24.99", "ca", 24.99, "CAD"),
+    ("CDN$ 1,024.50", "ca", 1024.5, "CAD"),
+    ("$19.99", "com", 19.99, "USD"),
+    ("1\u00a0234,56\u00a0€", "de", 1234.56, "EUR"),  # NBSP thousands separator
+    ("1\u202f234,56 €", "fr", 1234.56, "EUR"),  # Narrow NBSP
+    ("1 234,56 zł", "pl", 1234.56, "PLN"),
+    ("12,34 €", "de", 12.34, "EUR"),
+    ("29,99", "de", 29.99, "EUR"),
+    ("£1,234.5", "co.uk", 1234.5, "GBP"),
+    ("1.299", "de", 1299.0, "EUR"),  # Thousands separator only
+    ("1.299 €", "es", 1299.0, "EUR"),
+    ("Not Found", "de", None, "EUR"),
+    ("Error", "de", None, "EUR"),
+    ("N/A", None, None, None),
+    ("", None, None, None),
+    (None, "de", None, "EUR"),
+    (float("nan"), "co.uk", None, "GBP"),
+]
+
+
+def same_value(a, b):
+    if a is None or (isinstance(a, float) and math.isnan(a)):
+        return b is None or (isinstance(b, float) and math.isnan(b))
+    return a == b
+
+
+def test_parse_price():
+    for text, marketplace, value, currency in CASES:
+        assert parse_price(text, marketplace) == (value, currency), text
+
+
+def test_parse_price_column_agrees_with_parse_price():
+    texts = pd.Series([case[0] for case in CASES], dtype="object")
+    markets = pd.Series([case[1] for case in CASES], dtype="object")
+
+    parsed = parse_price_column(texts, markets)
+
+    assert parsed["value"].dtype == "float64"
+    for (text, marketplace, _, _), (_, row) in zip(CASES, parsed.iterrows()):
+        value, currency = parse_price(text, marketplace)
+        assert same_value(value, row["value"]), text
+        assert row["currency"] == currency, text
+
+    # One marketplace for the whole column
+    for text, value in zip(["1.299", "12,34 €", "$5"], parse_price_column(["1.299", "12,34 €", "$5"], "de")["value"]):
+        assert same_value(parse_price(text, "de")[0], value), text
+
+
+def test_add_price_columns():
+    df = pd.DataFrame({
+        "URL": ["https://www.amazon.de/dp/B000000001", "https://www.amazon.co.jp/dp/B000000002",
+                "https://www.amazon.com.mx/dp/B000000003"],
+        "Current Price": ["29,99 €", "¥1,980", "Not Found"],
+        "Normal Price": ["39,99 €", "¥2,480", "N/A"],
+        "Discount": ["N/A", "-20%", "N/A"],
+    })
+
+    add_price_columns(df)
+
+    assert df["Current Price Value"].tolist()[:2] == [29.99, 1980.0]
+    assert df["Normal Price Value"].tolist()[:2] == [39.99, 2480.0]
+    assert df["Currency"].tolist() == ["EUR", "JPY", None]
+    # Computed from the prices without a badge, the badge's otherwise
+    assert df["Discount %"].tolist()[:2] == [25.0, 20.0]
+    assert df.loc[2, ["Current Price Value", "Normal Price Value", "Discount %"]].isna().all()
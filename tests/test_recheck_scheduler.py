@@ -0,0 +1,78 @@
+from conftest import collect
+from fixture_server import start_fixture_server
+from recheck_scheduler import DAY, ChangeStats, RecheckScheduler
+
+NOW = 1_700_000_000.0
+
+
+def result(status="ACTIVE", details="", current="29,99 €", normal="39,99 €", discount="-25%"):
+    return status, details, current, normal, discount
+
+
+def test_stats_count_checks_and_changes(tmp_path):
+    stats = ChangeStats(str(tmp_path / "stats.sqlite"))
+    key = ("B000000001", "de")
+
+    stats.record(key, result(), now=NOW)
+    stats.record(key, result(details="Price Drop: new text"), now=NOW + DAY)  # Details alone don't count
+    stats.record(key, result("Error/Timeout", "Timeout loading page (60s)", "N/A", "N/A", "N/A"), now=NOW + DAY)
+    stats.record(key, result(current="24,99 €"), now=NOW + 3 * DAY)
+
+    row = stats.get_many([key])[key]
+    assert (row["checks"], row["changes"]) == (3, 1)
+    assert row["observed_seconds"] == 3 * DAY
+    assert (row["last_checked"], row["last_changed"]) == (NOW + 3 * DAY, NOW + 3 * DAY)
+    assert row["last_lightning"] is None
+
+    stats.record(key, result(details="Badge: Endet in 02:14:09"), now=NOW + 4 * DAY)
+    assert stats.get_many([key])[key]["last_lightning"] == NOW + 4 * DAY
+
+
+def test_plan_spends_the_budget_on_likely_changes(tmp_path):
+    stats = ChangeStats(str(tmp_path / "stats.sqlite"))
+    keys = [(f"B00000000{i}", "de") for i in range(6)]
+    # 0: changes daily, 1: never changed, 2: lightning deal, 3: never checked,
+    # 4: stale, 5: changes daily but was checked an hour ago
+    for day in range(8):
+        stats.record(keys[0], result(current=f"{day},00 €"), now=NOW + day * DAY)
+        stats.record(keys[1], result(), now=NOW + day * DAY)
+        stats.record(keys[5], result(current=f"{day},00 €"), now=NOW + day * DAY + DAY - 3600)
+    stats.record(keys[2], result(details="Badge: Blitzangebot"), now=NOW + 7.5 * DAY)
+    stats.record(keys[4], result(), now=NOW - 30 * DAY)
+    now = NOW + 8 * DAY
+
+    scheduler = RecheckScheduler(stats, budget=4)
+    selected, skipped = scheduler.plan(keys, now=now)
+
+    assert selected == {3, 4, 2, 0}
+    assert sorted(skipped) == [1, 5]
+    assert skipped[1]["status"] == "ACTIVE"
+    assert (scheduler.selected, scheduler.forced, scheduler.skipped) == (4, 2, 2)
+    # New and stale rows are checked even beyond the budget
+    assert RecheckScheduler(stats, budget=1).plan(keys, now=now)[0] == {3, 4}
+    # A time budget is a number of checks too
+    assert RecheckScheduler(stats, time_budget=9, seconds_per_check=3).plan(keys, now=now)[0] == {3, 4, 2}
+    # No budget: every row
+    assert RecheckScheduler(stats).plan(keys, now=now)[0] == set(range(6))
+
+
+def test_skipped_rows_report_their_last_result(tmp_path):
+    server, base_url = start_fixture_server()
+    try:
+        # The deal shows a "Blitzangebot" badge, so it's the one re-checked
+        urls = [f"{base_url}/dp/{asin}" for asin in ["B0FIXNOPR1", "B0FIXCOUP1", "B0FIXDEAL1", "B0FIXBEST1"]]
+        stats = ChangeStats(str(tmp_path / "stats.sqlite"))
+
+        first = collect(urls, recheck=RecheckScheduler(stats, budget=1))
+        hits = server.hits["product"]
+        second = collect(urls, recheck=RecheckScheduler(stats, budget=1))
+    finally:
+        server.shutdown()
+
+    assert hits == 4  # All new: every row is checked
+    assert server.hits["product"] == hits + 1
+    assert [record["Attempts"] for record in second] == [0, 0, 1, 0]
+    for before, after in zip(first, second):
+        assert after["Promo Status"] == before["Promo Status"]
+        assert after["Current Price"] == before["Current Price"]
+        assert after["Last Checked"]
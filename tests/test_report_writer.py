@@ -0,0 +1,117 @@
+import asyncio
+import io
+
+import pandas as pd
+import pytest
+
+from catalog_reader import CatalogReader
+from promo_checker import write_catalog_report
+from report_writer import open_report
+
+PRICES = [("29,99 €", "39,99 €", "-25%"), ("Not Found", "N/A", "N/A"), ("12,50 €", "N/A", "N/A")]
+
+
+def records(count):
+    """iter_products-style records for https://www.amazon.de/dp/B00000000<i>, in input order."""
+    rows = []
+    for i in range(count):
+        current, normal, discount = PRICES[i % len(PRICES)]
+        rows.append({"position": i, "URL": f"https://www.amazon.de/dp/B00000000{i}", "Row": i,
+                     "Promo Status": "ACTIVE" if discount != "N/A" else "NO PROMO", "Details": "",
+                     "Current Price": current, "Normal Price": normal, "Discount": discount, "Attempts": 1})
+    return rows
+
+
+def read_back(fmt, data):
+    if fmt == "xlsx":
+        return pd.read_excel(io.BytesIO(data))
+    if fmt == "csv":
+        return pd.read_csv(io.BytesIO(data), encoding="utf-8-sig")
+    if fmt == "jsonl":
+        return pd.read_json(io.BytesIO(data), lines=True)
+    return pd.read_parquet(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("fmt", ["xlsx", "csv", "jsonl", "parquet"])
+def test_out_of_order_records_are_written_in_input_order(fmt):
+    target = io.BytesIO()
+    rows = records(7)
+    order = [3, 0, 6, 1, 2, 5, 4]
+
+    with open_report(target, fmt, batch_size=2) as report:
+        for i in order:
+            report.add(rows[i])
+            # Nothing is held back once the rows before it are in
+            assert report.next_position == len(report.ready) + report.rows_written
+
+    df = read_back(fmt, target.getvalue())
+    assert report.rows_written == 7
+    assert df["Row"].tolist() == list(range(7))
+    assert "position" not in df.columns
+    # Typed price columns, added batch by batch
+    assert df["Current Price Value"].fillna(-1).tolist()[:3] == [29.99, -1, 12.5]
+    assert df["Discount %"].fillna(-1).tolist()[:3] == [25.0, -1, -1]
+
+
+def test_missing_rows_are_written_on_close():
+    target = io.BytesIO()
+    rows = records(4)
+
+    with open_report(target, "csv") as report:
+        for i in [0, 2, 3]:  # Row 1 never arrives, e.g. a cancelled run
+            report.add(rows[i])
+        assert report.rows_written == 0
+
+    assert read_back("csv", target.getvalue())["Row"].tolist() == [0, 2, 3]
+
+
+def test_parquet_schema_survives_an_empty_first_batch():
+    target = io.BytesIO()
+    rows = records(4)
+    for row in rows[:2]:
+        row["Details"] = None  # All empty in the first batch: typed as text
+    rows[3]["Details"] = "Timeout loading page (60s)"
+
+    with open_report(target, "parquet", batch_size=2) as report:
+        for row in rows:
+            report.add(row)
+
+    df = read_back("parquet", target.getvalue())
+    assert df["Details"].tolist()[3] == "Timeout loading page (60s)"
+
+
+def test_excel_urls_are_hyperlinks(tmp_path):
+    from openpyxl import load_workbook
+
+    path = tmp_path / "reports" / "report.xlsx"
+
+    with open_report(str(path)) as report:
+        for row in records(3):
+            report.add(row)
+
+    workbook = load_workbook(path)
+    cell = workbook["Report"]["A2"]
+    assert cell.value == "https://www.amazon.de/dp/B000000000"
+    assert cell.hyperlink.target == cell.value
+
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError, match="Unknown report format"):
+        open_report("report.ods")
+
+
+def test_catalog_run_streams_into_the_report(fixture_base, tmp_path):
+    names = ["deal", "no_promo", "coupon", "best_seller"]
+    pd.DataFrame({"URL": [f"{fixture_base}/dp/{names[i % 4]}?row={i}" for i in range(12)],
+                  "Row": range(12)}).to_csv(tmp_path / "productos.csv", index=False)
+    target = tmp_path / "report.csv"
+
+    written = asyncio.run(write_catalog_report(
+        CatalogReader(str(tmp_path / "productos.csv")), open_report(str(target), batch_size=5),
+        concurrency=3, requests_per_minute=None, adaptive_pacing=False))
+
+    df = pd.read_csv(target, encoding="utf-8-sig")
+    assert written == 12
+    assert df["Row"].tolist() == list(range(12))
+    assert df["Promo Status"].tolist() == ["ACTIVE", "NO PROMO", "ACTIVE", "ACTIVE"] * 3
+    assert {"Current Price Value", "Normal Price Value", "Currency", "Discount %"} <= set(df.columns)
@@ -0,0 +1,97 @@
+import asyncio
+
+from conftest import collect, needs_chromium
+from resource_policy import ESTIMATED_BYTES, ResourcePolicy
+
+PAGE_URL = "https://www.amazon.de/dp/B000000001"
+
+
+class FakePage:
+    def __init__(self):
+        self.url = PAGE_URL
+        self.main_frame = FakeFrame(self)
+
+
+class FakeFrame:
+    def __init__(self, page):
+        self.page = page
+
+
+class FakeRoute:
+    """A Playwright route of `page`, recording whether it was continued or aborted."""
+
+    def __init__(self, page, url, resource_type, navigation=False):
+        self.request = FakeRequest(page.main_frame, url, resource_type, navigation)
+        self.outcome = None
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+
+class FakeRequest:
+    def __init__(self, frame, url, resource_type, navigation):
+        self.frame = frame
+        self.url = url
+        self.resource_type = resource_type
+        self.navigation = navigation
+
+    def is_navigation_request(self):
+        return self.navigation
+
+
+def route_all(policy, routes):
+    async def handle():
+        for route in routes:
+            await policy._handle(route)
+
+    asyncio.run(handle())
+
+
+def test_blocked_requests_are_counted_per_page_and_in_total():
+    policy = ResourcePolicy()
+    page, other = FakePage(), FakePage()
+    policy.reset(page)
+    routes = [
+        FakeRoute(page, PAGE_URL, "document", navigation=True),  # The product page itself
+        FakeRoute(page, "https://m.media-amazon.com/images/I/main.jpg", "image"),
+        FakeRoute(page, "https://m.media-amazon.com/images/I/thumb.jpg", "image"),
+        FakeRoute(page, "https://m.media-amazon.com/fonts/ember.woff2", "font"),
+        FakeRoute(page, "https://www.amazon.de/styles/price.css", "stylesheet"),  # Visibility needs the CSS
+        FakeRoute(page, "https://www.amazon.de/ajax/twister", "xhr"),
+        FakeRoute(page, "https://aax-eu.amazon-adsystem.com/e/dtb/bid", "script"),
+        FakeRoute(page, "https://cdn.example.net/widget.js", "script"),  # Third party
+        FakeRoute(other, "https://m.media-amazon.com/images/I/other.jpg", "image"),
+    ]
+
+    start = policy.totals.as_dict()
+    route_all(policy, routes)
+
+    assert [route.outcome for route in routes] == [
+        "continued", "aborted", "aborted", "aborted", "continued", "continued", "aborted", "aborted", "aborted"]
+    stats = policy.stats(page)
+    assert (stats.blocked_requests, stats.allowed_requests) == (5, 3)
+    assert stats.blocked_by_type == {"image": 2, "font": 1, "script": 2}
+    assert stats.blocked_bytes == 2 * ESTIMATED_BYTES["image"] + ESTIMATED_BYTES["font"] + 2 * ESTIMATED_BYTES["script"]
+    # The other page was never reset: only the totals count its request
+    run = policy.totals.since(start)
+    assert (run.blocked_requests, run.allowed_requests) == (6, 3)
+    assert run.blocked_by_type == {"image": 3, "font": 1, "script": 2}
+
+    # A later run's summary only counts its own requests
+    start = policy.totals.as_dict()
+    route_all(policy, [FakeRoute(page, "https://m.media-amazon.com/images/I/next.jpg", "image")])
+    assert policy.totals.since(start).as_dict() == {
+        "allowed_requests": 0, "blocked_requests": 1, "blocked_bytes": ESTIMATED_BYTES["image"],
+        "blocked_by_type": {"image": 1}}
+
+
+@needs_chromium
+def test_browser_run_reports_blocked_requests_once(fixture_base, capsys):
+    collect([f"{fixture_base}/dp/deal?i={i}" for i in range(3)], http_first=False, retries=False)
+
+    out = capsys.readouterr().out
+    assert "Blocked " not in out
+    assert out.count("Resource policy: blocked") == 1
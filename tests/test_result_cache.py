@@ -0,0 +1,20 @@
+import os
+
+from conftest import collect
+from result_cache import ResultCache, cache_key
+
+
+def test_batched_lookups_are_counted_per_row(fixture_base, tmp_path):
+    cache = ResultCache(os.path.join(tmp_path, "cache.sqlite"))
+    urls = [f"{fixture_base}/dp/{name}" for name in ("deal", "coupon", "no_promo")]
+    try:
+        collect(urls, cache=cache, retries=False)
+        assert (cache.hits, cache.misses) == (0, 3)
+
+        # Cached now; every row counts, also a product listed twice
+        collect(urls + urls[:1], cache=cache, retries=False)
+        assert (cache.hits, cache.misses) == (4, 3)
+        assert set(cache.get_many(cache_key(url) for url in urls)) == {cache_key(url) for url in urls}
+        assert (cache.hits, cache.misses) == (4, 3)
+    finally:
+        cache.close()
@@ -0,0 +1,103 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from conftest import ROOT, collect
+from fixture_server import start_fixture_server
+from job_journal import JobJournal
+
+ROWS = 40
+PAGES = ["deal", "coupon", "amazons_choice", "best_seller", "lightning_deal", "no_promo"]
+
+# The CLI run (promo_checker.main) without its pacing sleeps and price history
+RUN_SCRIPT = """
+import asyncio, sys
+sys.path.insert(0, {root!r})
+from catalog_reader import CatalogReader
+from promo_checker import write_catalog_report
+from report_writer import open_report
+
+asyncio.run(write_catalog_report(CatalogReader("productos.csv"), open_report("report.csv"),
+                                 journal="run.journal.jsonl", resume={resume},
+                                 requests_per_minute=None, adaptive_pacing=False))
+"""
+
+
+def start_run(directory, resume):
+    return subprocess.Popen([sys.executable, "-c", RUN_SCRIPT.format(root=ROOT, resume=resume)], cwd=directory,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def write_input(directory, base_url):
+    urls = [f"{base_url}/dp/{PAGES[i % len(PAGES)]}?row={i}" for i in range(ROWS)]
+    pd.DataFrame({"URL": urls, "Row": range(ROWS)}).to_csv(os.path.join(directory, "productos.csv"), index=False)
+
+
+def read_report(directory):
+    return pd.read_csv(os.path.join(directory, "report.csv")).sort_values("Row").reset_index(drop=True)
+
+
+def test_killed_run_resumes_with_identical_output(tmp_path):
+    # One server for all three runs: the journal only restores rows whose URL
+    # (with its port) matches
+    server, base_url = start_fixture_server(latency=0.05)
+    try:
+        clean, crashed = tmp_path / "clean", tmp_path / "crashed"
+        for directory in (clean, crashed):
+            directory.mkdir()
+            write_input(directory, base_url)
+
+        assert start_run(clean, resume=False).wait(timeout=120) == 0
+
+        # SIGKILL once some rows are journaled: no cleanup, no final flush
+        run = start_run(crashed, resume=False)
+        journal = JobJournal(os.path.join(crashed, "run.journal.jsonl"))
+        deadline = time.monotonic() + 60
+        while len(journal.load()) < ROWS // 4 and run.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert run.poll() is None, "the run ended before it could be killed"
+        run.send_signal(signal.SIGKILL)
+        run.wait()
+        finished = journal.load()
+        assert 0 < len(finished) < ROWS
+
+        server.hits.clear()
+        resumed = start_run(crashed, resume=True)
+        assert resumed.wait(timeout=120) == 0, resumed.stderr.read().decode()
+
+        # Only the unfinished rows are fetched again
+        assert server.hits["product"] == ROWS - len(finished)
+        pd.testing.assert_frame_equal(read_report(crashed), read_report(clean))
+        assert len(read_report(crashed)) == ROWS
+    finally:
+        server.shutdown()
+
+
+def test_only_unfinished_rows_are_resumed(tmp_path):
+    server, base_url = start_fixture_server()
+    try:
+        path = str(tmp_path / "run.journal.jsonl")
+        urls = [f"{base_url}/dp/{page}" for page in PAGES]
+
+        # An interrupted run: a good row and a failed one in its journal
+        journal = JobJournal(path).open()
+        journal.append({"position": 0, "URL": urls[0], "Promo Status": "ACTIVE", "Details": "from the journal"})
+        journal.append({"position": 1, "URL": urls[1], "Promo Status": "Error/Timeout", "Details": "timed out"})
+        journal.close()
+
+        records = collect(urls, journal=path, resume=True, retries=False)
+
+        assert records[0]["Details"] == "from the journal"
+        assert records[1]["Promo Status"] == "ACTIVE"  # Checked again
+        assert server.hits["product"] == len(PAGES) - 1
+        # Complete: nothing is left to resume, the next run checks every row
+        assert not os.path.exists(path)
+        server.hits.clear()
+        collect(urls, journal=path, resume=True, retries=False)
+        assert server.hits["product"] == len(PAGES)
+    finally:
+        server.shutdown()
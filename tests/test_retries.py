@@ -0,0 +1,75 @@
+from collections import Counter
+
+from conftest import collect
+from http_fetcher import StaticFetcher
+from retry_policy import RetryPolicy
+
+
+def flaky_check(failures):
+    """check_with_signal that raises for the first failures[url] attempts of each URL."""
+    original = StaticFetcher.check_with_signal
+    attempts = Counter()
+
+    async def check(self, url, *args):
+        attempts[url] += 1
+        if attempts[url] <= failures.get(url, 0):
+            raise RuntimeError(f"attempt {attempts[url]} failed")
+        return await original(self, url, *args)
+
+    return check, attempts
+
+
+def test_delays_grow_exponentially_within_each_budget():
+    policy = RetryPolicy(budgets={"Error/Timeout": 3, "Error/Captcha": 1},
+                         base_delays={"Error/Timeout": 5.0, "Error/Captcha": 60.0}, max_delay=15.0, jitter=False)
+
+    assert [policy.next_delay("Error/Timeout", {"Error/Timeout": n}) for n in range(4)] == [5.0, 10.0, 15.0, None]
+    # Budgets are per error class
+    assert policy.next_delay("Error/Captcha", {"Error/Timeout": 2}) == 15.0
+    assert policy.next_delay("Error/Captcha", {"Error/Captcha": 1}) is None
+    # Other statuses are final
+    assert policy.next_delay("Error/Not Found", {}) is None
+    assert policy.scheduled == {"Error/Timeout": 3, "Error/Captcha": 1}
+
+
+def test_jitter_stays_within_half_the_delay():
+    policy = RetryPolicy(base_delays={"Error/Timeout": 8.0})
+
+    delays = [policy.next_delay("Error/Timeout", {"Error/Timeout": 1}) for _ in range(50)]
+
+    assert all(8.0 <= delay <= 16.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_failed_rows_are_retried_and_recover(fixture_base, monkeypatch, capsys):
+    urls = [f"{fixture_base}/dp/{name}" for name in ["deal", "coupon", "no_promo", "best_seller"]]
+    # deal recovers on its 2nd attempt, coupon on its 3rd, best_seller never does
+    check, attempts = flaky_check({urls[0]: 1, urls[1]: 2, urls[3]: 10})
+    monkeypatch.setattr(StaticFetcher, "check_with_signal", check)
+    policy = RetryPolicy(budgets={"Error/Exception": 2}, base_delays={"Error/Exception": 0.01})
+
+    records = collect(urls, retry_policy=policy)
+
+    assert [(record["Promo Status"], record["Attempts"]) for record in records] == [
+        ("ACTIVE", 2), ("ACTIVE", 3), ("NO PROMO", 1), ("Error/Exception", 3)]
+    assert [attempts[url] for url in urls] == [2, 3, 1, 3]
+    assert policy.scheduled == {"Error/Exception": 5}
+    assert policy.recovered == 2
+    assert "Retries: 5 scheduled (Error/Exception 5), 2 rows recovered" in capsys.readouterr().out
+
+    # The summary of a second run with the same policy counts only its own retries
+    check, _ = flaky_check({urls[2]: 1})
+    monkeypatch.setattr(StaticFetcher, "check_with_signal", check)
+    collect(urls[2:3], retry_policy=policy)
+    assert "Retries: 1 scheduled (Error/Exception 1), 1 rows recovered" in capsys.readouterr().out
+
+
+def test_retries_off_keeps_the_first_result(fixture_base, monkeypatch):
+    url = f"{fixture_base}/dp/deal"
+    check, attempts = flaky_check({url: 1})
+    monkeypatch.setattr(StaticFetcher, "check_with_signal", check)
+
+    records = collect([url], retries=False)
+
+    assert (records[0]["Promo Status"], records[0]["Attempts"]) == ("Error/Exception", 1)
+    assert attempts[url] == 1
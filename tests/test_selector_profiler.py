@@ -0,0 +1,101 @@
+import threading
+
+from conftest import collect, load_expected, outcome
+from extraction import EXTRACT_ARGS, analyze_extraction, extract_from_html, parse_html
+from fixture_server import load_fixtures
+from selector_profiler import SelectorProfiler
+
+# Pages the static tier reads (see test_fixtures.BROWSER_ONLY)
+PAGES = {name: html for name, html in load_fixtures().items() if name not in {"captcha", "missing_price"}}
+
+
+def profile_pages(profiler, rounds, marketplace="de"):
+    for _ in range(rounds):
+        for html in PAGES.values():
+            tree = parse_html(html)
+            args = profiler.extract_args(marketplace)
+            result = analyze_extraction(extract_from_html(tree, None, args), marketplace)
+            profiler.profile_tree(tree, marketplace, args, result)
+
+
+def test_profile_prunes_selectors_without_changing_results(tmp_path):
+    profiler = SelectorProfiler(str(tmp_path / "profiles.json"), sample_rate=1, min_pages=len(PAGES) * 2,
+                                min_observations=len(PAGES) * 2)
+    profile_pages(profiler, 1)
+    assert profiler.compile("de") is None  # Too few pages yet
+
+    profile_pages(profiler, 1)
+    profile = profiler.compile("de")
+
+    assert profile["pages"] == len(PAGES) * 2
+    assert profile["dropped"]
+    args = profiler.extract_args("de")
+    assert args is not EXTRACT_ARGS
+    for name, html in PAGES.items():
+        tree = parse_html(html)
+        assert analyze_extraction(extract_from_html(tree, None, args), "de") == \
+            analyze_extraction(extract_from_html(tree), "de"), name
+    # Audited pages with the profile: no mismatches, so the profile stays
+    profile_pages(profiler, 1)
+    assert profiler.savings_report()[0]["mismatches"] == 0
+    assert "de" in profiler.profiles
+
+
+def test_selectors_seen_on_few_pages_are_not_pruned(tmp_path):
+    profiler = SelectorProfiler(str(tmp_path / "profiles.json"), sample_rate=1, min_pages=len(PAGES),
+                                min_observations=len(PAGES) * 2)
+    profile_pages(profiler, 1)
+
+    profile = profiler.compile("de")
+    assert (profile["dropped"], profile["scoped"]) == ([], [])
+
+    # A selector added since the others were profiled is kept until it has been seen enough
+    profile_pages(profiler, 1)
+    selectors = profiler.stats["de"]["static"]["selectors"]
+    key = next(key for key in profiler.compile("de")["dropped"])
+    selectors[key]["pages"] = 1
+    assert key not in profiler.compile("de")["dropped"]
+
+
+def test_shared_profiler_is_safe_across_threads(tmp_path):
+    profiler = SelectorProfiler(str(tmp_path / "profiles.json"), sample_rate=1, min_pages=1, min_observations=1)
+    errors = []
+
+    def run(work):
+        try:
+            work()
+        except Exception as e:  # Reported below: an exception in a thread doesn't fail the test
+            errors.append(e)
+
+    def read_and_save():
+        for _ in range(30):
+            profiler.selector_report()
+            profiler.compile_all()
+            profiler.save()
+
+    threads = [threading.Thread(target=run, args=(lambda m=marketplace: profile_pages(profiler, 3, m),))
+               for marketplace in ["de", "fr", "es"]]
+    threads.append(threading.Thread(target=run, args=(read_and_save,)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [profiler.stats[m]["static"]["pages"] for m in ["de", "fr", "es"]] == [len(PAGES) * 3] * 3
+    assert SelectorProfiler(profiler.path).stats.keys() == profiler.stats.keys()
+
+
+def test_run_compiles_and_uses_the_profile(fixture_base, tmp_path):
+    expected = load_expected()
+    urls = [f"{fixture_base}/dp/{name}" for name in PAGES]
+    path = str(tmp_path / "profiles.json")
+
+    collect(urls, selector_profiler=SelectorProfiler(path, sample_rate=1, min_pages=len(PAGES),
+                                                     min_observations=len(PAGES)))
+    profiler = SelectorProfiler(path, sample_rate=1)
+    assert len(profiler.profiles) == 1  # Saved for the fixture server's "marketplace"
+    records = collect(urls, selector_profiler=profiler)
+
+    assert [outcome(record) for record in records] == [expected[name] for name in PAGES]
+    assert sum(row["mismatches"] for row in profiler.savings_report()) == 0
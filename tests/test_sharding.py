@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pandas as pd
+
+import sharding
+from conftest import load_expected, outcome
+
+SLOW_SHUTDOWN = 1.0
+
+
+class SlowShutdownExecutor(sharding.ProcessPoolExecutor):
+    """A worker process that takes a while to exit once its shard is done."""
+
+    def shutdown(self, wait=True, **kwargs):
+        if wait:
+            time.sleep(SLOW_SHUTDOWN)
+        super().shutdown(wait=wait, **kwargs)
+
+
+def test_sharded_run_keeps_the_event_loop_free(fixture_base, monkeypatch):
+    monkeypatch.setattr(sharding, "ProcessPoolExecutor", SlowShutdownExecutor)
+    names = ["deal", "coupon", "no_promo", "best_seller"]
+    df = pd.DataFrame({"URL": [f"{fixture_base}/dp/{name}" for name in names]})
+
+    async def run():
+        gaps = []
+
+        async def tick():
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.05)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        ticker = asyncio.create_task(tick())
+        try:
+            result = await sharding.process_products_sharded(df, shards=2, requests_per_minute=None,
+                                                             adaptive_pacing=False, retries=False)
+        finally:
+            ticker.cancel()
+        return result, max(gaps)
+
+    result, longest_gap = asyncio.run(run())
+
+    expected = load_expected()
+    assert [outcome(tuple(row)) for row in result[["Promo Status", "Details", "Current Price", "Normal Price",
+                                                   "Discount"]].itertuples(index=False)] == \
+        [expected[name] for name in names]
+    assert longest_gap < SLOW_SHUTDOWN / 2
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import collect
+from fixture_server import load_fixtures
+from snapshot_store import SnapshotStore, replay, replay_summary
+
+# Pages the static tier reads (see test_fixtures.BROWSER_ONLY)
+PAGES = [name for name in load_fixtures() if name not in {"captcha", "missing_price"}]
+
+
+@pytest.mark.parametrize("mode", ["region", "full"])
+def test_replay_of_captured_pages_is_unchanged(fixture_base, tmp_path, mode):
+    store = SnapshotStore(str(tmp_path / "snapshots"), mode=mode)
+    urls = [f"{fixture_base}/dp/{name}" for name in PAGES]
+
+    records = collect(urls, snapshots=store)
+    store.commit()
+    df = replay(store, workers=1)
+
+    assert len(df) == len(PAGES)
+    assert not df["Changed"].any()
+    assert df["Replay Promo Status"].tolist() == [record["Promo Status"] for record in records]
+    assert df["Replay Current Price"].tolist() == [record["Current Price"] for record in records]
+    assert replay_summary(df) == {}
+    store.close()
+
+
+def test_pages_seen_again_are_stored_once(fixture_base, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    urls = [f"{fixture_base}/dp/{name}" for name in PAGES]
+
+    collect(urls, snapshots=store)
+    collect(urls, snapshots=store)
+    store.commit()
+
+    stats = store.stats()
+    assert (stats["captures"], stats["objects"]) == (2 * len(PAGES), len(PAGES))
+    assert store.deduplicated == len(PAGES)
+    assert len(store.entries()) == len(PAGES)  # Latest capture per product
+    assert len(store.entries(latest_only=False)) == 2 * len(PAGES)
+    # Identical pages are replayed once, across worker processes too
+    df = replay(store, workers=2, latest_only=False, chunk_size=2)
+    assert len(df) == 2 * len(PAGES)
+    assert not df["Changed"].any()
+    store.close()
+
+
+def test_replay_reports_results_that_differ(fixture_base, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    collect([f"{fixture_base}/dp/deal", f"{fixture_base}/dp/no_promo"], snapshots=store)
+    # As if the live check had read another price (or the extraction code changed since)
+    store.conn.execute("UPDATE snapshots SET current_price = '1,00 €' WHERE url LIKE '%/dp/deal'")
+    store.commit()
+
+    df = replay(store, workers=1)
+
+    assert df["Changed"].tolist() == [True, False]
+    assert replay_summary(df) == {"ACTIVE: Current Price": 1}
+    store.close()
@@ -0,0 +1,92 @@
+import asyncio
+
+import promo_checker
+from conftest import collect, needs_chromium
+from extraction import EXTRACT_ARGS, EXTRACT_SCRIPT, _static_query, extract_from_html, parse_html, split_selector
+from fixture_server import load_fixtures
+from http_fetcher import StaticFetcher
+
+# Blank cells (NaN, '') and URLs that can't be parsed
+BAD_URLS = [float("nan"), "", "http://[::1"]
+
+# Multi-part selectors where a node matched by one part has a descendant
+# matching another part: only the descendant may be returned for that part
+MULTI_PART_PAGE = """
+<html><head><title>Amazon.de: Multi-part selectors</title></head><body>
+<div id="corePrice_feature_div">
+  <div class="wrapper"><span class="savingsPercentage">-20%</span></div>
+  <span class="a-price"><span class="a-offscreen">20,00 €</span></span>
+  <span class="a-price a-text-price"><span class="a-offscreen">25,00 €</span></span>
+</div>
+<div id="coupon"><label>Apply coupon</label><label>Gutschein anwenden</label></div>
+<div class="promo"><span class="badge-text">Angebot</span></div>
+</body></html>
+"""
+
+
+def texts(nodes):
+    return [" ".join(node.text().split()) for node in nodes]
+
+
+def test_multi_part_query_matches_each_node_itself():
+    tree = parse_html(MULTI_PART_PAGE)
+
+    # The wrapper div contains a span.savingsPercentage but has no "zzz": not matched
+    assert texts(_static_query(tree, [["div", "zzz"], ["span.savingsPercentage", None]])) == ["-20%"]
+    # Document order, each node once, :has-text applied to the node's own part
+    assert texts(_static_query(tree, split_selector("label:has-text('Apply coupon'), .badge-text"))) == \
+        ["Apply coupon", "Angebot"]
+    assert texts(_static_query(tree, split_selector(".promo:has-text('nope'), .badge-text"))) == ["Angebot"]
+
+
+@needs_chromium
+def test_static_extraction_matches_browser():
+    """extract_from_html gives the in-page script's payload, fixtures and multi-part selectors alike."""
+    from playwright.async_api import async_playwright
+
+    pages = {name: html.decode("utf-8") for name, html in load_fixtures().items()}
+    pages["multi_part"] = MULTI_PART_PAGE
+
+    async def extract_all():
+        async with async_playwright() as p:
+            browser = await p.chromium.launch()
+            page = await browser.new_page()
+            payloads = {}
+            for name, html in pages.items():
+                await page.set_content(html)
+                payloads[name] = await page.evaluate(EXTRACT_SCRIPT, EXTRACT_ARGS)
+            await browser.close()
+            return payloads
+
+    browser_payloads = asyncio.run(extract_all())
+    for name, html in pages.items():
+        expected = {k: v for k, v in browser_payloads[name].items() if k != "timings"}
+        expected["badges"] = [list(badge) for badge in expected["badges"]]
+        assert extract_from_html(html) == expected, name
+
+
+def test_bad_urls_are_error_rows(fixture_base):
+    async def check_all():
+        async with StaticFetcher(promo_checker.USER_AGENT) as fetcher:
+            return [await fetcher.check_with_signal(url) for url in BAD_URLS]
+
+    for result, signal in asyncio.run(check_all()):
+        assert result[0] == "Error/Exception" and result[1].startswith("Invalid URL")
+        assert signal is None
+
+    # The run goes on: one Error/Exception row each, next to the good row
+    records = collect(BAD_URLS + [None, f"{fixture_base}/dp/deal"], retries=False)
+    assert [record["Promo Status"] for record in records] == ["Error/Exception"] * 4 + ["ACTIVE"]
+
+
+def test_static_tier_failure_is_an_error_row(fixture_base, monkeypatch):
+    async def failing_check(self, url, *args):
+        raise RuntimeError("parser crashed")
+
+    monkeypatch.setattr(StaticFetcher, "check_with_signal", failing_check)
+    urls = [f"{fixture_base}/dp/deal?i={i}" for i in range(3)]
+
+    records = collect(urls, retries=False)
+
+    assert [(record["Promo Status"], record["Details"]) for record in records] == \
+        [("Error/Exception", "parser crashed")] * 3
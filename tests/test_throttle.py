@@ -0,0 +1,63 @@
+from conftest import collect
+from throttle import AdaptiveRateLimiter
+from utils import host_of
+
+
+def test_rate_grows_additively_and_backs_off_multiplicatively():
+    limiter = AdaptiveRateLimiter(20, min_rpm=2, max_rpm=30, increase=2, decrease=0.5)
+
+    for _ in range(3):
+        limiter.record("www.amazon.de", "ACTIVE")
+    assert limiter.snapshot()["www.amazon.de"]["requests_per_minute"] == 26
+
+    limiter.record("www.amazon.de", "Error/Captcha")
+    state = limiter.snapshot()["www.amazon.de"]
+    assert (state["requests_per_minute"], state["successes"], state["backoffs"]) == (13, 3, 1)
+    assert limiter.buckets["www.amazon.de"].tokens <= 0  # The next request waits the new interval
+    assert [(e["status"], e["from_rpm"], e["to_rpm"]) for e in limiter.events] == [("Error/Captcha", 26, 13)]
+
+    # Errors that say nothing about pacing, and missing signals, leave the rate alone
+    limiter.record("www.amazon.de", "Error/Exception")
+    limiter.record("www.amazon.de", None)
+    assert limiter.snapshot()["www.amazon.de"]["requests_per_minute"] == 13
+
+    # Clamped to [min_rpm, max_rpm]
+    for status in ["Error/Timeout", "Error/Throttled", "Error/Timeout", "Error/Captcha"]:
+        limiter.record("www.amazon.de", status)
+    assert limiter.snapshot()["www.amazon.de"]["requests_per_minute"] == 2
+    for _ in range(20):
+        limiter.record("www.amazon.de", "NO PROMOTION")
+    assert limiter.snapshot()["www.amazon.de"]["requests_per_minute"] == 30
+
+
+def test_hosts_are_paced_independently():
+    limiter = AdaptiveRateLimiter(20)
+
+    limiter.record("www.amazon.de", "Error/Throttled")
+    limiter.record("www.amazon.es", "ACTIVE")
+
+    snapshot = limiter.snapshot()
+    assert snapshot["www.amazon.de"]["requests_per_minute"] == 10
+    assert snapshot["www.amazon.es"]["requests_per_minute"] == 22
+
+
+def test_disabled_limiter_ignores_signals():
+    limiter = AdaptiveRateLimiter(None)
+
+    limiter.record("www.amazon.de", "Error/Captcha")
+
+    assert limiter.snapshot() == {}
+
+
+def test_run_backs_off_on_captcha_pages(fixture_base):
+    # Fast enough not to slow the test down, so the counters are what's checked
+    limiter = AdaptiveRateLimiter(6000, max_rpm=12000, increase=100)
+    urls = [f"{fixture_base}/dp/{name}" for name in ["deal", "coupon", "captcha", "no_promo"]]
+
+    collect(urls, rate_limiter=limiter, retries=False)
+
+    state = limiter.snapshot()[host_of(fixture_base)]
+    assert (state["successes"], state["backoffs"]) == (3, 1)
+    assert [event["status"] for event in limiter.events] == ["Error/Captcha"]
+    # One worker checks the pages in order: +100, +100, halved, +100
+    assert state["requests_per_minute"] == (6000 + 200) * 0.5 + 100
@@ -0,0 +1,129 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """
+    Simple asyncio token bucket.
+    `rate` is tokens per second, `capacity` the maximum burst size.
+    `jitter` adds a random extra pause (seconds) to look less robotic.
+    """
+
+    def __init__(self, rate, capacity=1.0, jitter=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.jitter = jitter
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order so one host is never starved
+        async with self._lock:
+            while True:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+            if self.jitter:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, so e.g. amazon.de and amazon.es each get
+    their own request budget.
+    """
+
+    def __init__(self, requests_per_minute, burst=1.0, jitter=0.0):
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.jitter = jitter
+        self.buckets = {}
+
+    def bucket(self, host):
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.requests_per_minute / 60.0, self.burst, self.jitter)
+        return self.buckets[host]
+
+    async def acquire(self, host):
+        # None / 0 disables throttling (useful for local fixture servers)
+        if not self.requests_per_minute:
+            return
+        await self.bucket(host).acquire()
+
+
+# Results that mean the site is pushing back
+BACKOFF_STATUSES = {"Error/Captcha", "Error/Timeout", "Error/Throttled"}
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    AIMD pacing per host.
+    The request rate grows by `increase` requests/min after every clean page
+    and is multiplied by `decrease` when a CAPTCHA, timeout or throttling
+    response is seen, always staying within [min_rpm, max_rpm].
+    `snapshot()` and `events` expose the current state for tuning.
+    """
+
+    def __init__(self, requests_per_minute, min_rpm=2, max_rpm=120, increase=2, decrease=0.5,
+                 burst=1.0, jitter=0.0, max_events=500):
+        super().__init__(requests_per_minute, burst=burst, jitter=jitter)
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm
+        self.increase = increase
+        self.decrease = decrease
+        self.successes = {}
+        self.backoffs = {}
+        self.events = deque(maxlen=max_events)
+
+    def record(self, host, status):
+        """Feed the outcome of one request for `host` back into its rate."""
+        if not self.requests_per_minute or status is None:
+            return
+        bucket = self.bucket(host)
+        bucket.refill()  # Settle tokens earned at the old rate first
+        rpm = bucket.rate * 60
+
+        if status in BACKOFF_STATUSES:
+            new_rpm = max(self.min_rpm, rpm * self.decrease)
+            self.backoffs[host] = self.backoffs.get(host, 0) + 1
+            self.events.append({
+                "time": time.time(),
+                "host": host,
+                "status": status,
+                "from_rpm": round(rpm, 2),
+                "to_rpm": round(new_rpm, 2),
+            })
+            # Empty the bucket so the next request waits the full new interval
+            bucket.tokens = min(bucket.tokens, 0.0)
+            print(f"Backing off {host}: {rpm:.1f} -> {new_rpm:.1f} req/min ({status})")
+        elif status.startswith("Error"):
+            # Other errors (e.g. parsing exceptions) say nothing about pacing
+            return
+        else:
+            new_rpm = min(self.max_rpm, rpm + self.increase)
+            self.successes[host] = self.successes.get(host, 0) + 1
+
+        bucket.rate = new_rpm / 60.0
+
+    def snapshot(self):
+        """Current rate, delay between requests and counters per host."""
+        return {
+            host: {
+                "requests_per_minute": round(bucket.rate * 60, 2),
+                "delay_s": round(1 / bucket.rate, 2),
+                "successes": self.successes.get(host, 0),
+                "backoffs": self.backoffs.get(host, 0),
+            }
+            for host, bucket in self.buckets.items()
+        }
@@ -1,11 +1,47 @@
+import re
+from urllib.parse import urlparse
 
-def parse_price(price_str):
-    if not price_str:
+def page_url(url):
+    """Return the absolute URL to fetch for an input cell, or None if it is blank (None, NaN, '') or unparsable."""
+    if url is None or url != url:  # NaN of an empty spreadsheet cell
         return None
+    url = str(url).strip()
+    if not url:
+        return None
+    target_url = url if url.startswith("http") else f"https://{url}"
     try:
-        # Clean string: remove currency symbol, whitespace, set decimal point
-        clean = price_str.replace("€", "").replace("$", "").strip()
-        clean = clean.replace(".", "").replace(",", ".") # European format: 1.234,56 -> 1234.56
-        return float(clean)
-    except:
+        host = urlparse(target_url).hostname
+    except ValueError:  # e.g. an unclosed IPv6 bracket
         return None
+    return target_url if host else None
+
+def host_of(url):
+    """Return the lowercase host of a URL (without 'www.'), e.g. 'amazon.de'; '' if there is none."""
+    target_url = page_url(url)
+    if target_url is None:
+        return ""
+    host = urlparse(target_url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+ASIN_PATTERN = re.compile(r"/(?:dp|gp/product|gp/aw/d|product)/([A-Z0-9]{10})(?:[/?#]|$)", re.IGNORECASE)
+
+def extract_asin(url):
+    """Return the normalized (uppercase) ASIN in an Amazon product URL, or None."""
+    match = ASIN_PATTERN.search(str(url or ""))
+    return match.group(1).upper() if match else None
+
+def marketplace_of(url):
+    """Return the marketplace domain suffix of an Amazon URL, e.g. 'de' or 'co.uk'."""
+    host = host_of(url)
+    return host.split("amazon.", 1)[1] if "amazon." in host else host
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items from any iterable (lazily)."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch